@@ -8,6 +8,7 @@ from fastapi import (
     BackgroundTasks,
 )
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
@@ -53,7 +54,10 @@ async def login(
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
-    response = authenticate_user(db, email.email)
+    # Sync DB work runs in the threadpool; the OTP email is sent as a background task
+    response = await run_in_threadpool(
+        authenticate_user, db, email.email, background_tasks
+    )
     if response == None:
         raise HTTPException(status_code=400, detail="You should register Account")
     elif response == False:
@@ -68,7 +72,7 @@ async def login(
 async def verify_otp_code(
     data: OTPVerifyRequest, db: Session = Depends(get_db)
 ) -> UserRespond:
-    user = verify_otp(db, data.email, data.otp)
+    user = await run_in_threadpool(verify_otp, db, data.email, data.otp)
     if user == None:
         raise HTTPException(status_code=400, detail="You don't have Account")
     elif user == 0:
@@ -80,7 +84,7 @@ async def verify_otp_code(
         access_token = create_access_token(
             data={"sub": user.email}, expires_delta=access_token_expires
         )
-        userinfo = get_user_by_email(db, user.email)
+        userinfo = await run_in_threadpool(get_user_by_email, db, user.email)
         # Set JWT in HttpOnly cookie
         user_info_model = UserInfo.from_orm(userinfo)
         response = JSONResponse(content=jsonable_encoder(user_info_model))
@@ -125,7 +129,7 @@ async def google_login(token: str = Form(...), db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email not found in token")
 
     # 2. Fetch user from DB or create if not exists
-    user = get_user_by_email(db, email)
+    user = await run_in_threadpool(get_user_by_email, db, email)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found. Plz sign up")
         # OR auto-create:
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import AsyncGenerator
 from uuid import UUID
+import hashlib
 from app.schemas.broker import (
     BrokerConnect,
     BrokerInfo,
@@ -26,16 +30,19 @@ from app.services.broker_service import (
     get_positions,
     get_orders,
     get_accounts,
+    get_snapshot,
     exit_position,
     get_token_for_websocket,
     get_all_tokens_for_websocket,
     get_token_for_group_websocket,
     execute_market_order,
     execute_limit_order,
-    execute_limit_order_with_sltp
+    execute_limit_order_with_sltp,
+    start_group_order
 )
 from app.dependencies.database import get_db
 from app.core.config import settings
+from app.core.serialization import FastJSONResponse, dumps, sse_event
 
 router = APIRouter()
 
@@ -77,7 +84,8 @@ async def get_Positions(user_id: UUID, db: Session = Depends(get_db)):
     response = await get_positions(db, user_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Positions not found")
-    return response
+    # Already validated by the service layer
+    return FastJSONResponse(content=response)
 
 
 @router.post("/position/exit", status_code=status.HTTP_200_OK)
@@ -222,7 +230,8 @@ async def get_Orders(user_id: UUID, db: Session = Depends(get_db)):
     response = await get_orders(db, user_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Positions not found")
-    return response
+    # Already validated by the service layer
+    return FastJSONResponse(content=response)
 
 
 @router.get("/accounts", status_code=status.HTTP_200_OK)
@@ -230,7 +239,25 @@ async def get_Accounts(user_id: UUID, db: Session = Depends(get_db)):
     response = await get_accounts(db, user_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Positions not found")
-    return response
+    # Already validated by the service layer
+    return FastJSONResponse(content=response)
+
+
+@router.get("/snapshot", status_code=status.HTTP_200_OK)
+async def get_Snapshot(request: Request, user_id: UUID, db: Session = Depends(get_db)):
+    """Positions, orders and accounts in one response.
+
+    The ETag is a hash of the body; a poll that sends it back in
+    If-None-Match gets an empty 304 while nothing has changed.
+    """
+    # Sorted keys keep the body, and so the ETag, stable between polls
+    body = dumps(await get_snapshot(db, user_id), sort_keys=True)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get(
@@ -247,9 +274,8 @@ def get_Tokens_for_websocket(user_id: UUID, db: Session = Depends(get_db)):
     status_code=status.HTTP_200_OK,
 )
 def get_All_Tokens_for_websocket(user_id: UUID, db: Session = Depends(get_db)):
-    tokens = get_all_tokens_for_websocket(db, user_id)
-    print(f"[WebSocket Tokens API] Returning {len(tokens)} tokens for user {user_id}")
-    return tokens
+    # Built from the token store's own WebSocketTokens; skip re-validating them
+    return FastJSONResponse(content=get_all_tokens_for_websocket(db, user_id))
 
 @router.get(
     "/websockettoken/group/{group_id}",
@@ -278,4 +304,35 @@ async def execute_Limit_order(order: LimitOrder, db: Session = Depends(get_db)):
     status_code=status.HTTP_201_CREATED,
 )
 async def execute_Limit_order_with_sltp(order: LimitOrderWithSLTP, db: Session = Depends(get_db)):
-    return await execute_limit_order_with_sltp(db, order)
\ No newline at end of file
+    return await execute_limit_order_with_sltp(db, order)
+
+
+async def _order_events(events: asyncio.Queue) -> AsyncGenerator[bytes, None]:
+    while (event := await events.get()) is not None:
+        yield sse_event(event)
+
+
+def _order_event_stream(order: MarketOrder, kind: str) -> StreamingResponse:
+    # The fan-out runs in its own task; the response only reads its events
+    return StreamingResponse(
+        _order_events(start_group_order(order, kind)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+# Streaming variants: one SSE event per follower as soon as Tradovate answers
+@router.post("/execute-order/market/stream")
+async def stream_Market_order(order: MarketOrder):
+    return _order_event_stream(order, "market")
+
+@router.post("/execute-order/limit/stream")
+async def stream_Limit_order(order: LimitOrder):
+    return _order_event_stream(order, "limit")
+
+@router.post("/execute-order/limitwithsltp/stream")
+async def stream_Limit_order_with_sltp(order: LimitOrderWithSLTP):
+    return _order_event_stream(order, "limitwithsltp")
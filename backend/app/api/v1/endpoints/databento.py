@@ -1,45 +1,76 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from fastapi.responses import Response, StreamingResponse
 from app.core.config import settings
+from app.core.serialization import SSE_KEEPALIVE, FastJSONResponse, sse_event
 from app.schemas.broker import Symbols
 from typing import AsyncGenerator
 import databento as dbt
 import asyncio
-import json
 import pandas as pd
 import re
+import time
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.dependencies.database import get_db
-from app.services.broker_service import get_positions
-from app.utils.tradovate import get_contract_item, get_contract_maturity_item, get_product_item
-from app.models.broker_account import BrokerAccount, SubBrokerAccount
-from uuid import UUID
+from app.services.bar_service import (
+    DOWNSAMPLE_METHODS,
+    DOWNSAMPLE_MIN_POINTS,
+    downsample_bars,
+    one_minute_bars,
+    resample_bars,
+    timeframe_seconds,
+)
+from app.services.live_bar_service import live_bars, merge_live_tail
+from app.services.pnl_service import (
+    historical_pnl_rows,
+    last_close_by_symbol,
+    load_pnl_resume,
+    load_positions,
+    pnl_resume_generation,
+    positions_by_symbol,
+    quote_pnl,
+    save_pnl_resume,
+)
+from app.services.quote_feed_service import QUOTE_BOOK_FRESH_SECONDS, quote_feed
+from app.services.subscription_registry_service import stream_user, subscriptions
+from app.services.symbology_service import symbology
+from app.services.historical_executor_service import historical_executor
+from app.services.sse_connection_service import stream_until_disconnect
+from app.services.historical_service import (
+    HISTORICAL_FORMATS,
+    HISTORICAL_MAX_POINTS,
+    OHLCV_COLUMNS,
+    clamp_range,
+    fetch_ohlcv,
+    ohlcv_frame,
+    to_arrow_ipc,
+    to_columns,
+    to_records,
+    fetch_range_df,
+)
+from uuid import UUID, uuid4
 
 router = APIRouter()
 
-# Store user subscriptions by client IP
-user_subscriptions = {}
-
 # Configuration constants
 DATASET = "GLBX.MDP3"
 SCHEMA = "mbp-1"
-def _root_symbol_variants(symbol: str) -> list[str]:
-    # Try to derive root like ES.FUT from ESZ5, NQZ5, etc.
-    s = (symbol or "").upper()
-    # Extract leading letters
-    i = 0
-    while i < len(s) and s[i].isalpha():
-        i += 1
-    root = s[:i]
-    variants = [s]
-    if root:
-        variants.append(f"{root}.FUT")
-    return list(dict.fromkeys(variants))
+# Price and PnL SSE connects wait on the market-status check
+MARKET_STATUS_TIMEOUT_SECONDS = 10
 
 
 async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
     """Check market status using recent historical data. Returns False if market is closed."""
+    try:
+        return await historical_executor.run(
+            "market_status", _check_market_open, symbols, timeout=MARKET_STATUS_TIMEOUT_SECONDS
+        )
+    except TimeoutError:
+        return (False, "timeout")
+
+
+def _check_market_open(symbols: list[str]) -> tuple[bool, str]:
+    """Blocking body of is_market_open; runs on the historical executor."""
     try:
         print(f"[Market Status] Checking market status for symbols: {symbols}")
         if not settings.DATABENTO_KEY:
@@ -53,15 +84,12 @@ async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
         start = end - timedelta(minutes=15)  # Check last 15 minutes for recent data
         print(f"[Market Status] Querying Databento Historical API: start={start.isoformat()}, end={end.isoformat()}")
         
-        # Build variant list per symbol
-        all_variants: list[str] = []
-        for sym in symbols:
-            all_variants.extend(_root_symbol_variants(sym))
-        all_variants = list(dict.fromkeys([v for v in all_variants if v]))
-        print(f"[Market Status] Symbol variants: {all_variants}")
+        # Front month for parents, raw symbols as they are
+        data_symbols = symbology.price_symbols(symbols)
+        print(f"[Market Status] Data symbols: {data_symbols}")
         
-        if not all_variants:
-            print(f"[Market Status] ERROR: No symbol variants found")
+        if not data_symbols:
+            print(f"[Market Status] ERROR: No data symbols found")
             return (False, "no_symbols")
         
         # Query minimal range; if data within 15 minutes, market is open
@@ -71,7 +99,7 @@ async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
                 dataset=DATASET,
                 start=start.isoformat(),
                 end=end.isoformat(),
-                symbols=all_variants,
+                symbols=data_symbols,
                 schema="ohlcv-1m",
             )
         except Exception as api_error:
@@ -94,7 +122,7 @@ async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
                             dataset=DATASET,
                             start=start.isoformat(),
                             end=end.isoformat(),
-                            symbols=all_variants,
+                            symbols=data_symbols,
                             schema="ohlcv-1m",
                         )
                     except Exception as parse_error:
@@ -107,7 +135,7 @@ async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
                             dataset=DATASET,
                             start=start.isoformat(),
                             end=end.isoformat(),
-                            symbols=all_variants,
+                            symbols=data_symbols,
                             schema="ohlcv-1m",
                         )
                 else:
@@ -119,7 +147,7 @@ async def is_market_open(symbols: list[str]) -> tuple[bool, str]:
                         dataset=DATASET,
                         start=start.isoformat(),
                         end=end.isoformat(),
-                        symbols=all_variants,
+                        symbols=data_symbols,
                         schema="ohlcv-1m",
                     )
             else:
@@ -179,300 +207,202 @@ async def market_status(symbols: str):
 
 
 
+def _live_error_frame(error_msg: str) -> dict:
+    """SSE error frame for a failed Live session, with guidance for the common causes."""
+    if "authentication failed" in error_msg.lower() or "cram" in error_msg.lower():
+        return {
+            "error": "DataBento Authentication Failed",
+            "details": "Invalid API key or insufficient permissions for live data",
+            "solutions": [
+                "Verify your API key is correct",
+                "Ensure your key has live data access permissions", 
+                "Check if your key is for live data (not just historical)",
+                "Contact DataBento support if key appears valid"
+            ],
+            "timestamp": datetime.now().isoformat()
+        }
+    if "nonetype" in error_msg.lower() or "await" in error_msg.lower():
+        return {
+            "error": "DataBento Client Initialization Failed",
+            "details": "Client object is None, likely due to subscription failure",
+            "solutions": [
+                "Check if your API key has live data permissions",
+                "Verify the dataset and schema are correct",
+                "Ensure symbols are valid for the dataset",
+                "Check DataBento service status"
+            ],
+            "timestamp": datetime.now().isoformat()
+        }
+    return {
+        "error": f"DataBento API error: {error_msg}",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 async def stream_price_data(
     symbols: list[str],
-    request: Request
-) -> AsyncGenerator[str, None]:
+    request: Request,
+    user: str = "anonymous",
+    connection_id: str | None = None,
+    since: int | None = None
+) -> AsyncGenerator[bytes, None]:
     """
-    Stream real-time price data from DataBento Live API
+    Stream real-time prices from the shared DataBento quote feed
     
     Args:
         symbols: List of symbols to subscribe to (e.g., ['ES.FUT', 'NQ.FUT'])
         request: FastAPI request object for connection management
+        user, connection_id: Subscription registry key the stream holds while open
+        since: Last event id of the stream this one resumes; quotes after it are sent first
     """
     import uuid
     # Create unique connection ID for this stream
-    connection_id = str(uuid.uuid4())[:8]
+    connection_id = connection_id or str(uuid.uuid4())[:8]
     
-    # Create per-connection symbol mapping to avoid cross-contamination
-    symbol_mapping = {}
-    # Normalize requested symbols for comparison (uppercase, remove .FUT suffix if present)
-    # Also create variants with and without .FUT suffix
-    requested_symbols_normalized = set()
-    for s in symbols:
-        s_upper = s.upper()
-        requested_symbols_normalized.add(s_upper)
-        requested_symbols_normalized.add(s_upper.replace('.FUT', ''))
-        if not s_upper.endswith('.FUT'):
-            requested_symbols_normalized.add(s_upper + '.FUT')
+    # Check if API key is available
+    if not settings.DATABENTO_KEY:
+        error_data = {
+            "error": "DATABENTO_KEY environment variable not set",
+            "details": "Please set DATABENTO_KEY environment variable to use the live data stream",
+            "timestamp": datetime.now().isoformat()
+        }
+        yield sse_event(error_data)
+        return
     
+    # Parents (ES.FUT) stream their front month; quotes report the requested symbol
+    data_symbols = {symbology.price_symbol(s): s for s in symbols}
+    # One upstream session serves every connection; see quote_feed_service
+    subscriptions.hold(user, connection_id, symbols)
+    subscriber = None
     try:
-        # Check if API key is available
-        if not settings.DATABENTO_KEY:
-            error_data = {
-                "error": "DATABENTO_KEY environment variable not set",
-                "details": "Please set DATABENTO_KEY environment variable to use the live data stream",
-                "timestamp": datetime.now().isoformat()
-            }
-            yield f"data: {json.dumps(error_data)}\n\n"
-            return
+        cursor = quote_feed.cursor()
+        subscriber = await quote_feed.subscribe(list(data_symbols), since)
         
-        # Initialize DataBento Live client
-        client = dbt.Live(key=settings.DATABENTO_KEY)
-        
-        # Subscribe to symbols with proper parameters
-        client.subscribe(
-            dataset=DATASET,
-            schema=SCHEMA,
-            symbols=symbols,
-            stype_in="raw_symbol"
-        )
-        
-        # Send initial status message with connection ID
+        # Send initial status message with connection ID; its id lets a reconnect resume from here
         status_data = {
             "status": "connected",
             "message": "Connected to DataBento, waiting for price data...",
             "symbols": symbols,
             "connection_id": connection_id,
+            "resumed": since is not None,
             "timestamp": datetime.now().isoformat()
         }
-        yield f"data: {json.dumps(status_data)}\n\n"
+        yield sse_event(status_data, since if since is not None else cursor)
         
-                
-        try:
-            for record in client:
-                # Check if client disconnected - do this FIRST before processing any data
-                if await request.is_disconnected():
-                    # Try to close the DataBento client
-                    try:
-                        if hasattr(client, 'close'):
-                            client.close()
-                    except:
-                        pass
-                    break
-                
-                try:
-                    # Handle different record types
-                    record_type = type(record).__name__
-                    
-                    if record_type == "SymbolMappingMsg":
-                        # Handle symbol mapping messages
-                        instrument_id = getattr(record, 'instrument_id', None)
-                        symbol = getattr(record, 'stype_in_symbol', None)
-                        
-                        if instrument_id is not None and symbol is not None:
-                            symbol_mapping[instrument_id] = symbol
-                        
-                        continue  # Skip symbol mapping messages for price display
-                    
-                    elif record_type in ["MBP1Msg", "MBPMsg", "TradeMsg"]:
-                        # Double-check if client disconnected before processing
-                        if await request.is_disconnected():
-                            break
-                        
-                        # Handle actual price/trade data
-                        # Extract data from MBP1Msg structure
-                        # Get instrument_id from record
-                        instrument_id = getattr(record, 'instrument_id', None)
-                        
-                        # Get symbol name from mapping if available
-                        symbol = symbol_mapping.get(instrument_id, None)
-                        if not symbol:
-                            # Try to get from record directly
-                            symbol = getattr(record, 'stype_in_symbol', None)
-                        if not symbol:
-                            symbol = f"Instrument-{instrument_id}"
-                        
-                        # Filter: Only send data for symbols that were requested in this connection
-                        symbol_upper = symbol.upper()
-                        symbol_variants = [
-                            symbol_upper,
-                            symbol_upper.replace('.FUT', ''),
-                            symbol_upper + '.FUT' if not symbol_upper.endswith('.FUT') else symbol_upper
-                        ]
-                        if not any(variant in requested_symbols_normalized for variant in symbol_variants):
-                            # Skip data for symbols not requested in this connection
-                            continue
-                        
-                        # Get timestamp - try record.hd.ts_event first, then record.ts_event
-                        timestamp = None
-                        try:
-                            if hasattr(record, 'hd') and hasattr(record.hd, 'ts_event'):
-                                timestamp = record.hd.ts_event
-                            elif hasattr(record, 'ts_event'):
-                                timestamp = record.ts_event
-                            else:
-                                timestamp = datetime.now()
-                        except:
-                            timestamp = datetime.now()
-                        
-                        # Extract bid/ask data from levels
-                        bid_price = None
-                        ask_price = None
-                        bid_size = None
-                        ask_size = None
-                        
-                        # Check if levels is a list or a single object
-                        if hasattr(record, 'levels'):
-                            levels_data = record.levels
-                            
-                            # If it's a list, get first element
-                            if isinstance(levels_data, list) and len(levels_data) > 0:
-                                level = levels_data[0]
-                            elif hasattr(levels_data, 'bid_px'):
-                                # It might be a single BidAskPair object
-                                level = levels_data
-                            else:
-                                level = None
-                                
-                            if level is not None:
-                                # Extract prices from BidAskPair
-                                # Use 'pretty_bid_px' and 'pretty_ask_px' for human-readable float values
-                                # These are the correctly formatted prices, not the raw integer values
-                                if hasattr(level, 'pretty_bid_px'):
-                                    bid_price = float(level.pretty_bid_px)
-                                elif hasattr(level, 'bid_px'):
-                                    # Fallback to raw bid_px if pretty not available
-                                    bid_price = float(level.bid_px)
-                                    
-                                if hasattr(level, 'pretty_ask_px'):
-                                    ask_price = float(level.pretty_ask_px)
-                                elif hasattr(level, 'ask_px'):
-                                    # Fallback to raw ask_px if pretty not available
-                                    ask_price = float(level.ask_px)
-                                    
-                                if hasattr(level, 'bid_sz'):
-                                    bid_size = int(level.bid_sz)
-                                if hasattr(level, 'ask_sz'):
-                                    ask_size = int(level.ask_sz)
-                        
-                        data = {
-                            "symbol": symbol,
-                            "instrument_id": int(instrument_id) if instrument_id is not None else None,
-                            "timestamp": str(timestamp),
-                            "bid_price": bid_price,
-                            "ask_price": ask_price,
-                            "bid_size": bid_size,
-                            "ask_size": ask_size,
-                            "received_at": datetime.now().isoformat(),
-                            "record_type": record_type,
-                            "connection_id": connection_id  # Include connection ID for debugging
-                        }
+        # The disconnect watcher cancels this loop when the client leaves
+        while True:
+            frames = []
+            for message in await subscriber.get():
+                if "error" in message:
+                    frames.append(sse_event(_live_error_frame(message["error"])))
+                    continue
+                frames.append(sse_event({
+                    "symbol": data_symbols[message["symbol"]],
+                    "instrument_id": message["instrument_id"],
+                    "timestamp": str(message["ts_event"]),
+                    "bid_price": message["bid_price"],
+                    "ask_price": message["ask_price"],
+                    "bid_size": message["bid_size"],
+                    "ask_size": message["ask_size"],
+                    "received_at": datetime.now().isoformat(),
+                    "record_type": message["record_type"],
+                    "connection_id": connection_id  # Include connection ID for debugging
+                }, message["seq"]))
+            yield b"".join(frames)
+    finally:
+        subscriptions.release(user, connection_id)
+        if subscriber is not None:
+            await quote_feed.unsubscribe(subscriber)
 
-                        # Always send data to frontend (even if price data is None)
-                        yield f"data: {json.dumps(data)}\n\n"
-                    
-                    else:
-                        # Handle other record types - send raw data
-                        data = {
-                            "raw_data": record.asdict() if hasattr(record, 'asdict') else str(record),
-                            "record_type": record_type,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                        
-                except Exception as record_error:
-                    error_data = {
-                        "error": f"Record processing error: {str(record_error)}",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    yield f"data: {json.dumps(error_data)}\n\n"
-                    
-        except Exception as iteration_error:
-            error_data = {
-                "error": f"Iteration error: {str(iteration_error)}",
-                "timestamp": datetime.now().isoformat()
-            }
-            yield f"data: {json.dumps(error_data)}\n\n"
 
-    except Exception as e:
-        error_msg = str(e)
-        
-        # Provide specific guidance for authentication errors
-        if "authentication failed" in error_msg.lower() or "cram" in error_msg.lower():
-            detailed_error = {
-                "error": "DataBento Authentication Failed",
-                "details": "Invalid API key or insufficient permissions for live data",
-                "solutions": [
-                    "Verify your API key is correct",
-                    "Ensure your key has live data access permissions", 
-                    "Check if your key is for live data (not just historical)",
-                    "Contact DataBento support if key appears valid"
-                ],
-                "timestamp": datetime.now().isoformat()
-            }
-        elif "nonetype" in error_msg.lower() or "await" in error_msg.lower():
-            detailed_error = {
-                "error": "DataBento Client Initialization Failed",
-                "details": "Client object is None, likely due to subscription failure",
-                "solutions": [
-                    "Check if your API key has live data permissions",
-                    "Verify the dataset and schema are correct",
-                    "Ensure symbols are valid for the dataset",
-                    "Check DataBento service status"
-                ],
-                "timestamp": datetime.now().isoformat()
-            }
-        else:
-            detailed_error = {
-                "error": f"DataBento API error: {error_msg}",
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        yield f"data: {json.dumps(detailed_error)}\n\n"
-    finally:
-        # Try to close the DataBento client if it exists
-        try:
-            if 'client' in locals() and client:
-                if hasattr(client, 'close'):
-                    client.close()
-        except Exception:
-            pass
+async def _cached_books(symbols: list[str]) -> dict[str, dict]:
+    """The quote feed's cached book per symbol; symbols it has never quoted are left out."""
+    if not settings.DATABENTO_KEY:
+        return {}
+    data_symbols = {s: symbology.price_symbol(s) for s in symbols}
+    books = await quote_feed.books(list(set(data_symbols.values())))
+    return {s: books[d] for s, d in data_symbols.items() if d in books}
+
+
+def _books_fresh(books: dict[str, dict], symbols: list[str]) -> bool:
+    """Whether every symbol's book was quoted within QUOTE_BOOK_FRESH_SECONDS, so the market is open."""
+    oldest = time.time_ns() - int(QUOTE_BOOK_FRESH_SECONDS * 1e9)
+    return all(s in books and books[s]["ts_event"] >= oldest for s in symbols)
+
+
+def _last_event_id(request: Request, last_event_id: str | None = None) -> int | None:
+    """Where a reconnecting stream left off.
+
+    EventSource sends the Last-Event-ID header when it reconnects by itself;
+    a client that opens a new EventSource passes ?last_event_id= instead.
+    """
+    value = request.headers.get("last-event-id") or last_event_id
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
 
 
 @router.post("/sse/current-price")
-async def subscribe_symbols(request: Request, body: Symbols):
+async def subscribe_symbols(request: Request, body: Symbols, user_id: UUID | None = None):
     """
     Subscribe to symbols for real-time price streaming
     
     Args:
         request: FastAPI request object
-        body: Pydantic model containing list of symbols to subscribe to (e.g., {'symbols': ['ES.FUT', 'NQ.FUT']})
+        body: Pydantic model containing list of symbols to subscribe to (e.g., {'symbols': ['ES.FUT', 'NQ.FUT']}),
+              and optionally the connection_id of an earlier subscription to replace
+        user_id: Identifies the user when there is no access_token cookie
     
     Returns:
-        Confirmation message
+        Confirmation message with the connection_id to pass to GET /sse/current-price
     """
-    client_host = request.client.host
+    user = stream_user(request, user_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Sign in again, or pass user_id without a session cookie, to subscribe")
     symbols = body.symbols
-    user_subscriptions[client_host] = symbols
+    connection_id = await subscriptions.register(user, symbols, body.connection_id)
     
     return {
         "message": "Subscribed successfully",
         "symbols": symbols,
-        "client_host": client_host
+        "connection_id": connection_id
     }
 
 
 @router.get("/sse/current-price")
-async def sse_price_stream(request: Request, symbols: str = None):
+async def sse_price_stream(
+    request: Request,
+    symbols: str = None,
+    connection_id: str | None = None,
+    user_id: UUID | None = None,
+    last_event_id: str | None = None
+):
     """
     SSE endpoint to stream real-time prices for subscribed symbols
     
     Args:
         symbols: Comma-separated list of symbols (e.g., "ES.FUT,NQ.FUT") or single symbol
                  Can also be set via POST to /sse/current-price (legacy support)
+        connection_id: Subscription returned by the POST; defaults to the user's latest one
+        user_id: Identifies the user when there is no access_token cookie
+        last_event_id: Resume after this event, like the Last-Event-ID header
     
     Returns:
         Server-Sent Events stream with real-time price data
     """
-    # Get symbols from query parameter first, fallback to user_subscriptions
+    user = stream_user(request, user_id)
+    # Get symbols from query parameter first, fallback to the subscription registry
     if symbols:
         # Parse comma-separated symbols
         symbol_list = [s.strip() for s in symbols.split(",") if s.strip()]
     else:
-        # Legacy: try to get from user_subscriptions
-        client_host = request.client.host
-        symbol_list = user_subscriptions.get(client_host)
+        # Legacy: symbols POSTed to /sse/current-price, possibly on another worker
+        found = await subscriptions.lookup(user, connection_id) if user else None
+        if found is not None:
+            connection_id, symbol_list = found
+        else:
+            symbol_list = None
     
     if not symbol_list:
         raise HTTPException(
@@ -480,9 +410,19 @@ async def sse_price_stream(request: Request, symbols: str = None):
             detail="No symbols provided. Please include ?symbols=SYMBOL in the query string."
         )
 
-    # Check market status quickly to avoid slow connects when closed
-    print(f"[Price SSE] Checking market status for symbols: {symbol_list}")
-    open_flag, reason = await is_market_open(symbol_list)
+    since = _last_event_id(request, last_event_id)
+    books = await _cached_books(symbol_list) if since is None else {}
+    if since is not None:
+        # A live stream dropped; the market was open a moment ago
+        print(f"[Price SSE] Resuming {symbol_list} after event {since}")
+        open_flag, reason = True, "resumed"
+    elif _books_fresh(books, symbol_list):
+        # The quote feed hands the cached top of book over on subscribe
+        open_flag, reason = True, "cached_book"
+    else:
+        # Check market status quickly to avoid slow connects when closed
+        print(f"[Price SSE] Checking market status for symbols: {symbol_list}")
+        open_flag, reason = await is_market_open(symbol_list)
     print(f"[Price SSE] Market status result: open={open_flag}, reason={reason}")
     if not open_flag:
         print(f"[Price SSE] Market is closed (reason: {reason}), using historical fallback")
@@ -490,52 +430,56 @@ async def sse_price_stream(request: Request, symbols: str = None):
         async def historical_price_fallback():
             from datetime import datetime as dt, timezone, timedelta
             try:
-                client = dbt.Historical(key=settings.DATABENTO_KEY)
+                # A cached book is the closing book; Historical is only asked for symbols without one
+                for symbol, book in books.items():
+                    last_price = book["last_price"]
+                    price_data = {
+                        "symbol": symbol,
+                        "bid_price": book["bid_price"] if book["bid_price"] is not None else last_price,
+                        "ask_price": book["ask_price"] if book["ask_price"] is not None else last_price,
+                        "timestamp": dt.fromtimestamp(book["ts_event"] / 1e9, timezone.utc).isoformat(),
+                        "received_at": datetime.now().isoformat(),
+                        "source": "cached_book",
+                        "status": "market_closed",
+                        "reason": reason
+                    }
+                    yield sse_event(price_data)
+                cold = [s for s in symbol_list if s not in books]
+                
                 end = dt.now(timezone.utc)
                 start = end - timedelta(minutes=5)  # Get last 5 minutes of data
                 
-                # Build symbol variants
-                all_variants = []
-                for sym in symbol_list:
-                    all_variants.extend(_root_symbol_variants(sym))
-                all_variants = list(dict.fromkeys([v for v in all_variants if v]))
+                # Front month for parents, raw symbols as they are
+                data_symbols = symbology.price_symbols(cold)
                 
-                if all_variants:
-                    result = client.timeseries.get_range(
-                        dataset=DATASET,
-                        start=start.isoformat(),
-                        end=end.isoformat(),
-                        symbols=all_variants,
-                        schema="ohlcv-1m",
-                    )
-                    df = result.to_df()
+                if data_symbols:
+                    df = await historical_executor.run("recent_bars", fetch_range_df, data_symbols, start, end)
                     if not df.empty:
                         # Get latest price for each symbol
-                        for symbol in symbol_list:
-                            symbol_variants = _root_symbol_variants(symbol)
-                            for variant in symbol_variants:
-                                symbol_data = df[df.index.get_level_values('symbol') == variant]
-                                if not symbol_data.empty:
-                                    latest = symbol_data.iloc[-1]
-                                    price_data = {
-                                        "symbol": symbol,
-                                        "bid_price": float(latest['close']),
-                                        "ask_price": float(latest['close']),
-                                        "timestamp": str(latest.name[0]) if hasattr(latest.name, '__getitem__') else datetime.now().isoformat(),
-                                        "received_at": datetime.now().isoformat(),
-                                        "source": "historical",
-                                        "status": "market_closed",
-                                        "reason": reason
-                                    }
-                                    yield f"data: {json.dumps(price_data)}\n\n"
-                                    break
-                    
+                        for symbol in cold:
+                            data_symbol = symbology.price_symbol(symbol)
+                            symbol_data = df[df.index.get_level_values('symbol') == data_symbol]
+                            if not symbol_data.empty:
+                                latest = symbol_data.iloc[-1]
+                                price_data = {
+                                    "symbol": symbol,
+                                    "bid_price": float(latest['close']),
+                                    "ask_price": float(latest['close']),
+                                    "timestamp": str(latest.name[0]) if hasattr(latest.name, '__getitem__') else datetime.now().isoformat(),
+                                    "received_at": datetime.now().isoformat(),
+                                    "source": "historical",
+                                    "status": "market_closed",
+                                    "reason": reason
+                                }
+                                yield sse_event(price_data)
+                
+                if books or data_symbols:
                     # Send market closed status
-                    payload = {"status": "market_closed", "reason": reason, "source": "historical"}
-                    yield f"data: {json.dumps(payload)}\n\n"
+                    payload = {"status": "market_closed", "reason": reason, "source": "historical" if data_symbols else "cached_book"}
+                    yield sse_event(payload)
             except Exception as e:
                 error_data = {"status": "market_closed", "reason": f"historical_fallback_error: {str(e)}"}
-                yield f"data: {json.dumps(error_data)}\n\n"
+                yield sse_event(error_data)
         
         return StreamingResponse(
             historical_price_fallback(),
@@ -548,7 +492,9 @@ async def sse_price_stream(request: Request, symbols: str = None):
         )
 
     return StreamingResponse(
-        stream_price_data(symbol_list, request),
+        stream_until_disconnect(
+            request, stream_price_data(symbol_list, request, user or "anonymous", connection_id, since), "Price SSE"
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -558,6 +504,106 @@ async def sse_price_stream(request: Request, symbols: str = None):
     )
 
 
+def _live_bar_frame(symbol: str, since: int | None, timeframe: str) -> pd.DataFrame:
+    tail = live_bars.tail(symbol, since=since)
+    return resample_bars(pd.DataFrame(tail, columns=OHLCV_COLUMNS), timeframe)
+
+
+async def stream_live_bars(
+    symbols: list[str],
+    timeframe: str,
+    request: Request
+) -> AsyncGenerator[bytes, None]:
+    """
+    Stream live bars built from the MBP-1 feed
+    
+    Sends a snapshot of each symbol's recent bars, then the symbol's current
+    (still forming) bar whenever it changes.
+    """
+    bucket = timeframe_seconds(timeframe)
+    subscriber = await live_bars.subscribe(symbols)
+    try:
+        status_data = {
+            "status": "connected",
+            "symbols": symbols,
+            "timeframe": timeframe,
+            "timestamp": datetime.now().isoformat()
+        }
+        yield sse_event(status_data)
+        for symbol in symbols:
+            snapshot = {
+                "type": "snapshot",
+                "symbol": symbol,
+                "bars": to_columns(_live_bar_frame(symbol, None, timeframe)),
+            }
+            yield sse_event(snapshot)
+        
+        while True:
+            changed = await live_bars.wait(subscriber, timeout=15)
+            if not changed:
+                # Keep proxies from closing an idle stream
+                yield SSE_KEEPALIVE
+                continue
+            for symbol in changed:
+                latest = live_bars.tail(symbol)
+                if not latest:
+                    continue
+                bucket_start = latest[-1]["time"] // bucket * bucket
+                frame = _live_bar_frame(symbol, bucket_start, timeframe)
+                if frame.empty:
+                    continue
+                bar = {column: values[0] for column, values in to_columns(frame.tail(1)).items()}
+                bar.update(type="bar", symbol=symbol)
+                yield sse_event(bar)
+    finally:
+        await live_bars.unsubscribe(subscriber)
+
+
+@router.get("/sse/bars")
+async def sse_bar_stream(request: Request, symbols: str, timeframe: str = "1m"):
+    """
+    SSE endpoint streaming live OHLCV bars
+    
+    Args:
+        symbols: Comma-separated raw symbols (e.g. "ESZ5,NQZ5")
+        timeframe: Bar size, e.g. "1m", "5m", "1h"
+    
+    Returns:
+        Server-Sent Events stream of snapshot and bar updates
+    """
+    symbol_list = [s.strip() for s in symbols.split(",") if s.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    try:
+        timeframe_seconds(timeframe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not settings.DATABENTO_KEY:
+        raise HTTPException(status_code=500, detail="DATABENTO_KEY environment variable not set")
+    
+    return StreamingResponse(
+        stream_until_disconnect(request, stream_live_bars(symbol_list, timeframe, request), "Bars SSE"),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+@router.get("/historical-metrics")
+async def historical_metrics():
+    """Per-call counts and timings of the Databento Historical executor"""
+    return historical_executor.metrics()
+
+
+@router.get("/quote-feed")
+async def quote_feed_status():
+    """This worker's view of the shared quote feed: ownership and subscribed symbols"""
+    return quote_feed.status()
+
+
 @router.get("/test-connection")
 async def test_databento_connection():
     """
@@ -617,25 +663,33 @@ async def get_available_symbols():
 
 async def stream_pnl_data(
     user_id: UUID,
+    user: str,
     request: Request,
     positions: list[dict],
-    contract_details_cache: dict[int, dict]
-) -> AsyncGenerator[str, None]:
+    contract_details_cache: dict[int, dict],
+    stream_id: str,
+    generation: str | None,
+    since: int | None = None
+) -> AsyncGenerator[bytes, None]:
     """
     Stream real-time profit and loss (PnL) data for user's positions using DataBento Live API
     
     Args:
         user_id: User ID to fetch positions for
+        user: Who the stream belongs to (see stream_user), for the subscription registry
         request: FastAPI request object for connection management
         positions: List of position dictionaries (already fetched, no DB session needed)
         contract_details_cache: Dictionary mapping contract_id to contract details (valuePerPoint, tickSize, symbol)
+        stream_id: Names this stream's resume state; a reconnect passes it back
+        generation: The user's PnL resume generation from before the positions were loaded
+        since: Last event id of the stream this one resumes; skips the historical snapshot
         
     Returns:
         SSE stream with real-time PnL data
     """
-    # Create per-connection symbol mapping to avoid cross-contamination
-    symbol_mapping = {}
-    
+    import uuid
+    # Subscription registry key for this stream's position symbols
+    connection_id = str(uuid.uuid4())[:8]
     try:
         # Check if API key is available
         if not settings.DATABENTO_KEY:
@@ -644,7 +698,7 @@ async def stream_pnl_data(
                 "details": "Please set DATABENTO_KEY environment variable to use the live data stream",
                 "timestamp": datetime.now().isoformat()
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield sse_event(error_data)
             return
         
         # Use positions passed in (already fetched, no DB query needed)
@@ -654,7 +708,7 @@ async def stream_pnl_data(
                 "message": "You don't have any open positions to track",
                 "timestamp": datetime.now().isoformat()
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield sse_event(error_data)
             return
         
         # Helpers to read attrs from dict (positions are already converted to dicts)
@@ -670,381 +724,133 @@ async def stream_pnl_data(
                 "message": "All positions have zero quantity",
                 "timestamp": datetime.now().isoformat()
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield sse_event(error_data)
             return
         
-        # Store position data for PnL calculation grouped by symbol
         # Some users may have multiple positions for the same symbol across accounts
-        symbol_to_positions: dict[str, list[dict]] = {}
-        
-        for pos in positions:
-            net_pos = _get(pos, 'netPos') or 0
-            if net_pos != 0:
-                contract_id = _get(pos, 'contractId')
-                account_id = _get(pos, 'accountId')
-                symbol_name = _get(pos, 'symbol')
-                account_nickname = _get(pos, 'accountNickname')
-                account_display = _get(pos, 'accountDisplayName')
-                net_price = _get(pos, 'netPrice') or 0
-                
-                # Get contract details from cache (already fetched before stream started)
-                contract_details = contract_details_cache.get(contract_id, {
-                            "valuePerPoint": 50,  # Default ES multiplier
-                            "tickSize": 0.25,  # Default ES tick size
-                            "symbol": symbol_name
-                })
-                
-                symbol_to_positions.setdefault(symbol_name, []).append({
-                    "accountId": account_id,
-                    "accountNickname": account_nickname,
-                    "accountDisplayName": account_display,
-                    "netPos": net_pos,
-                    "netPrice": net_price,
-                    "contractId": contract_id,
-                    "symbol": symbol_name,
-                    "contractDetails": contract_details_cache.get(contract_id, {
-                        "valuePerPoint": 50,
-                        "tickSize": 0.25,
-                        "symbol": symbol_name
-                    })
-                })
+        symbol_to_positions = positions_by_symbol(positions, contract_details_cache)
         
-        # Initialize DataBento Live client
-        print(f"[PnL SSE] Initializing Live client for symbols: {symbols}")
-        client = dbt.Live(key=settings.DATABENTO_KEY)
-        print(f"[PnL SSE] Live client created successfully")
+        # Parents stream their front month; quotes route back to the position symbol
+        data_symbols = {symbology.price_symbol(s): s for s in symbol_to_positions}
         
-        # Subscribe to symbols
-        print(f"[PnL SSE] Subscribing to symbols: {symbols}, dataset: {DATASET}, schema: {SCHEMA}")
-        client.subscribe(
-            dataset=DATASET,
-            schema=SCHEMA,
-            symbols=symbols,
-            stype_in="raw_symbol"
-        )
-        print(f"[PnL SSE] Subscription completed")
+        # One upstream session serves every connection; see quote_feed_service
+        print(f"[PnL SSE] Subscribing to quotes for symbols: {symbols}")
+        subscriptions.hold(user, connection_id, symbols)
+        cursor = quote_feed.cursor()
+        subscriber = await quote_feed.subscribe(list(data_symbols), since)
         
-        # Send initial status message
+        # Send initial status message; its id lets a reconnect resume from here
         status_data = {
             "status": "connected",
             "message": "Connected to DataBento for PnL tracking",
             "positions_count": sum(len(v) for v in symbol_to_positions.values()),
             "symbols": symbols,
+            "resumed": since is not None,
+            "stream_id": stream_id,
             "timestamp": datetime.now().isoformat()
         }
         print(f"[PnL SSE] Sending initial status: {status_data}")
-        yield f"data: {json.dumps(status_data)}\n\n"
+        yield sse_event(status_data, since if since is not None else cursor)
         
-        # Send initial PnL using historical data to ensure frontend gets data immediately
+        # Send initial PnL using historical data to ensure frontend gets data immediately,
+        # for symbols without a cached book; a resumed stream gets the quotes it missed instead
         try:
-            print(f"[PnL SSE] Fetching initial historical data for symbols: {symbols}")
-            from datetime import datetime as dt, timezone, timedelta
-            hist_client = dbt.Historical(key=settings.DATABENTO_KEY)
-            end = dt.now(timezone.utc)
-            start = end - timedelta(minutes=5)
-            
-            all_variants = []
-            for sym in symbols:
-                all_variants.extend(_root_symbol_variants(sym))
-            all_variants = list(dict.fromkeys([v for v in all_variants if v]))
-            print(f"[PnL SSE] Historical query variants: {all_variants}, start: {start.isoformat()}, end: {end.isoformat()}")
-            
-            if all_variants:
-                result = hist_client.timeseries.get_range(
-                    dataset=DATASET,
-                    start=start.isoformat(),
-                    end=end.isoformat(),
-                    symbols=all_variants,
-                    schema="ohlcv-1m",
-                )
-                df = result.to_df()
+            cold = [s for s in data_symbols if quote_feed.latest(s) is None]
+            if cold and since is None:
+                print(f"[PnL SSE] Fetching initial historical data for symbols: {cold}")
+                from datetime import datetime as dt, timezone, timedelta
+                end = dt.now(timezone.utc)
+                start = end - timedelta(minutes=5)
+                
+                print(f"[PnL SSE] Historical query symbols: {cold}, start: {start.isoformat()}, end: {end.isoformat()}")
+                df = await historical_executor.run("recent_bars", fetch_range_df, cold, start, end)
                 print(f"[PnL SSE] Historical data received: {len(df)} rows")
                 
-                # Send initial PnL for all positions
-                initial_pnl_count = 0
-                for symbol_name, position_list in symbol_to_positions.items():
-                    current_price = None
-                    symbol_variants = _root_symbol_variants(symbol_name)
-                    for variant in symbol_variants:
-                        symbol_data = df[df.index.get_level_values('symbol') == variant]
-                        if not symbol_data.empty:
-                            latest = symbol_data.iloc[-1]
-                            current_price = float(latest['close'])
-                            print(f"[PnL SSE] Found price for {symbol_name} (variant {variant}): {current_price}")
-                            break
-                    
-                    if current_price is None:
-                        print(f"[PnL SSE] WARNING: No price found for symbol {symbol_name}")
-                        continue
-                    
-                    for position in position_list:
-                        netPos = position["netPos"]
-                        netPrice = position["netPrice"]
-                        contractDetails = position["contractDetails"]
-                        valuePerPoint = contractDetails["valuePerPoint"]
-                        
-                        if netPos > 0:
-                            price_diff = current_price - netPrice
-                            unrealized_pnl = price_diff * netPos * valuePerPoint
-                        else:
-                            price_diff = netPrice - current_price
-                            unrealized_pnl = price_diff * abs(netPos) * valuePerPoint
-                        
-                        pnl_data = {
-                            "symbol": symbol_name,
-                            "accountId": position["accountId"],
-                            "accountNickname": position["accountNickname"],
-                            "accountDisplayName": position["accountDisplayName"],
-                            "netPos": netPos,
-                            "entryPrice": netPrice,
-                            "currentPrice": current_price,
-                            "unrealizedPnL": round(unrealized_pnl, 2),
-                            "bidPrice": current_price,
-                            "askPrice": current_price,
-                            "timestamp": datetime.now().isoformat(),
-                            "positionKey": f"{symbol_name}:{position['accountId']}",
-                            "source": "initial_historical"
-                        }
-                        print(f"[PnL SSE] Sending initial PnL: {pnl_data['symbol']}, account: {pnl_data['accountId']}, PnL: {pnl_data['unrealizedPnL']}")
-                        yield f"data: {json.dumps(pnl_data)}\n\n"
-                        initial_pnl_count += 1
-                print(f"[PnL SSE] Sent {initial_pnl_count} initial PnL updates")
+                # Send initial PnL for the positions in those symbols
+                cold_symbols = {data_symbols[s] for s in cold}
+                pnl_rows = historical_pnl_rows(
+                    [p for p in positions if p.get("symbol") in cold_symbols],
+                    last_close_by_symbol(df),
+                    contract_details_cache,
+                    fill_missing_with_entry=False,
+                )
+                now = datetime.now().isoformat()
+                for row in pnl_rows:
+                    pnl_data = {
+                        **row,
+                        "bidPrice": row["currentPrice"],
+                        "askPrice": row["currentPrice"],
+                        "timestamp": now,
+                        "positionKey": f"{row['symbol']}:{row['accountId']}",
+                        "source": "initial_historical"
+                    }
+                    yield sse_event(pnl_data)
+                print(f"[PnL SSE] Sent {len(pnl_rows)} initial PnL updates")
         except Exception as init_error:
-            # If initial historical fails, continue with live API
+            # If initial historical fails, continue with live quotes
             print(f"[PnL SSE] ERROR in initial historical fetch: {str(init_error)}")
             import traceback
             print(f"[PnL SSE] Traceback: {traceback.format_exc()}")
         
-        try:
-            # Track latest prices for each symbol
-            latest_prices = {}
-            record_count = 0
-            
-            print(f"[PnL SSE] Starting to iterate over Live client records...")
-            for record in client:
-                record_count += 1
-                if record_count % 100 == 0:
-                    print(f"[PnL SSE] Processed {record_count} records from Live API")
-                
-                # Check if client disconnected - do this FIRST before processing any data
-                if await request.is_disconnected():
-                    print(f"[PnL SSE] Client disconnected, closing connection")
-                    # Try to close the DataBento client
-                    try:
-                        if hasattr(client, 'close'):
-                            client.close()
-                    except:
-                        pass
-                    break
-                
-                try:
-                    # Handle different record types
-                    record_type = type(record).__name__
-                    
-                    if record_type == "SymbolMappingMsg":
-                        # Handle symbol mapping messages
-                        instrument_id = getattr(record, 'instrument_id', None)
-                        symbol = getattr(record, 'stype_in_symbol', None)
-                        
-                        if instrument_id is not None and symbol is not None:
-                            symbol_mapping[instrument_id] = symbol
-                            print(f"[PnL SSE] Symbol mapping: instrument_id={instrument_id} -> symbol={symbol}")
-                        
+        quote_count = 0
+        fell_back = False
+        
+        # The disconnect watcher cancels this loop when the client leaves
+        while True:
+            frames = []
+            for message in await subscriber.get():
+                if "error" in message:
+                    # The upstream session failed; the quote feed reopens it. Show
+                    # historical PnL meanwhile, once per connection.
+                    print(f"[PnL SSE] ERROR in Live API: {message['error']}")
+                    yield sse_event({'status': 'live_api_failed', 'error': message["error"], 'falling_back': 'historical'})
+                    if fell_back:
                         continue
-                    
-                    elif record_type in ["MBP1Msg", "MBPMsg", "TradeMsg"]:
-                        if record_count <= 10 or record_count % 50 == 0:
-                            print(f"[PnL SSE] Received {record_type} record #{record_count}")
-                        # Extract price data robustly
-                        instrument_id = getattr(record, 'instrument_id', None)
-                        symbol = symbol_mapping.get(instrument_id, None) or getattr(record, 'stype_in_symbol', None)
-                        if not symbol or symbol not in symbol_to_positions:
-                            if record_count <= 10:
-                                print(f"[PnL SSE] Skipping record: symbol={symbol}, instrument_id={instrument_id}, symbol in positions: {symbol in symbol_to_positions if symbol else False}")
-                            continue
-
-                        bid_price = None
-                        ask_price = None
-                        last_price = None
-                        if record_count <= 10:
-                            print(f"[PnL SSE] Processing price data for symbol: {symbol}, instrument_id: {instrument_id}")
-
-                        if hasattr(record, 'levels'):
-                            levels_data = record.levels
-                            if isinstance(levels_data, list) and len(levels_data) > 0:
-                                level = levels_data[0]
-                            elif hasattr(levels_data, 'bid_px') or hasattr(levels_data, 'ask_px'):
-                                level = levels_data
-                            else:
-                                level = None
-                            if level is not None:
-                                if hasattr(level, 'pretty_bid_px'):
-                                    bid_price = float(level.pretty_bid_px)
-                                elif hasattr(level, 'bid_px'):
-                                    bid_price = float(level.bid_px)
-                                if hasattr(level, 'pretty_ask_px'):
-                                    ask_price = float(level.pretty_ask_px)
-                                elif hasattr(level, 'ask_px'):
-                                    ask_price = float(level.ask_px)
-
-                        if record_type == 'TradeMsg':
-                            if hasattr(record, 'pretty_px'):
-                                last_price = float(record.pretty_px)
-                            elif hasattr(record, 'px'):
-                                last_price = float(record.px)
-
-                        if bid_price is None and ask_price is None and last_price is None:
-                            if record_count <= 10:
-                                print(f"[PnL SSE] No price data extracted for symbol {symbol}")
-                            continue
-                        
-                        if record_count <= 10 or record_count % 50 == 0:
-                            print(f"[PnL SSE] Price data for {symbol}: bid={bid_price}, ask={ask_price}, last={last_price}")
+                    fell_back = True
+                    try:
+                        from datetime import datetime as dt, timezone, timedelta
+                        end = dt.now(timezone.utc)
+                        start = end - timedelta(minutes=5)
+                        df = await historical_executor.run("recent_bars", fetch_range_df, list(data_symbols), start, end)
                         
-                        latest_prices[symbol] = {"bid": bid_price, "ask": ask_price, "last": last_price}
-
-                        # Calculate and emit PnL for all positions under this symbol
-                        pnl_updates_sent = 0
-                        for position in symbol_to_positions[symbol]:
-                            netPos = position["netPos"]
-                            netPrice = position["netPrice"]
-                            contractDetails = position["contractDetails"]
-                            valuePerPoint = contractDetails["valuePerPoint"]
-                            tickSize = contractDetails["tickSize"]
-
-                            # Determine which price to use based on position direction
-                            # Long positions: use BID (what you'd get if you sell now)
-                            # Short positions: use ASK (what you'd pay if you buy back now)
-                            if netPos > 0:  # Long position
-                                current_price = bid_price if bid_price is not None else (last_price if last_price is not None else ask_price)
-                                if current_price is None:
-                                    continue
-                                # PnL = (Current Price - Entry Price) * Quantity * Contract Multiplier
-                                price_diff = current_price - netPrice
-                                unrealized_pnl = price_diff * netPos * valuePerPoint
-                            else:  # Short position
-                                current_price = ask_price if ask_price is not None else (last_price if last_price is not None else bid_price)
-                                if current_price is None:
-                                    continue
-                                # PnL = (Entry Price - Current Price) * Quantity * Contract Multiplier
-                                price_diff = netPrice - current_price
-                                unrealized_pnl = price_diff * abs(netPos) * valuePerPoint
-
+                        # Calculate PnL using historical data
+                        now = datetime.now().isoformat()
+                        for row in historical_pnl_rows(
+                            positions, last_close_by_symbol(df), contract_details_cache, fill_missing_with_entry=False
+                        ):
                             pnl_data = {
-                                "symbol": symbol,
-                                "accountId": position["accountId"],
-                                "accountNickname": position["accountNickname"],
-                                "accountDisplayName": position["accountDisplayName"],
-                                "netPos": netPos,
-                                "entryPrice": netPrice,
-                                "currentPrice": current_price,
-                                "unrealizedPnL": round(unrealized_pnl, 2),
-                                "bidPrice": bid_price,
-                                "askPrice": ask_price,
-                                "lastPrice": last_price,
-                                "valuePerPoint": valuePerPoint,
-                                "tickSize": tickSize,
-                                "priceDiff": round(price_diff, 4),
-                                "timestamp": datetime.now().isoformat(),
-                                "positionKey": f"{symbol}:{position['accountId']}"
+                                **row,
+                                "bidPrice": row["currentPrice"],
+                                "askPrice": row["currentPrice"],
+                                "timestamp": now,
+                                "positionKey": f"{row['symbol']}:{row['accountId']}",
+                                "source": "historical_fallback"
                             }
-
-                            if record_count <= 10 or pnl_updates_sent == 0:
-                                print(f"[PnL SSE] Sending PnL update: {symbol}, account: {position['accountId']}, PnL: {pnl_data['unrealizedPnL']}")
-                            yield f"data: {json.dumps(pnl_data)}\n\n"
-                            pnl_updates_sent += 1
-                
-                except Exception as record_error:
-                    if record_count <= 10:
-                        print(f"[PnL SSE] ERROR processing record #{record_count}: {str(record_error)}")
-                        import traceback
-                        print(f"[PnL SSE] Traceback: {traceback.format_exc()}")
+                            yield sse_event(pnl_data)
+                    except Exception as hist_error:
+                        error_data = {
+                            "error": f"Historical fallback also failed: {str(hist_error)}",
+                            "timestamp": datetime.now().isoformat()
+                        }
+                        yield sse_event(error_data)
                     continue
-                    
-        except Exception as iteration_error:
-            # Live API failed - fallback to historical data
-            error_msg = str(iteration_error)
-            print(f"[PnL SSE] ERROR in Live API iteration: {error_msg}")
-            import traceback
-            print(f"[PnL SSE] Traceback: {traceback.format_exc()}")
-            print(f"[PnL SSE] Total records processed before error: {record_count}")
-            yield f"data: {json.dumps({'status': 'live_api_failed', 'error': error_msg, 'falling_back': 'historical'})}\n\n"
-            
-            # Fallback to historical data
-            try:
-                from datetime import datetime as dt, timezone, timedelta
-                hist_client = dbt.Historical(key=settings.DATABENTO_KEY)
-                end = dt.now(timezone.utc)
-                start = end - timedelta(minutes=5)
                 
-                # Build symbol variants
-                all_variants = []
-                for sym in symbols:
-                    all_variants.extend(_root_symbol_variants(sym))
-                all_variants = list(dict.fromkeys([v for v in all_variants if v]))
+                quote_count += 1
+                if quote_count % 1000 == 0:
+                    print(f"[PnL SSE] Processed {quote_count} quotes")
                 
-                if all_variants:
-                    result = hist_client.timeseries.get_range(
-                        dataset=DATASET,
-                        start=start.isoformat(),
-                        end=end.isoformat(),
-                        symbols=all_variants,
-                        schema="ohlcv-1m",
-                    )
-                    df = result.to_df()
-                    
-                    # Calculate PnL using historical data
-                    for symbol_name, position_list in symbol_to_positions.items():
-                        # Find latest price for this symbol
-                        current_price = None
-                        symbol_variants = _root_symbol_variants(symbol_name)
-                        for variant in symbol_variants:
-                            symbol_data = df[df.index.get_level_values('symbol') == variant]
-                            if not symbol_data.empty:
-                                latest = symbol_data.iloc[-1]
-                                current_price = float(latest['close'])
-                                break
-                        
-                        if current_price is None:
-                            continue
-                        
-                        # Calculate PnL for all positions of this symbol
-                        for position in position_list:
-                            netPos = position["netPos"]
-                            netPrice = position["netPrice"]
-                            contractDetails = position["contractDetails"]
-                            valuePerPoint = contractDetails["valuePerPoint"]
-                            
-                            # Calculate PnL
-                            if netPos > 0:
-                                price_diff = current_price - netPrice
-                                unrealized_pnl = price_diff * netPos * valuePerPoint
-                            else:
-                                price_diff = netPrice - current_price
-                                unrealized_pnl = price_diff * abs(netPos) * valuePerPoint
-                            
-                            pnl_data = {
-                                "symbol": symbol_name,
-                                "accountId": position["accountId"],
-                                "accountNickname": position["accountNickname"],
-                                "accountDisplayName": position["accountDisplayName"],
-                                "netPos": netPos,
-                                "entryPrice": netPrice,
-                                "currentPrice": current_price,
-                                "unrealizedPnL": round(unrealized_pnl, 2),
-                                "bidPrice": current_price,
-                                "askPrice": current_price,
-                                "timestamp": datetime.now().isoformat(),
-                                "positionKey": f"{symbol_name}:{position['accountId']}",
-                                "source": "historical_fallback"
-                            }
-                            yield f"data: {json.dumps(pnl_data)}\n\n"
-            except Exception as hist_error:
-                error_data = {
-                    "error": f"Historical fallback also failed: {str(hist_error)}",
-                    "timestamp": datetime.now().isoformat()
-                }
-                yield f"data: {json.dumps(error_data)}\n\n"
+                symbol = data_symbols[message["symbol"]]
+                bid_price = message["bid_price"]
+                ask_price = message["ask_price"]
+                last_price = message["last_price"]
+                if bid_price is None and ask_price is None and last_price is None:
+                    continue
+                
+                # Calculate and emit PnL for all positions under this symbol
+                for pnl_data in quote_pnl(symbol, symbol_to_positions[symbol], bid_price, ask_price, last_price):
+                    frames.append(sse_event(pnl_data, message["seq"]))
+            if frames:
+                yield b"".join(frames)
     
     except Exception as e:
         error_msg = str(e)
@@ -1059,182 +865,100 @@ async def stream_pnl_data(
                     "error": f"PnL tracking error: {error_msg}",
                     "timestamp": datetime.now().isoformat()
                 }
-                yield f"data: {json.dumps(error_data)}\n\n"
+                yield sse_event(error_data)
                 return
             
             from datetime import datetime as dt, timezone, timedelta
-            hist_client = dbt.Historical(key=settings.DATABENTO_KEY)
             end = dt.now(timezone.utc)
             start = end - timedelta(minutes=5)
             
-            all_variants = []
-            for sym in symbols:
-                all_variants.extend(_root_symbol_variants(sym))
-            all_variants = list(dict.fromkeys([v for v in all_variants if v]))
+            data_symbols = symbology.price_symbols(symbols)
             
-            if all_variants and positions:
-                result = hist_client.timeseries.get_range(
-                    dataset=DATASET,
-                    start=start.isoformat(),
-                    end=end.isoformat(),
-                    symbols=all_variants,
-                    schema="ohlcv-1m",
-                )
-                df = result.to_df()
+            if data_symbols and positions:
+                df = await historical_executor.run("recent_bars", fetch_range_df, data_symbols, start, end)
                 
                 # Calculate PnL using historical data
-                for pos in positions:
-                    net_pos = pos.get("netPos") or 0
-                    if net_pos != 0:
-                        symbol_name = pos.get("symbol")
-                        account_id = pos.get("accountId")
-                        net_price = pos.get("netPrice") or 0
-                        contract_id = pos.get("contractId")
-                        contract_details = contract_details_cache.get(contract_id, {"valuePerPoint": 50, "tickSize": 0.25})
-                        
-                        current_price = net_price
-                        symbol_variants = _root_symbol_variants(symbol_name)
-                        for variant in symbol_variants:
-                            symbol_data = df[df.index.get_level_values('symbol') == variant]
-                            if not symbol_data.empty:
-                                latest = symbol_data.iloc[-1]
-                                current_price = float(latest['close'])
-                                break
-                        
-                        price_diff = current_price - net_price
-                        unrealized_pnl = price_diff * net_pos * contract_details.get("valuePerPoint", 50)
-                        
-                        pnl_data = {
-                            "symbol": symbol_name,
-                            "accountId": account_id,
-                            "accountNickname": pos.get("accountNickname", ""),
-                            "accountDisplayName": pos.get("accountDisplayName", ""),
-                            "netPos": net_pos,
-                            "entryPrice": net_price,
-                            "currentPrice": current_price,
-                            "unrealizedPnL": round(unrealized_pnl, 2),
-                            "bidPrice": current_price,
-                            "askPrice": current_price,
-                            "timestamp": datetime.now().isoformat(),
-                            "positionKey": f"{symbol_name}:{account_id}",
-                            "source": "historical_fallback"
-                        }
-                        yield f"data: {json.dumps(pnl_data)}\n\n"
+                now = datetime.now().isoformat()
+                for row in historical_pnl_rows(
+                    positions, last_close_by_symbol(df), contract_details_cache, fill_missing_with_entry=True
+                ):
+                    pnl_data = {
+                        **row,
+                        "bidPrice": row["currentPrice"],
+                        "askPrice": row["currentPrice"],
+                        "timestamp": now,
+                        "positionKey": f"{row['symbol']}:{row['accountId']}",
+                        "source": "historical_fallback"
+                    }
+                    yield sse_event(pnl_data)
         except:
             error_data = {
                 "error": f"PnL tracking error: {error_msg}",
                 "timestamp": datetime.now().isoformat()
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield sse_event(error_data)
     
     finally:
-        # Try to close the DataBento client if it exists
-        try:
-            if 'client' in locals() and client:
-                if hasattr(client, 'close'):
-                    client.close()
-        except Exception:
-            pass
+        # Release the quote subscription; this also runs when the disconnect watcher cancels the stream
+        subscriptions.release(user, connection_id)
+        if 'subscriber' in locals():
+            await quote_feed.unsubscribe(subscriber)
+            # Kept for as long as the registry keeps the symbols
+            await save_pnl_resume(user_id, stream_id, generation, positions, contract_details_cache)
 
 
 @router.get("/sse/pnl")
 async def sse_pnl_stream(
     user_id: UUID,
     request: Request,
+    last_event_id: str | None = None,
+    stream_id: str | None = None,
     db: Session = Depends(get_db)
 ):
     """
     SSE endpoint to stream real-time profit and loss (PnL) for user's positions
     
+    Args:
+        last_event_id: Resume after this event, like the Last-Event-ID header
+        stream_id: The stream_id of the connected status of the stream this one resumes
+    
     Returns:
         Server-Sent Events stream with real-time PnL data
     """
+    user = stream_user(request, user_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Sign in again, or pass user_id without a session cookie, to stream PnL")
+    since = _last_event_id(request, last_event_id)
+    resume = await load_pnl_resume(user_id, stream_id) if since is not None and stream_id else None
+    if resume is not None:
+        # A live stream dropped moments ago: skip the positions, contract and market-status lookups
+        print(f"[PnL SSE] Resuming stream {stream_id} for user {user_id} after event {since}")
+        generation, positions_dict, contract_details_cache = resume
+        return StreamingResponse(
+            stream_until_disconnect(
+                request,
+                stream_pnl_data(user_id, user, request, positions_dict, contract_details_cache, stream_id, generation, since),
+                "PnL SSE",
+            ),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            }
+        )
+    
+    stream_id = stream_id or uuid4().hex
+    # Read first: an order finishing during the loads below then discards this stream's resume state
+    generation = await pnl_resume_generation(user_id)
+    
     # Fetch positions data and contract details BEFORE starting the stream
     # This allows us to close the database session immediately
     positions_dict = []
     contract_details_cache = {}
     
     try:
-        positions = await get_positions(db, user_id)
-        # Convert Pydantic models to dicts for serialization
-        for pos in positions:
-            if isinstance(pos, dict):
-                positions_dict.append(pos)
-            else:
-                # Convert Pydantic model to dict
-                positions_dict.append({
-                    "id": getattr(pos, "id", None),
-                    "accountId": getattr(pos, "accountId", None),
-                    "contractId": getattr(pos, "contractId", None),
-                    "accountNickname": getattr(pos, "accountNickname", None),
-                    "symbol": getattr(pos, "symbol", None),
-                    "netPos": getattr(pos, "netPos", 0),
-                    "netPrice": getattr(pos, "netPrice", 0),
-                    "bought": getattr(pos, "bought", 0),
-                    "boughtValue": getattr(pos, "boughtValue", 0),
-                    "sold": getattr(pos, "sold", 0),
-                    "soldValue": getattr(pos, "soldValue", 0),
-                    "accountDisplayName": getattr(pos, "accountDisplayName", None),
-                })
-        
-        # Fetch contract details for all positions while we still have the DB session
-        account_ids = {str(p.get("accountId") or getattr(p, "accountId", None)) for p in positions_dict if (p.get("netPos") or getattr(p, "netPos", 0) or 0) != 0}
-        if account_ids:
-            sub_accounts = (
-                db.query(SubBrokerAccount)
-                .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
-                .all()
-            )
-            sub_map = {s.sub_account_id: s for s in sub_accounts}
-            
-            # Get unique contract IDs
-            unique_contracts = {}
-            for pos in positions_dict:
-                net_pos = pos.get("netPos") or 0
-                if net_pos != 0:
-                    contract_id = pos.get("contractId")
-                    account_id = str(pos.get("accountId"))
-                    if contract_id and account_id in sub_map:
-                        sba = sub_map[account_id]
-                        key = (sba.is_demo, contract_id)
-                        if key not in unique_contracts:
-                            unique_contracts[key] = {
-                                "contract_id": contract_id,
-                                "is_demo": sba.is_demo,
-                                "broker_account": db.query(BrokerAccount)
-                                    .filter(BrokerAccount.user_broker_id == sba.user_broker_id)
-                                    .first()
-                            }
-            
-            # Fetch contract details for all unique contracts
-            for (is_demo, contract_id), info in unique_contracts.items():
-                if info["broker_account"]:
-                    try:
-                        contract_item = await get_contract_item(
-                            contract_id, info["broker_account"].access_token, is_demo=is_demo
-                        )
-                        if contract_item:
-                            contract_maturity = await get_contract_maturity_item(
-                                contract_item["contractMaturityId"], info["broker_account"].access_token, is_demo=is_demo
-                            )
-                            if contract_maturity:
-                                product_item = await get_product_item(
-                                    contract_maturity["productId"], info["broker_account"].access_token, is_demo=is_demo
-                                )
-                                if product_item:
-                                    contract_details_cache[contract_id] = {
-                                        "valuePerPoint": product_item.get("valuePerPoint", 50),
-                                        "tickSize": product_item.get("tickSize", 0.25),
-                                        "symbol": contract_item.get("name", "")
-                                    }
-                    except Exception:
-                        # Use defaults
-                        contract_details_cache[contract_id] = {
-                            "valuePerPoint": 50,
-                            "tickSize": 0.25,
-                            "symbol": ""
-                        }
-        
+        positions_dict, contract_details_cache = await load_positions(db, user_id)
         symbols = list({p.get("symbol") for p in positions_dict if (p.get("netPos") or 0) != 0}) or []
     except Exception:
         positions_dict = []
@@ -1242,7 +966,11 @@ async def sse_pnl_stream(
     
     # Database session will be automatically closed when the dependency exits
     
-    if symbols:
+    books = await _cached_books(symbols) if symbols else {}
+    if symbols and _books_fresh(books, symbols):
+        # The quote feed hands the cached top of book over on subscribe
+        print(f"[PnL SSE] Cached books for {symbols}, skipping the market status check")
+    elif symbols:
         print(f"[PnL SSE] Checking market status for symbols: {symbols}")
         open_flag, reason = await is_market_open(symbols)
         print(f"[PnL SSE] Market status result: open={open_flag}, reason={reason}")
@@ -1252,81 +980,54 @@ async def sse_pnl_stream(
             async def historical_pnl_fallback():
                 from datetime import datetime as dt, timezone, timedelta
                 try:
-                    client = dbt.Historical(key=settings.DATABENTO_KEY)
+                    # A cached book is the closing book; Historical is only asked for symbols without one
+                    cached = positions_by_symbol(
+                        [p for p in positions_dict if p.get("symbol") in books], contract_details_cache
+                    )
+                    for symbol, symbol_positions in cached.items():
+                        book = books[symbol]
+                        for row in quote_pnl(
+                            symbol, symbol_positions, book["bid_price"], book["ask_price"], book["last_price"]
+                        ):
+                            yield sse_event({**row, "source": "cached_book", "status": "market_closed", "reason": reason})
+                    cold = [s for s in symbols if s not in books]
+                    
                     end = dt.now(timezone.utc)
                     start = end - timedelta(minutes=5)  # Get last 5 minutes of data
                     
-                    # Build symbol variants
-                    all_variants = []
-                    for sym in symbols:
-                        all_variants.extend(_root_symbol_variants(sym))
-                    all_variants = list(dict.fromkeys([v for v in all_variants if v]))
+                    # Front month for parents, raw symbols as they are
+                    data_symbols = symbology.price_symbols(cold)
                     
-                    if all_variants:
-                        result = client.timeseries.get_range(
-                            dataset=DATASET,
-                            start=start.isoformat(),
-                            end=end.isoformat(),
-                            symbols=all_variants,
-                            schema="ohlcv-1m",
-                        )
-                        df = result.to_df()
+                    if data_symbols:
+                        df = await historical_executor.run("recent_bars", fetch_range_df, data_symbols, start, end)
                         
                         # Calculate PnL for each position using historical closing price
-                        for pos in positions_dict:
-                            net_pos = pos.get("netPos") or 0
-                            if net_pos != 0:
-                                symbol_name = pos.get("symbol")
-                                account_id = pos.get("accountId")
-                                net_price = pos.get("netPrice") or 0
-                                contract_id = pos.get("contractId")
-                                
-                                # Get contract details
-                                contract_details = contract_details_cache.get(contract_id, {
-                                    "valuePerPoint": 50,
-                                    "tickSize": 0.25,
-                                    "symbol": symbol_name
-                                })
-                                
-                                # Find latest price for this symbol
-                                current_price = net_price  # Default to entry price
-                                symbol_variants = _root_symbol_variants(symbol_name)
-                                for variant in symbol_variants:
-                                    symbol_data = df[df.index.get_level_values('symbol') == variant]
-                                    if not symbol_data.empty:
-                                        latest = symbol_data.iloc[-1]
-                                        current_price = float(latest['close'])
-                                        break
-                                
-                                # Calculate unrealized PnL
-                                price_diff = current_price - net_price
-                                unrealized_pnl = price_diff * net_pos * contract_details.get("valuePerPoint", 50)
-                                
-                                pnl_data = {
-                                    "symbol": symbol_name,
-                                    "accountId": account_id,
-                                    "accountNickname": pos.get("accountNickname", ""),
-                                    "accountDisplayName": pos.get("accountDisplayName", ""),
-                                    "netPos": net_pos,
-                                    "entryPrice": net_price,
-                                    "currentPrice": current_price,
-                                    "unrealizedPnL": unrealized_pnl,
-                                    "bidPrice": current_price,
-                                    "askPrice": current_price,
-                                    "timestamp": datetime.now().isoformat(),
-                                    "positionKey": f"{symbol_name}:{account_id}",
-                                    "source": "historical",
-                                    "status": "market_closed",
-                                    "reason": reason
-                                }
-                                yield f"data: {json.dumps(pnl_data)}\n\n"
+                        now = datetime.now().isoformat()
+                        for row in historical_pnl_rows(
+                            [p for p in positions_dict if p.get("symbol") in cold],
+                            last_close_by_symbol(df),
+                            contract_details_cache,
+                            fill_missing_with_entry=True,
+                        ):
+                            pnl_data = {
+                                **row,
+                                "bidPrice": row["currentPrice"],
+                                "askPrice": row["currentPrice"],
+                                "timestamp": now,
+                                "positionKey": f"{row['symbol']}:{row['accountId']}",
+                                "source": "historical",
+                                "status": "market_closed",
+                                "reason": reason
+                            }
+                            yield sse_event(pnl_data)
                     
+                    if books or data_symbols:
                         # Send market closed status
-                        payload = {"status": "market_closed", "reason": reason, "source": "historical"}
-                        yield f"data: {json.dumps(payload)}\n\n"
+                        payload = {"status": "market_closed", "reason": reason, "source": "historical" if data_symbols else "cached_book"}
+                        yield sse_event(payload)
                 except Exception as e:
                     error_data = {"status": "market_closed", "reason": f"historical_fallback_error: {str(e)}"}
-                    yield f"data: {json.dumps(error_data)}\n\n"
+                    yield sse_event(error_data)
             
             return StreamingResponse(
                 historical_pnl_fallback(),
@@ -1340,7 +1041,11 @@ async def sse_pnl_stream(
 
     # Pass positions_dict and contract_details_cache instead of db session to avoid holding connection
     return StreamingResponse(
-        stream_pnl_data(user_id, request, positions_dict, contract_details_cache),
+        stream_until_disconnect(
+            request,
+            stream_pnl_data(user_id, user, request, positions_dict, contract_details_cache, stream_id, generation),
+            "PnL SSE",
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -1355,7 +1060,12 @@ async def get_historical_chart(
     symbol: str,
     start: str,
     end: str,
-    schema: str = "ohlcv-1m"
+    schema: str = "ohlcv-1m",
+    format: str = "records",
+    timeframe: str | None = None,
+    max_points: int | None = Query(None, ge=DOWNSAMPLE_MIN_POINTS),
+    downsample: str = "lttb",
+    live: bool = False,
 ):
     """
     Get historical OHLCV data for a symbol
@@ -1365,10 +1075,40 @@ async def get_historical_chart(
         start: Start time in ISO format (e.g., "2022-06-06T20:50:00")
         end: End time in ISO format (e.g., "2022-06-06T21:00:00")
         schema: Data schema (default: "ohlcv-1m" for 1-minute candles)
+        format: "records" (list of candles), "columns" (parallel arrays with
+            epoch-second times), "arrow" (Arrow IPC stream) or "dbn" (raw DBN)
+        timeframe: Build bars of this size (e.g. "3m", "15m", "4h") from the
+            cached 1-minute bars instead of passing `schema` to DataBento;
+            daily bars follow the CME trading day (17:00 CT open)
+        max_points: Downsample to at most this many bars in total, split
+            across the symbols returned (at least 3 each, capped at
+            HISTORICAL_MAX_POINTS; defaults to it when timeframe is set)
+        downsample: "lttb" or "minmax"
+        live: Append the live bars (see /sse/bars) after the historical end;
+            implies the 1-minute cache path
     
     Returns:
-        Historical OHLCV data as JSON
+        Historical OHLCV data, already encoded
     """
+    if format not in HISTORICAL_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format}', expected one of {', '.join(HISTORICAL_FORMATS)}"
+        )
+    aggregated = timeframe is not None or max_points is not None or live
+    if aggregated:
+        try:
+            timeframe_seconds(timeframe or "1m")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if downsample not in DOWNSAMPLE_METHODS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported downsample '{downsample}', expected one of {', '.join(DOWNSAMPLE_METHODS)}"
+            )
+        if format == "dbn":
+            raise HTTPException(status_code=400, detail="format=dbn cannot be combined with timeframe, max_points or live")
+        max_points = min(max_points or HISTORICAL_MAX_POINTS, HISTORICAL_MAX_POINTS)
     try:
         # Check if API key is available
         if not settings.DATABENTO_KEY:
@@ -1377,116 +1117,57 @@ async def get_historical_chart(
                 detail="DATABENTO_KEY environment variable not set"
             )
         
-        # Parse and adjust times to ensure they're within available data range
-        from datetime import datetime, timezone, timedelta
-        
-        # Parse input times
-        start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-        
-        # DataBento typically has data available up to a few minutes ago
-        # Adjust end time to be 5 minutes before current time to be safe
-        current_time = datetime.now(timezone.utc)
-        safe_end_time = current_time - timedelta(minutes=5)
-        
-        # Use the earlier of: requested end time or safe end time
-        if end_dt > safe_end_time:
-            end_dt = safe_end_time
-            print(f"⚠️ Adjusted end time to {end_dt.isoformat()} to stay within available data range")
-        
-        # Ensure start time is not after end time
-        if start_dt >= end_dt:
-            # If start is after or equal to end, go back 1 hour from end
-            start_dt = end_dt - timedelta(hours=1)
-            print(f"⚠️ Adjusted start time to {start_dt.isoformat()} to ensure valid range")
-        
-        # Convert back to ISO strings for the API call
+        start_dt, end_dt = clamp_range(start, end)
+        # Parents (ES.FUT) chart their front month
+        data_symbol = symbology.price_symbol(symbol)
+        print(f"📊 Fetching historical data for {data_symbol} from {start_dt.isoformat()} to {end_dt.isoformat()}")
+        if aggregated:
+            # Zoom and timeframe changes are served from the 1-minute cache
+            frame = await historical_executor.run("historical_bars", one_minute_bars.get, data_symbol, start_dt, end_dt)
+            if live:
+                # Live bars are labelled with the symbol the chart subscribed to
+                frame = merge_live_tail(frame.assign(symbol=symbol), symbol)
+            frame = resample_bars(frame, timeframe or "1m")
+            frame = downsample_bars(frame, max_points, downsample)
+            schema = "ohlcv-1m"
+        else:
+            historical_data, end_dt = await historical_executor.run(
+                "historical_range", fetch_ohlcv, data_symbol, start_dt, end_dt, schema
+            )
+            if format == "dbn":
+                return Response(
+                    content=historical_data.raw,
+                    media_type="application/octet-stream",
+                    headers={"X-DBN-Compression": str(historical_data.compression)},
+                )
+            # to_df decodes the whole range; keep it off the event loop too
+            frame = await historical_executor.run("historical_frame", ohlcv_frame, historical_data, data_symbol)
         start_iso = start_dt.isoformat()
         end_iso = end_dt.isoformat()
+        print(f"✅ Fetched {len(frame)} historical candles for {symbol}")
         
-        print(f"📊 Fetching historical data for {symbol} from {start_iso} to {end_iso}")
-        
-        # Create a historical client
-        client = dbt.Historical(key=settings.DATABENTO_KEY)
-        
-        # Try to request historical OHLCV data with retry logic
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                historical_data = client.timeseries.get_range(
-                    dataset=DATASET,
-                    start=start_iso,
-                    end=end_iso,
-                    symbols=[symbol],
-                    schema=schema,
-                )
-                break  # Success, exit retry loop
-                
-            except Exception as api_error:
-                error_msg = str(api_error)
-                
-                # Check if it's the specific "data_end_after_available_end" error
-                if "data_end_after_available_end" in error_msg and retry_count < max_retries - 1:
-                    retry_count += 1
-                    print(f"⚠️ Retry {retry_count}/{max_retries}: {error_msg}")
-                    
-                    # Extract the available end time from the error message if possible
-                    # Format: "data available up to '2025-10-29 05:20:00+00:00'"
-                    match = re.search(r"data available up to '([^']+)'", error_msg)
-                    if match:
-                        available_end_str = match.group(1)
-                        try:
-                            available_end = datetime.fromisoformat(available_end_str)
-                            # Set end time to 1 minute before available end
-                            end_dt = available_end - timedelta(minutes=1)
-                            end_iso = end_dt.isoformat()
-                            print(f"🔄 Adjusted end time to {end_iso} based on available data range")
-                        except:
-                            # If parsing fails, just subtract more time
-                            end_dt = end_dt - timedelta(minutes=10)
-                            end_iso = end_dt.isoformat()
-                            print(f"🔄 Fallback: Adjusted end time to {end_iso}")
-                    else:
-                        # If we can't parse the available end time, subtract more time
-                        end_dt = end_dt - timedelta(minutes=10)
-                        end_iso = end_dt.isoformat()
-                        print(f"🔄 Fallback: Adjusted end time to {end_iso}")
-                    
-                    continue  # Retry with adjusted time
-                else:
-                    # Re-raise the error if it's not the specific error or we've exhausted retries
-                    raise api_error
-        
-        # Convert to DataFrame
-        df = historical_data.to_df().reset_index()
-        
-        # Convert DataFrame to records
-        records = []
-        for _, row in df.iterrows():
-            record = {
-                "timestamp": row.get("ts_event", ""),
-                "symbol": row.get("symbol", symbol),
-                "open": float(row.get("open", 0)),
-                "high": float(row.get("high", 0)),
-                "low": float(row.get("low", 0)),
-                "close": float(row.get("close", 0)),
-                "volume": int(row.get("volume", 0)),
-            }
-            records.append(record)
-        
-        print(f"✅ Fetched {len(records)} historical candles for {symbol}")
+        if format == "arrow":
+            return Response(
+                content=to_arrow_ipc(frame),
+                media_type="application/vnd.apache.arrow.stream",
+            )
         
-        return {
+        payload = {
             "symbol": symbol,
             "start": start_iso,
             "end": end_iso,
             "schema": schema,
-            "count": len(records),
-            "data": records
+            "timeframe": timeframe,
+            "count": len(frame),
+            "data": to_columns(frame) if format == "columns" else to_records(frame),
         }
+        # Returned as a response so FastAPI does not re-walk thousands of bars
+        return FastJSONResponse(content=payload)
         
+    except HTTPException:
+        raise
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out fetching historical data")
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Error fetching historical data: {error_msg}")
@@ -0,0 +1,338 @@
+"""One WebSocket per browser tab for every live topic.
+
+Instead of an EventSource per stream, the client opens /stream/ws once
+and adds or removes topics over it:
+
+    {"op": "subscribe", "topic": "quotes", "symbols": ["ES.FUT"]}
+    {"op": "unsubscribe", "topic": "quotes", "symbols": ["ES.FUT"]}
+    {"op": "subscribe", "topic": "pnl"}
+
+Topics:
+    quotes     top of book for the symbols subscribed so far
+    pnl        unrealized PnL of the user's open positions
+    positions  the user's positions
+    orders     group order fan-out results, one event per follower, then done
+
+Quotes and PnL come from the shared quote feed, as for the SSE routes.
+Positions are fetched once per connection and shared by pnl and
+positions. When one of the user's group orders is done, on any worker,
+they are fetched again and both topics restart. Subscribing to pnl or
+positions again does the same.
+
+Every server message is a JSON array of {"topic", "data"} events: the
+ones that queued up while the socket was busy. A tab that falls behind
+gets the newest quote per symbol, as with SSE.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+from app.db.session import SessionLocal
+from app.services.historical_executor_service import historical_executor
+from app.services.historical_service import fetch_range_df
+from app.services.market_bus_service import market_bus
+from app.services.order_dispatch_service import ORDER_EVENTS_CHANNEL_PREFIX
+from app.services.pnl_service import (
+    historical_pnl_rows,
+    last_close_by_symbol,
+    load_positions,
+    positions_by_symbol,
+    quote_pnl,
+)
+from app.services.quote_feed_service import quote_feed
+from app.services.subscription_registry_service import stream_user, subscriptions
+from app.services.symbology_service import symbology
+
+router = APIRouter()
+
+CLIENT_STREAM_TOPICS = ("quotes", "pnl", "positions", "orders")
+# Events buffered for a slow socket before topics wait for it
+CLIENT_STREAM_QUEUE_SIZE = 256
+
+
+class _ClientStream:
+    def __init__(self, websocket: WebSocket, user_id: UUID, user: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.user = user
+        # Subscription registry key prefix for this socket's topics
+        self.connection_id = uuid.uuid4().hex[:12]
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_STREAM_QUEUE_SIZE)
+        self.topics: set[str] = set()
+        self.quote_symbols: set[str] = set()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._positions: asyncio.Task | None = None
+        self._order_events: asyncio.Queue = asyncio.Queue()
+
+    async def emit(self, topic: str, data: dict) -> None:
+        await self.outbox.put({"topic": topic, "data": data})
+
+    async def send(self) -> None:
+        while True:
+            batch = [await self.outbox.get()]
+            while not self.outbox.empty():
+                batch.append(self.outbox.get_nowait())
+            await self.websocket.send_text(dumps(batch).decode())
+
+    def _start(self, topic: str, coro) -> None:
+        self._stop(topic)
+        self._tasks[topic] = asyncio.create_task(coro)
+
+    def _stop(self, topic: str) -> None:
+        task = self._tasks.pop(topic, None)
+        if task is not None:
+            task.cancel()
+
+    def _drop_positions(self) -> None:
+        """Forget the cached positions, cancelling a fetch still in flight."""
+        if self._positions is not None:
+            self._positions.cancel()
+            self._positions = None
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        if self._positions is not None:
+            tasks.append(self._positions)
+        for task in tasks:
+            task.cancel()
+        # Let the topics' finally blocks release their quote subscriptions
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---- client ops ----------------------------------------------------------
+
+    async def handle(self, message: dict) -> None:
+        op, topic = message.get("op"), message.get("topic")
+        if op not in ("subscribe", "unsubscribe") or topic not in CLIENT_STREAM_TOPICS:
+            await self.emit("error", {"error": f"Unknown op {op!r} or topic {topic!r}", "topics": CLIENT_STREAM_TOPICS})
+            return
+        subscribe = op == "subscribe"
+        if topic == "quotes":
+            symbols = {s.strip() for s in message.get("symbols") or [] if isinstance(s, str) and s.strip()}
+            wanted = self.quote_symbols | symbols if subscribe else self.quote_symbols - symbols
+            if wanted != self.quote_symbols:
+                self.quote_symbols = wanted
+                if wanted:
+                    self._start("quotes", self._quotes(sorted(wanted)))
+                else:
+                    self._stop("quotes")
+            subscribe = bool(wanted)
+        elif subscribe and topic in ("pnl", "positions"):
+            if topic in self.topics:
+                # Subscribing again refetches positions, for both topics that share them
+                self._restart_positions_topics()
+            else:
+                self._start(topic, self._run_positions_topic(topic))
+        elif not subscribe:
+            self._stop(topic)
+        if subscribe:
+            self.topics.add(topic)
+        else:
+            self.topics.discard(topic)
+            if not self.topics & {"pnl", "positions"}:
+                self._drop_positions()
+        status = {"status": "subscribed" if subscribe else "unsubscribed", "timestamp": datetime.now().isoformat()}
+        if topic == "quotes":
+            status["symbols"] = sorted(self.quote_symbols)
+        await self.emit(topic, status)
+
+    def _run_positions_topic(self, topic: str):
+        return self._pnl() if topic == "pnl" else self._positions_topic()
+
+    def _restart_positions_topics(self) -> None:
+        # The topics still waiting on the dropped fetch are restarted with it
+        self._drop_positions()
+        for topic in ("pnl", "positions"):
+            if topic in self.topics:
+                self._start(topic, self._run_positions_topic(topic))
+
+    # ---- topics ----------------------------------------------------------------
+
+    async def _quotes(self, symbols: list[str]) -> None:
+        if not settings.DATABENTO_KEY:
+            await self.emit("quotes", {"error": "DATABENTO_KEY environment variable not set"})
+            return
+        # Parents (ES.FUT) stream their front month; events report the requested symbol
+        data_symbols = {symbology.price_symbol(s): s for s in symbols}
+        key = f"{self.connection_id}:quotes"
+        subscriptions.hold(self.user, key, symbols)
+        subscriber = None
+        try:
+            # The cached book of each symbol goes out at once
+            subscriber = await quote_feed.subscribe(list(data_symbols))
+            while True:
+                for message in await subscriber.get():
+                    if "error" in message:
+                        await self.emit("quotes", {"error": message["error"], "timestamp": message.get("timestamp")})
+                        continue
+                    await self.emit("quotes", {
+                        "symbol": data_symbols[message["symbol"]],
+                        "instrument_id": message["instrument_id"],
+                        "timestamp": str(message["ts_event"]),
+                        "bid_price": message["bid_price"],
+                        "ask_price": message["ask_price"],
+                        "bid_size": message["bid_size"],
+                        "ask_size": message["ask_size"],
+                        "last_price": message["last_price"],
+                        "record_type": message["record_type"],
+                        "id": message["seq"],
+                    })
+        finally:
+            subscriptions.release(self.user, key)
+            if subscriber is not None:
+                await quote_feed.unsubscribe(subscriber)
+
+    async def _load_positions(self) -> tuple[list[dict], dict[int, dict]]:
+        """The user's positions and contract details, fetched once for pnl and positions."""
+        if self._positions is None:
+            self._positions = asyncio.create_task(self._fetch_positions())
+        return await asyncio.shield(self._positions)
+
+    async def _fetch_positions(self) -> tuple[list[dict], dict[int, dict]]:
+        # Its own session: the socket outlives any request-scoped one
+        db = SessionLocal()
+        try:
+            return await load_positions(db, self.user_id)
+        finally:
+            db.close()
+
+    async def _positions_topic(self) -> None:
+        try:
+            positions, _ = await self._load_positions()
+        except Exception as e:
+            await self.emit("positions", {"error": f"Failed to load positions: {e}"})
+            return
+        await self.emit("positions", {"positions": positions, "timestamp": datetime.now().isoformat()})
+
+    async def _pnl(self) -> None:
+        try:
+            positions, contract_details_cache = await self._load_positions()
+        except Exception as e:
+            await self.emit("pnl", {"error": f"Failed to load positions: {e}"})
+            return
+        symbol_to_positions = positions_by_symbol(positions, contract_details_cache)
+        if not symbol_to_positions:
+            await self.emit("pnl", {"status": "no_positions", "timestamp": datetime.now().isoformat()})
+            return
+        if not settings.DATABENTO_KEY:
+            await self.emit("pnl", {"error": "DATABENTO_KEY environment variable not set"})
+            return
+        # Parents stream their front month; PnL reports the position symbol
+        data_symbols = {symbology.price_symbol(s): s for s in symbol_to_positions}
+        key = f"{self.connection_id}:pnl"
+        subscriptions.hold(self.user, key, list(symbol_to_positions))
+        subscriber = None
+        try:
+            subscriber = await quote_feed.subscribe(list(data_symbols))
+            # Symbols never quoted yet start from the last historical close
+            cold = [s for s in data_symbols if quote_feed.latest(s) is None]
+            if cold:
+                await self._historical_pnl(positions, contract_details_cache, cold, {data_symbols[s] for s in cold})
+            while True:
+                for message in await subscriber.get():
+                    if "error" in message:
+                        await self.emit("pnl", {"error": message["error"], "timestamp": message.get("timestamp")})
+                        continue
+                    symbol = data_symbols[message["symbol"]]
+                    for row in quote_pnl(
+                        symbol,
+                        symbol_to_positions[symbol],
+                        message["bid_price"],
+                        message["ask_price"],
+                        message["last_price"],
+                    ):
+                        await self.emit("pnl", {**row, "id": message["seq"]})
+        finally:
+            subscriptions.release(self.user, key)
+            if subscriber is not None:
+                await quote_feed.unsubscribe(subscriber)
+
+    async def _historical_pnl(
+        self,
+        positions: list[dict],
+        contract_details_cache: dict[int, dict],
+        data_symbols: list[str],
+        symbols: set[str],
+    ) -> None:
+        end = datetime.now(timezone.utc)
+        try:
+            df = await historical_executor.run(
+                "recent_bars", fetch_range_df, data_symbols, end - timedelta(minutes=5), end
+            )
+        except Exception as e:
+            print(f"[Client Stream] Initial historical PnL failed: {e}")
+            return
+        now = datetime.now().isoformat()
+        for row in historical_pnl_rows(
+            [p for p in positions if p.get("symbol") in symbols],
+            last_close_by_symbol(df),
+            contract_details_cache,
+            fill_missing_with_entry=False,
+        ):
+            await self.emit("pnl", {
+                **row,
+                "bidPrice": row["currentPrice"],
+                "askPrice": row["currentPrice"],
+                "timestamp": now,
+                "positionKey": f"{row['symbol']}:{row['accountId']}",
+                "source": "initial_historical",
+            })
+
+    # ---- order events ----------------------------------------------------------
+
+    def on_order_event(self, payload: bytes) -> None:
+        self._order_events.put_nowait(loads(payload))
+
+    async def orders(self) -> None:
+        while True:
+            event = await self._order_events.get()
+            if "orders" in self.topics:
+                await self.emit("orders", event)
+            if event.get("type") == "done":
+                # Positions have changed; refetch them for the topics that use them
+                self._restart_positions_topics()
+
+
+@router.websocket("/ws")
+async def client_stream(websocket: WebSocket, user_id: UUID):
+    """
+    Multiplexed live stream for one browser tab
+
+    Args:
+        user_id: Whose positions, PnL and orders to stream
+
+    Receives {"op": "subscribe" | "unsubscribe", "topic": ..., "symbols": [...]} messages;
+    sends JSON arrays of {"topic": ..., "data": ...} events.
+    """
+    user = stream_user(websocket, user_id)
+    if user is None:
+        # The access_token cookie did not verify
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    stream = _ClientStream(websocket, user_id, user)
+    channel = f"{ORDER_EVENTS_CHANNEL_PREFIX}{user_id}"
+    await market_bus.subscribe(channel, stream.on_order_event)
+    sender = asyncio.create_task(stream.send())
+    orders = asyncio.create_task(stream.orders())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = loads(text)
+            except Exception:
+                await stream.emit("error", {"error": "Messages must be JSON"})
+                continue
+            if not isinstance(message, dict):
+                await stream.emit("error", {"error": "Messages must be JSON objects"})
+                continue
+            await stream.handle(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await market_bus.unsubscribe(channel, stream.on_order_event)
+        sender.cancel()
+        orders.cancel()
+        await stream.close()
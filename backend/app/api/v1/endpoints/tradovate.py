@@ -58,7 +58,7 @@ async def homepage(request: Request, db: Session = Depends(get_db)):
         <p>Trial?: {me.get('isTrial')}</p>
         <a href="/logout"><h3>Logout</h3></a>
         """
-        user_brokers_list = add_tradovate_broker(db, broker_add)
+        user_brokers_list = await add_tradovate_broker(db, broker_add)
         return RedirectResponse(f"{FRONTEND_URL}/broker")
     else:
         # No token - show login link
@@ -8,6 +8,7 @@ from app.api.v1.endpoints import (
     sub_broker,
     group,
     databento,
+    stream,
     user_contract
 )
 
@@ -20,4 +21,5 @@ api_router.include_router(sub_broker.router, prefix="/subbroker", tags=["subbrok
 api_router.include_router(tradovate.router, prefix="/tradovate", tags=["tradovate"])
 api_router.include_router(group.router, prefix="/group", tags=["group"])
 api_router.include_router(databento.router, prefix="/databento", tags=["databento"])
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"])
 api_router.include_router(user_contract.router, prefix="/usercontract", tags=["usercontract"])
\ No newline at end of file
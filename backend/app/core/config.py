@@ -56,6 +56,12 @@ class Settings(BaseSettings):
 
     DATABENTO_KEY: str = Field(env="DATABENTO_KEY")
 
+    # Daily symbology map, reloaded on restart (relative to the backend directory)
+    SYMBOLOGY_CACHE_PATH: str = Field(".cache/symbology.json", env="SYMBOLOGY_CACHE_PATH")
+
+    # Pub/sub shared by API workers for market data; empty keeps it in-process (one worker)
+    MARKET_BUS_URL: str = Field("", env="MARKET_BUS_URL")
+
     class Config:
         # Path to the .env file (relative to project root)
         env_file = ".env"
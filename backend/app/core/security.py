@@ -1,3 +1,6 @@
+import threading
+import time
+from collections import OrderedDict
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
@@ -5,6 +8,53 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Decoded tokens are reused for a few seconds so a login/refresh burst does
+# not re-verify the same signature over and over.
+TOKEN_CACHE_TTL_SECONDS = 30
+TOKEN_CACHE_MAX_ENTRIES = 4096
+
+
+class TokenCache:
+    """Small LRU of verified token -> claims, bounded by TTL and the token's own exp."""
+
+    def __init__(self, ttl_seconds: float = TOKEN_CACHE_TTL_SECONDS, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token: str, claims: dict) -> None:
+        ttl = self.ttl_seconds
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = min(ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_access_token_cache = TokenCache()
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -24,3 +74,16 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify one of our access tokens and return its claims.
+
+    Raises ``jose.JWTError`` when the token is invalid or expired.
+    """
+    claims = _access_token_cache.get(token)
+    if claims is not None:
+        return claims
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    _access_token_cache.put(token, claims)
+    return claims
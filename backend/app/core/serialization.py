@@ -0,0 +1,61 @@
+"""JSON encoding for REST responses and SSE frames.
+
+orjson encodes datetimes, UUIDs and numpy values natively. The stdlib
+json module and FastAPI's jsonable_encoder walk those in Python.
+Pydantic models go through their compiled serializer. SSE frames are
+built by wrapping the JSON body in pre-encoded byte constants.
+
+Unlike the stdlib, NaN and infinite floats encode as null; JSON.parse
+rejects the stdlib's NaN.
+"""
+from decimal import Decimal
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+_SSE_ID = b"id: "
+_SSE_DATA = b"data: "
+_SSE_END = b"\n\n"
+SSE_KEEPALIVE = b": keep-alive\n\n"
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        # pandas Timestamp and other datetime-likes orjson does not know
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys: bool = False) -> bytes:
+    return orjson.dumps(obj, default=_default, option=(_OPTIONS | orjson.OPT_SORT_KEYS) if sort_keys else _OPTIONS)
+
+
+def loads(data: bytes | str):
+    return orjson.loads(data)
+
+
+def sse_event(obj, event_id: int | None = None) -> bytes:
+    """One SSE `data:` frame carrying obj as JSON, with an `id:` line if event_id is given."""
+    if event_id is None:
+        return _SSE_DATA + dumps(obj) + _SSE_END
+    return _SSE_ID + str(event_id).encode() + b"\n" + _SSE_DATA + dumps(obj) + _SSE_END
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    An endpoint that returns one of these directly also skips FastAPI's
+    response_model validation and jsonable_encoder pass, which only repeat
+    work for models the service layer has already validated.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
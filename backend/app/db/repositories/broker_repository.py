@@ -1,7 +1,8 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 from sqlalchemy.future import select
+from sqlalchemy import insert, and_, tuple_
 from app.models.broker_account import BrokerAccount, SubBrokerAccount
 from app.models.group_broker import GroupBroker
 from app.schemas.broker import (
@@ -78,11 +79,58 @@ def user_add_sub_broker(
     return db.query(SubBrokerAccount).all()
 
 
-def user_get_brokers(
-    db: Session, broker_filter: BrokerFilter
-) -> list[BrokerInfo] | None:
+def user_add_sub_brokers_bulk(
+    db: Session, sub_broker_adds: list[SubBrokerAdd]
+) -> list[SubBrokerAccount]:
+    """Insert many sub-accounts with one batched INSERT ... RETURNING and a single commit.
+
+    Nicknames continue the same "Sub {type} {n}" sequence as
+    user_add_sub_broker, with the counter read once per (user, type).
+    Returns only the inserted rows.
+    """
+    if not sub_broker_adds:
+        return []
+    counters: dict[tuple, int] = {}
+    rows = []
+    for sub_broker_add in sub_broker_adds:
+        key = (sub_broker_add.user_id, sub_broker_add.type)
+        if key not in counters:
+            counters[key] = (
+                db.query(func.count(SubBrokerAccount.id))
+                .filter(SubBrokerAccount.user_id == sub_broker_add.user_id)
+                .filter(SubBrokerAccount.type == sub_broker_add.type)
+                .scalar()
+            )
+        rows.append(
+            {
+                "user_id": sub_broker_add.user_id,
+                "nickname": f"Sub {sub_broker_add.type} {counters[key]}",
+                "type": sub_broker_add.type,
+                "account_type": sub_broker_add.account_type,
+                "user_broker_id": sub_broker_add.user_broker_id,
+                "broker_account_id": sub_broker_add.broker_account_id,
+                "sub_account_id": sub_broker_add.sub_account_id,
+                "sub_account_name": sub_broker_add.sub_account_name,
+                "status": sub_broker_add.status,
+                "is_active": True,
+                "is_demo": sub_broker_add.is_demo,
+            }
+        )
+        counters[key] += 1
+    db_sub_brokers = db.scalars(
+        insert(SubBrokerAccount).returning(SubBrokerAccount), rows
+    ).all()
+    # RETURNING already loaded the rows; don't expire them and re-select one by one
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+    return db_sub_brokers
+
 
-    query = select(BrokerAccount)
+def _filter_brokers(query, broker_filter: BrokerFilter):
     if broker_filter.id != None:
         query = query.filter(BrokerAccount.id == broker_filter.id)
     if broker_filter.user_id != None:
@@ -97,15 +145,71 @@ def user_get_brokers(
         query = query.filter(BrokerAccount.type == broker_filter.type)
     if broker_filter.status != None:
         query = query.filter(BrokerAccount.status == broker_filter.status)
+    return query
+
+
+def user_get_brokers(
+    db: Session, broker_filter: BrokerFilter
+) -> list[BrokerInfo] | None:
+
+    query = _filter_brokers(select(BrokerAccount), broker_filter)
     result = db.execute(query)
     brokers = result.scalars().all()
     return brokers
 
 
+def _sub_broker_counts():
+    """live / paper / enable counts as COUNT(*) FILTER aggregates."""
+    return (
+        func.count().filter(SubBrokerAccount.is_demo == False).label("live"),
+        func.count().filter(SubBrokerAccount.is_demo == True).label("paper"),
+        func.count().filter(SubBrokerAccount.is_active == True).label("enable"),
+    )
+
+
+def user_get_brokers_with_summary(
+    db: Session, broker_filter: BrokerFilter
+) -> list[BrokerInfo]:
+    """Filtered brokers with their sub-account summary, in a single query.
+
+    The counts are grouped per (user_id, user_broker_id) and restricted to
+    the brokers matched by the filter, so no sub-account rows are loaded.
+    """
+    matched = _filter_brokers(
+        select(BrokerAccount.user_id, BrokerAccount.user_broker_id), broker_filter
+    )
+    summary = (
+        select(SubBrokerAccount.user_id, SubBrokerAccount.user_broker_id, *_sub_broker_counts())
+        .where(tuple_(SubBrokerAccount.user_id, SubBrokerAccount.user_broker_id).in_(matched))
+        .group_by(SubBrokerAccount.user_id, SubBrokerAccount.user_broker_id)
+        .subquery()
+    )
+    query = select(
+        BrokerAccount,
+        func.coalesce(summary.c.live, 0),
+        func.coalesce(summary.c.paper, 0),
+        func.coalesce(summary.c.enable, 0),
+    ).outerjoin(
+        summary,
+        and_(
+            summary.c.user_id == BrokerAccount.user_id,
+            summary.c.user_broker_id == BrokerAccount.user_broker_id,
+        ),
+    )
+    brokers = []
+    for broker, live, paper, enable in db.execute(_filter_brokers(query, broker_filter)).all():
+        broker.live = live
+        broker.paper = paper
+        broker.enable = enable
+        brokers.append(broker)
+    return brokers
+
+
 def user_get_sub_brokers(
     db: Session, sub_broker_filter: SubBrokerFilter
 ) -> list[SubBrokerInfo] | None:
-    query = select(SubBrokerAccount)
+    # The parent broker (and its access token) comes back in the same query
+    query = select(SubBrokerAccount).options(joinedload(SubBrokerAccount.broker_account))
     if sub_broker_filter.id != None:
         query = query.filter(SubBrokerAccount.id == sub_broker_filter.id)
     if sub_broker_filter.user_id != None:
@@ -247,31 +351,15 @@ def user_change_sub_brokers(db: Session, sub_broker_change: SubBrokerChange):
 def user_get_summary_sub_broker(
     db: Session, user_id: UUID, user_broker_id: str
 ) -> SummarySubBrokers:
-    enable_sub_broker_accounts = (
-        db.query(SubBrokerAccount)
-        .filter(SubBrokerAccount.user_id == user_id)
-        .filter(SubBrokerAccount.user_broker_id == user_broker_id)
-        .filter(SubBrokerAccount.is_active == True)
-        .all()
-    )
-    paper_sub_broker_accounts = (
-        db.query(SubBrokerAccount)
-        .filter(SubBrokerAccount.user_id == user_id)
-        .filter(SubBrokerAccount.user_broker_id == user_broker_id)
-        .filter(SubBrokerAccount.is_demo == True)
-        .all()
-    )
-    live_sub_broker_accounts = (
-        db.query(SubBrokerAccount)
-        .filter(SubBrokerAccount.user_id == user_id)
-        .filter(SubBrokerAccount.user_broker_id == user_broker_id)
-        .filter(SubBrokerAccount.is_demo == False)
-        .all()
-    )
+    live, paper, enable = db.execute(
+        select(*_sub_broker_counts())
+        .where(SubBrokerAccount.user_id == user_id)
+        .where(SubBrokerAccount.user_broker_id == user_broker_id)
+    ).one()
     summary_sub_broker = SummarySubBrokers(
-        live=len(live_sub_broker_accounts),
-        paper=len(paper_sub_broker_accounts),
-        enable=len(enable_sub_broker_accounts),
+        live=live,
+        paper=paper,
+        enable=enable,
     )
     return summary_sub_broker
 
@@ -315,186 +403,59 @@ def user_get_tokens_for_websocket(
             return websocket_token
     return None
 
-def user_get_all_tokens_for_websocket(
-    db: Session, user_id: UUID
-) -> list[WebSocketTokens]:
-    """Get WebSocket tokens for all broker accounts for a user"""
-    from app.utils.tradovate import get_renew_token
-    from app.db.repositories.broker_repository import user_refresh_websocket_token
-    from sqlalchemy import text
-    import asyncio
-    
-    # CRITICAL FIX: Use raw SQL to bypass ALL ORM caching and connection state issues
-    # This ensures we ALWAYS query the database directly and see committed data
-    # Even if the ORM session has cached data or connection pooling issues
-    
-    try:
-        # Use raw SQL query - this bypasses all ORM caching and queries the database directly
-        # This is the ONLY reliable way to see newly committed data from other sessions
-        raw_result = db.execute(
-            text("""
-                SELECT id, user_id, username, password, nickname, type, last_sync, status, 
-                       user_broker_id, access_token, md_access_token, 
-                       websocket_access_token, websocket_md_access_token, expire_in
-                FROM broker_accounts 
-                WHERE user_id = :user_id
-            """),
-            {"user_id": str(user_id)}
-        )
-        
-        # Convert raw results to BrokerAccount objects manually
-        broker_accounts = []
-        for row in raw_result:
-            row_dict = dict(row._mapping)
-            # Debug: print what we got from the database
-            print(f"[WebSocket Tokens] Raw row data: id={row_dict.get('id')}, access_token present={bool(row_dict.get('access_token'))}, md_access_token present={bool(row_dict.get('md_access_token'))}, websocket_access_token present={bool(row_dict.get('websocket_access_token'))}")
-            
-            # Create BrokerAccount instance - we need to handle UUID conversion
-            from uuid import UUID as UUIDType
-            try:
-                if isinstance(row_dict.get('id'), str):
-                    row_dict['id'] = UUIDType(row_dict['id'])
-                if isinstance(row_dict.get('user_id'), str):
-                    row_dict['user_id'] = UUIDType(row_dict['user_id'])
-            except Exception as e:
-                print(f"[WebSocket Tokens] UUID conversion error: {e}")
-            
-            # Create BrokerAccount object - we'll use the ORM model but populate it manually
-            # This creates a detached instance (not in session) which is fine for read-only access
-            broker = BrokerAccount()
-            for key, value in row_dict.items():
-                if hasattr(broker, key):
-                    try:
-                        # Set the attribute - set even if None to preserve database state
-                        setattr(broker, key, value)
-                        # Debug: verify the attribute was set for token fields
-                        if key in ['access_token', 'md_access_token', 'websocket_access_token', 'websocket_md_access_token']:
-                            actual_value = getattr(broker, key, None)
-                            print(f"[WebSocket Tokens] Set {key} = {bool(actual_value)} (value: {str(actual_value)[:50] if actual_value else 'None'}...)")
-                    except Exception as e:
-                        print(f"[WebSocket Tokens] Warning: Could not set {key} on BrokerAccount: {e}, value type: {type(value)}, value: {str(value)[:50] if value else 'None'}")
-            broker_accounts.append(broker)
-            
-            # Final verification - check what we actually have
-            print(f"[WebSocket Tokens] Broker {broker.id} final state:")
-            print(f"  - access_token: {bool(broker.access_token)} ({len(broker.access_token) if broker.access_token else 0} chars)")
-            print(f"  - md_access_token: {bool(broker.md_access_token)} ({len(broker.md_access_token) if broker.md_access_token else 0} chars)")
-            print(f"  - websocket_access_token: {bool(broker.websocket_access_token)} ({len(broker.websocket_access_token) if broker.websocket_access_token else 0} chars)")
-            print(f"  - websocket_md_access_token: {bool(broker.websocket_md_access_token)} ({len(broker.websocket_md_access_token) if broker.websocket_md_access_token else 0} chars)")
-        
-        print(f"[WebSocket Tokens] Raw SQL query returned {len(broker_accounts)} broker accounts for user {user_id}")
-        if len(broker_accounts) > 0:
-            print(f"[WebSocket Tokens] Broker account IDs: {[str(b.id) for b in broker_accounts]}")
-    except Exception as e:
-        print(f"[WebSocket Tokens] ERROR: Raw SQL query failed: {e}")
-        print(f"[WebSocket Tokens] Falling back to ORM query")
-        # Fallback to ORM query if raw SQL fails
-        broker_accounts = (
-            db.query(BrokerAccount)
-            .filter(BrokerAccount.user_id == user_id)
-            .all()
-        )
-        print(f"[WebSocket Tokens] ORM query returned {len(broker_accounts)} broker accounts")
-    tokens_list = []
-    for broker in broker_accounts:
-        # Check if any active sub-broker is demo to determine endpoint
-        is_demo = False
-        sub_brokers = (
-            db.query(SubBrokerAccount)
-            .filter(SubBrokerAccount.broker_account_id == broker.id)
-            .filter(SubBrokerAccount.is_active == True)
-            .all()
+def user_get_websocket_token_rows(db: Session, user_id: UUID):
+    """One row per broker of the user with its stored tokens and demo flag.
+
+    is_demo is true when any active sub-account is demo, as in
+    user_get_tokens_for_websocket, but computed in the same grouped query.
+    """
+    query = (
+        select(
+            BrokerAccount.id,
+            BrokerAccount.access_token,
+            BrokerAccount.md_access_token,
+            BrokerAccount.websocket_access_token,
+            BrokerAccount.websocket_md_access_token,
+            (
+                func.count(SubBrokerAccount.id).filter(
+                    and_(SubBrokerAccount.is_active == True, SubBrokerAccount.is_demo == True)
+                ) > 0
+            ).label("is_demo"),
         )
-        if sub_brokers:
-            # If any active sub-broker is demo, use demo endpoint
-            is_demo = any(sub.is_demo for sub in sub_brokers)
-        
-        # Try to refresh tokens before using them
-        access_token_to_use = None
-        md_access_token_to_use = None
-        
-        # Prefer websocket tokens if available, but refresh them first
-        if broker.websocket_access_token:
-            try:
-                # Try to refresh the token with retry
-                new_tokens = None
-                for attempt in range(2):  # Try twice
-                    try:
-                        new_tokens = get_renew_token(broker.websocket_access_token)
-                        if new_tokens:
-                            break
-                    except Exception as e:
-                        if attempt == 0:
-                            print(f"[WebSocket Tokens] Token refresh attempt {attempt + 1} failed for broker {broker.id}: {e}")
-                        else:
-                            print(f"[WebSocket Tokens] Token refresh failed for broker {broker.id} after 2 attempts: {e}")
-                
-                if new_tokens:
-                    # Update in database (async function needs to be called properly)
-                    # For now, use the refreshed tokens directly
-                    access_token_to_use = new_tokens.access_token
-                    md_access_token_to_use = new_tokens.md_access_token
-                    print(f"[WebSocket Tokens] Successfully refreshed websocket token for broker {broker.id}")
-                else:
-                    # Use existing token if refresh failed
-                    access_token_to_use = broker.websocket_access_token
-                    md_access_token_to_use = broker.websocket_md_access_token
-                    print(f"[WebSocket Tokens] Using existing websocket token for broker {broker.id} (refresh returned None)")
-            except Exception as e:
-                # Fallback to existing token
-                access_token_to_use = broker.websocket_access_token
-                md_access_token_to_use = broker.websocket_md_access_token
-                print(f"[WebSocket Tokens] Exception refreshing websocket token for broker {broker.id}: {e}, using existing token")
-        
-        # Fallback to regular access tokens if websocket tokens don't exist
-        # Use access_token even if md_access_token is NULL - we can refresh to get both
-        elif broker.access_token:
-            try:
-                # Try to refresh the token with retry
-                new_tokens = None
-                for attempt in range(2):  # Try twice
-                    try:
-                        new_tokens = get_renew_token(broker.access_token)
-                        if new_tokens:
-                            break
-                    except Exception as e:
-                        if attempt == 0:
-                            print(f"[WebSocket Tokens] Token refresh attempt {attempt + 1} failed for broker {broker.id}: {e}")
-                        else:
-                            print(f"[WebSocket Tokens] Token refresh failed for broker {broker.id} after 2 attempts: {e}")
-                
-                if new_tokens:
-                    access_token_to_use = new_tokens.access_token
-                    md_access_token_to_use = new_tokens.md_access_token
-                    print(f"[WebSocket Tokens] Successfully refreshed regular token for broker {broker.id}")
-                else:
-                    # If refresh fails, use existing tokens (even if md_access_token is None)
-                    # The frontend might be able to work with just access_token
-                    access_token_to_use = broker.access_token
-                    md_access_token_to_use = broker.md_access_token if broker.md_access_token else None
-                    print(f"[WebSocket Tokens] Using existing regular token for broker {broker.id} (refresh returned None, md_token: {bool(md_access_token_to_use)})")
-            except Exception as e:
-                access_token_to_use = broker.access_token
-                md_access_token_to_use = broker.md_access_token if broker.md_access_token else None
-                print(f"[WebSocket Tokens] Exception refreshing regular token for broker {broker.id}: {e}, using existing token (md_token: {bool(md_access_token_to_use)})")
-        
-        # Require access_token, but md_access_token can be None (we'll try to refresh it)
-        if access_token_to_use:
-            # If md_access_token is missing, try to get it from the refreshed token
-            # If refresh already happened above, md_access_token_to_use should be set
-            # If not, we'll use None and let the frontend handle it
-            websocket_token = WebSocketTokens(
-                id=broker.id,
-                access_token=access_token_to_use,
-                md_access_token=md_access_token_to_use if md_access_token_to_use else access_token_to_use,  # Fallback to access_token if md_token is None
-                is_demo=is_demo
-            )
-            tokens_list.append(websocket_token)
-            print(f"[WebSocket Tokens] Added token for broker {broker.id} (is_demo: {is_demo}, md_token: {bool(md_access_token_to_use)})")
-        else:
-            print(f"[WebSocket Tokens] Skipping broker {broker.id} - missing access_token (access_token: {bool(access_token_to_use)}, md_access_token: {bool(md_access_token_to_use)})")
-    print(f"[WebSocket Tokens] Returning {len(tokens_list)} tokens for user {user_id}")
-    return tokens_list
+        .outerjoin(SubBrokerAccount, SubBrokerAccount.broker_account_id == BrokerAccount.id)
+        .where(BrokerAccount.user_id == user_id)
+        .group_by(BrokerAccount.id)
+    )
+    return db.execute(query).all()
+
+
+def user_get_active_venues(db: Session, broker_ids: list[UUID]):
+    """Distinct (broker_account_id, is_demo) pairs that have an active sub-account."""
+    query = (
+        select(SubBrokerAccount.broker_account_id, SubBrokerAccount.is_demo)
+        .where(SubBrokerAccount.broker_account_id.in_(broker_ids))
+        .where(SubBrokerAccount.is_active == True)
+        .distinct()
+    )
+    return db.execute(query).all()
+
+
+def user_store_renewed_tokens(db: Session, broker_id: UUID, tokens: Tokens, websocket: bool) -> None:
+    if websocket:
+        values = {
+            "websocket_access_token": tokens.access_token,
+            "websocket_md_access_token": tokens.md_access_token,
+        }
+    else:
+        values = {
+            "access_token": tokens.access_token,
+            "md_access_token": tokens.md_access_token,
+        }
+    db.query(BrokerAccount).filter(BrokerAccount.id == broker_id).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
 
 def user_get_tokens_for_group(
     db: Session, group_id: UUID
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+from app.models.order_dispatch import OrderDispatch
+
+
+def _follower(client_order_id: str, sub_broker_id: str):
+    return (
+        OrderDispatch.client_order_id == client_order_id,
+        OrderDispatch.sub_broker_id == sub_broker_id,
+    )
+
+
+def claim_order_dispatch(
+    db: Session, client_order_id: str, sub_broker_id: str, pending_timeout: timedelta
+) -> OrderDispatch | None:
+    """Insert a pending dispatch row and commit it.
+
+    db must be a session of its own, as the claim is committed at once.
+    Returns None when this caller now owns the dispatch, or the existing row
+    when another request (possibly on another worker) claimed it first. A
+    claim left pending for longer than pending_timeout is taken over.
+    """
+    db_dispatch = OrderDispatch(
+        client_order_id=client_order_id,
+        sub_broker_id=sub_broker_id,
+        status="pending",
+    )
+    db.add(db_dispatch)
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+    if _take_over_order_dispatch(db, client_order_id, sub_broker_id, pending_timeout):
+        return None
+    return get_order_dispatch(db, client_order_id, sub_broker_id)
+
+
+def claim_order_dispatches(
+    db: Session, client_order_id: str, sub_broker_ids: list[str], pending_timeout: timedelta
+) -> dict[str, OrderDispatch]:
+    """Claim every follower of one order with a single insert and commit.
+
+    db must be a session of its own, as the claims are committed at once.
+    Returns the rows other requests claimed first, by sub_broker_id; the
+    caller now owns the other followers. Claims left pending for longer than
+    pending_timeout are taken over.
+    """
+    existing = {
+        row.sub_broker_id: row
+        for row in db.query(OrderDispatch).filter(
+            OrderDispatch.client_order_id == client_order_id,
+            OrderDispatch.sub_broker_id.in_(sub_broker_ids),
+        )
+    }
+    db.add_all(
+        OrderDispatch(client_order_id=client_order_id, sub_broker_id=sub_broker_id, status="pending")
+        for sub_broker_id in sub_broker_ids
+        if sub_broker_id not in existing
+    )
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request claimed some of them meanwhile; settle them one by one
+        db.rollback()
+        claimed = {}
+        for sub_broker_id in sub_broker_ids:
+            row = claim_order_dispatch(db, client_order_id, sub_broker_id, pending_timeout)
+            if row is not None:
+                claimed[sub_broker_id] = row
+        return claimed
+    for sub_broker_id, row in list(existing.items()):
+        if row.status == "pending" and _take_over_order_dispatch(db, client_order_id, sub_broker_id, pending_timeout):
+            del existing[sub_broker_id]
+    return existing
+
+
+def _take_over_order_dispatch(
+    db: Session, client_order_id: str, sub_broker_id: str, pending_timeout: timedelta
+) -> bool:
+    # Only one of several retries can move a stale claim's created_at forward
+    taken_over = (
+        db.query(OrderDispatch)
+        .filter(
+            *_follower(client_order_id, sub_broker_id),
+            OrderDispatch.status == "pending",
+            OrderDispatch.created_at < func.now() - pending_timeout,
+        )
+        .update({"created_at": func.now(), "error": None}, synchronize_session=False)
+    )
+    db.commit()
+    return bool(taken_over)
+
+
+def get_order_dispatch(db: Session, client_order_id: str, sub_broker_id: str) -> OrderDispatch | None:
+    return db.query(OrderDispatch).filter(*_follower(client_order_id, sub_broker_id)).first()
+
+
+def finish_order_dispatches(
+    db: Session, client_order_id: str, results: dict[str, tuple[str, int | None, str | None]]
+) -> None:
+    """Record (status, order_id, error) per sub_broker_id in one commit."""
+    for sub_broker_id, (status, order_id, error) in results.items():
+        db.query(OrderDispatch).filter(*_follower(client_order_id, sub_broker_id)).update(
+            {"status": status, "order_id": order_id, "error": error},
+            synchronize_session=False,
+        )
+    db.commit()
+
+
+def release_order_dispatches(db: Session, client_order_id: str, sub_broker_ids: list[str]) -> None:
+    """Drop pending claims whose orders were never sent, so a retry sends them."""
+    db.query(OrderDispatch).filter(
+        OrderDispatch.client_order_id == client_order_id,
+        OrderDispatch.sub_broker_id.in_(sub_broker_ids),
+        OrderDispatch.status == "pending",
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def prune_order_dispatches(db: Session, older_than: timedelta) -> int:
+    deleted = (
+        db.query(OrderDispatch)
+        .filter(OrderDispatch.created_at < func.now() - older_than)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
@@ -4,7 +4,6 @@ from sqlalchemy.future import select
 from app.models.user import User
 from app.schemas.user import UserBase, UserRespond, UserFilter, UserData
 from app.schemas.email import OTP
-from app.core.security import hash_password
 import json
 import secrets
 from datetime import datetime, timezone
@@ -3,6 +3,7 @@ from .broker_account import BrokerAccount, SubBrokerAccount
 from .group import Group
 from .group_broker import GroupBroker
 from .user_contract import UserContract
+from .order_dispatch import OrderDispatch
 
 # Export all models so they can be imported from app.models
 __all__ = [
@@ -12,4 +13,5 @@ __all__ = [
     "Group",
     "GroupBroker",
     "UserContract",
+    "OrderDispatch",
 ]
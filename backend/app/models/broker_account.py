@@ -19,7 +19,7 @@ class BrokerAccount(Base):
     __tablename__ = "broker_accounts"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     username = Column(String, nullable=True)
     password = Column(String, nullable=True)
     nickname = Column(String, nullable=False)
@@ -42,7 +42,7 @@ class SubBrokerAccount(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     user_broker_id = Column(String, nullable=False)
-    broker_account_id = Column(UUID, ForeignKey('broker_accounts.id', ondelete='CASCADE'))
+    broker_account_id = Column(UUID, ForeignKey('broker_accounts.id', ondelete='CASCADE'), index=True)
     sub_account_id = Column(String, nullable=False)
     nickname = Column(String, nullable=False)
     sub_account_name = Column(String, nullable=False)
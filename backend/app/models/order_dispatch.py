@@ -0,0 +1,28 @@
+from sqlalchemy import (
+    Column,
+    String,
+    BigInteger,
+    DateTime,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.session import Base
+import uuid
+from sqlalchemy.sql import func
+
+
+class OrderDispatch(Base):
+    """One row per follower order sent for a client-generated order ID."""
+
+    __tablename__ = "order_dispatches"
+    __table_args__ = (
+        UniqueConstraint("client_order_id", "sub_broker_id", name="uq_order_dispatch_follower"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    client_order_id = Column(String(64), nullable=False, index=True)
+    sub_broker_id = Column(String, nullable=False)
+    status = Column(String(16), nullable=False)  # pending | sent | failed
+    order_id = Column(BigInteger, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
@@ -141,4 +141,6 @@ class WebSocketTokens(Tokens):
     is_demo: bool = False  # Whether this is a demo account (determines WebSocket endpoint)
 
 class Symbols(BaseModel):
-    symbols: list[str]
\ No newline at end of file
+    symbols: list[str]
+    # Replaces this earlier subscription instead of starting a new one
+    connection_id: str | None = None
\ No newline at end of file
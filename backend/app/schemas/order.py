@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -14,6 +14,8 @@ class MarketOrder(BaseModel):
     symbol: str
     quantity: int
     action: str
+    # Client-generated; resubmitting the same ID never re-sends follower orders
+    client_order_id: Optional[str] = Field(default=None, max_length=64)
 
 class LimitOrder(MarketOrder):
     price: float
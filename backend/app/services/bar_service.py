@@ -0,0 +1,205 @@
+"""Chart bars built from cached 1-minute OHLCV.
+
+Every timeframe (3m, 15m, 4h, 1d, ...) is derived from ohlcv-1m bars kept
+per symbol in OneMinuteBarCache, so changing the timeframe or zoom only
+re-aggregates what is already in memory. Only a range outside the cached
+span goes to Databento, and only the missing part is fetched.
+
+Overview zooms can be reduced to a target point count with LTTB (shape of
+the close series) or min-max (keeps each bucket's extremes).
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.historical_service import OHLCV_COLUMNS, fetch_ohlcv, ohlcv_frame
+
+BAR_CACHE_MAX_SYMBOLS = 64
+# Cached spans are extended rather than replaced when a request starts or
+# ends within this distance of them
+BAR_CACHE_MAX_GAP_SECONDS = 24 * 60 * 60
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+# LTTB always keeps the first and last bar, so fewer points cannot be honoured
+DOWNSAMPLE_MIN_POINTS = 3
+
+_TIMEFRAME_UNITS = {"m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+_DAY_SECONDS = 24 * 60 * 60
+# Daily bars follow the CME trading day, which opens at 17:00 Chicago time
+TRADING_DAY_TIMEZONE = "America/Chicago"
+TRADING_DAY_OPEN_HOUR = 17
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    """"15m" -> 900. Raises ValueError for anything that is not <n>m|h|d."""
+    match = re.fullmatch(r"(\d+)([mhd])", (timeframe or "").strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid timeframe '{timeframe}', expected e.g. 1m, 15m, 4h, 1d")
+    return int(match.group(1)) * _TIMEFRAME_UNITS[match.group(2)]
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({column: [] for column in OHLCV_COLUMNS})
+
+
+class OneMinuteBarCache:
+    def __init__(self, max_symbols: int = BAR_CACHE_MAX_SYMBOLS):
+        self.max_symbols = max_symbols
+        # symbol -> (covered start, covered end) in epoch seconds, bars sorted by time
+        self._entries: OrderedDict[str, tuple[int, int, pd.DataFrame]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, start_dt: datetime, end_dt: datetime) -> pd.DataFrame:
+        """1-minute bars in [start_dt, end_dt); blocking when a fetch is needed."""
+        start_s, end_s = int(start_dt.timestamp()), int(end_dt.timestamp())
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                self._entries.move_to_end(symbol)
+        if entry is not None and entry[0] <= start_s and end_s <= entry[1]:
+            return self._slice(entry[2], start_s, end_s)
+
+        if (
+            entry is not None
+            and start_s <= entry[1] + BAR_CACHE_MAX_GAP_SECONDS
+            and end_s >= entry[0] - BAR_CACHE_MAX_GAP_SECONDS
+        ):
+            # Only fetch the part(s) on either side of what we already hold
+            covered_start, covered_end, bars = entry
+            frames = [bars]
+            if start_s < covered_start:
+                frames.append(self._fetch(symbol, start_dt, datetime.fromtimestamp(covered_start, start_dt.tzinfo))[2])
+                covered_start = start_s
+            if end_s > covered_end:
+                _, fetched_end, tail = self._fetch(symbol, datetime.fromtimestamp(covered_end, end_dt.tzinfo), end_dt)
+                frames.append(tail)
+                covered_end = max(covered_end, fetched_end)
+            bars = (
+                pd.concat([f for f in frames if not f.empty] or [_empty_frame()], ignore_index=True)
+                .drop_duplicates(subset=["time", "symbol"], keep="last")
+                .sort_values("time", kind="stable")
+                .reset_index(drop=True)
+            )
+        else:
+            covered_start, covered_end, bars = self._fetch(symbol, start_dt, end_dt)
+
+        self._store(symbol, (covered_start, covered_end, bars))
+        return self._slice(bars, start_s, end_s)
+
+    def _fetch(self, symbol: str, start_dt: datetime, end_dt: datetime) -> tuple[int, int, pd.DataFrame]:
+        store, fetched_end = fetch_ohlcv(symbol, start_dt, end_dt, "ohlcv-1m")
+        bars = ohlcv_frame(store, symbol).sort_values("time", kind="stable").reset_index(drop=True)
+        return int(start_dt.timestamp()), int(fetched_end.timestamp()), bars
+
+    def _store(self, symbol: str, entry: tuple[int, int, pd.DataFrame]) -> None:
+        with self._lock:
+            self._entries[symbol] = entry
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_symbols:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _slice(bars: pd.DataFrame, start_s: int, end_s: int) -> pd.DataFrame:
+        times = bars["time"].to_numpy()
+        lo, hi = np.searchsorted(times, [start_s, end_s], side="left")
+        return bars.iloc[lo:hi]
+
+
+def _trading_day_buckets(times: pd.Series, days: int) -> pd.Series:
+    """Epoch seconds -> the 17:00 CT open of their (days-long) trading-day bucket."""
+    local = pd.to_datetime(times, unit="s", utc=True).dt.tz_convert(TRADING_DAY_TIMEZONE).dt.tz_localize(None)
+    # Shift so the 17:00 open falls on midnight of the trading date
+    shift = pd.Timedelta(hours=24 - TRADING_DAY_OPEN_HOUR)
+    trading_day = (local + shift).dt.floor("D").to_numpy().astype("datetime64[D]").astype(np.int64)
+    bucket_day = pd.to_datetime(trading_day // days * days, unit="D")
+    opens = (bucket_day - shift).tz_localize(TRADING_DAY_TIMEZONE).tz_convert("UTC")
+    return pd.Series(opens.asi8 // 1_000_000_000, index=times.index)
+
+
+def resample_bars(bars: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """Aggregate 1-minute bars into buckets of the given timeframe.
+
+    Intraday buckets are UTC-aligned. Whole-day buckets follow the CME
+    trading day and are stamped with its 17:00 CT open.
+    """
+    seconds = timeframe_seconds(timeframe)
+    if seconds == 60 or bars.empty:
+        return bars
+    if seconds % _DAY_SECONDS == 0:
+        bucketed = bars.assign(time=_trading_day_buckets(bars["time"], seconds // _DAY_SECONDS))
+    else:
+        bucketed = bars.assign(time=bars["time"] // seconds * seconds)
+    return (
+        bucketed.groupby(["symbol", "time"], sort=False)
+        .agg(open=("open", "first"), high=("high", "max"), low=("low", "min"),
+             close=("close", "last"), volume=("volume", "sum"))
+        .reset_index()
+        .sort_values("time", kind="stable")
+        .reset_index(drop=True)[OHLCV_COLUMNS]
+    )
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points to keep."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _minmax_indices(low: np.ndarray, high: np.ndarray, threshold: int) -> np.ndarray:
+    """Per bucket, the bars holding the lowest low and the highest high."""
+    n = len(low)
+    buckets = max(threshold // 2, 1)
+    if n <= threshold:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    order = np.arange(n)
+    frame = pd.DataFrame({"bucket": bucket, "low": low, "high": high, "i": order})
+    lows = frame.loc[frame.groupby("bucket")["low"].idxmin(), "i"].to_numpy()
+    highs = frame.loc[frame.groupby("bucket")["high"].idxmax(), "i"].to_numpy()
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def downsample_bars(bars: pd.DataFrame, max_points: int, method: str = "lttb") -> pd.DataFrame:
+    """At most max_points bars in total, chosen by LTTB or min-max.
+
+    The budget is split evenly across symbols, each keeping no fewer than
+    DOWNSAMPLE_MIN_POINTS.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Invalid downsample method '{method}', expected one of {', '.join(DOWNSAMPLE_METHODS)}")
+    max_points = max(max_points, DOWNSAMPLE_MIN_POINTS)
+    if len(bars) <= max_points:
+        return bars
+    groups = bars.groupby("symbol", sort=False)
+    max_points = max(max_points // groups.ngroups, DOWNSAMPLE_MIN_POINTS)
+    parts = []
+    for _, group in groups:
+        if method == "lttb":
+            keep = _lttb_indices(
+                group["time"].to_numpy(dtype="float64"), group["close"].to_numpy(dtype="float64"), max_points
+            )
+        else:
+            keep = _minmax_indices(group["low"].to_numpy(), group["high"].to_numpy(), max_points)
+        parts.append(group.iloc[keep])
+    return pd.concat(parts).sort_values("time", kind="stable").reset_index(drop=True)
+
+
+one_minute_bars = OneMinuteBarCache()
@@ -4,6 +4,8 @@ from fastapi import HTTPException, status, BackgroundTasks
 import json
 from uuid import UUID
 from datetime import datetime, date, time
+from time import perf_counter
+from typing import AsyncGenerator
 from app.schemas.broker import (
     BrokerConnect,
     BrokerInfo,
@@ -46,7 +48,9 @@ from app.schemas.tradovate import (
     TradovateStopBracket
 )
 from app.models.broker_account import BrokerAccount, SubBrokerAccount
+from app.models.group import Group
 from app.models.group_broker import GroupBroker
+from app.db.session import SessionLocal
 from app.utils.broker import getAccessTokenForTradoVate
 from app.utils.tradovate import (
     get_account_list,
@@ -67,11 +71,21 @@ from app.utils.tradovate import (
     tradovate_execute_market_order
 )
 import asyncio
+from app.services.order_dispatch_service import (
+    DispatchResult,
+    order_dispatch_store,
+    publish_order_event,
+    result_from_response,
+)
+from app.services.websocket_token_service import websocket_token_store
+from app.services.venue_index_service import venue_index
 from app.db.repositories.broker_repository import (
     user_add_broker,
     user_get_brokers,
+    user_get_brokers_with_summary,
     user_del_broker,
     user_add_sub_broker,
+    user_add_sub_brokers_bulk,
     user_get_sub_brokers,
     user_refresh_token,
     user_refresh_websocket_token,
@@ -81,6 +95,9 @@ from app.db.repositories.broker_repository import (
     user_get_tokens_for_websocket,
 )
 
+# Upper bound on per-account cashBalance/deps requests in flight at once
+BALANCE_FETCH_CONCURRENCY = 8
+
 
 def add_broker(db: Session, broker_connect: BrokerConnect) -> list[BrokerInfo]:
     response = getAccessTokenForTradoVate(broker_connect)
@@ -98,54 +115,36 @@ def add_broker(db: Session, broker_connect: BrokerConnect) -> list[BrokerInfo]:
 
 async def add_tradovate_broker(db: Session, broker_add: BrokerAdd) -> list[BrokerInfo]:
     broker_account = await user_add_broker(db, broker_add)
-    sub_demo_account_list = await get_account_list(broker_add.access_token, True)
-    sub_live_account_list = await get_account_list(broker_add.access_token, False)
-    if len(sub_demo_account_list):
-        for demo_account in sub_demo_account_list:
-            sub_demo_account = SubBrokerAdd(
-                user_id=broker_add.user_id,
-                broker_account_id=broker_account.id,
-                user_broker_id=str(broker_add.user_broker_id),
-                sub_account_id=str(demo_account["id"]),
-                sub_account_name=str(demo_account["name"]),
-                type=broker_add.type,
-                account_type=str(demo_account["accountType"]),
-                is_demo=True,
-                status=demo_account["active"],
-            )
-            user_add_sub_broker(db, sub_demo_account)
-    if len(sub_live_account_list):
-        for live_account in sub_live_account_list:
-            sub_live_account = SubBrokerAdd(
-                user_id=broker_add.user_id,
-                broker_account_id=broker_account.id,
-                user_broker_id=str(broker_add.user_broker_id),
-                sub_account_id=str(live_account["id"]),
-                sub_account_name=str(live_account["name"]),
-                type=broker_add.type,
-                account_type=str(live_account["accountType"]),
-                is_demo=False,
-                status=live_account["active"],
-            )
-            user_add_sub_broker(db, sub_live_account)
-    broker_filter = BrokerFilter(
-        id=broker_account.id,
+    # The two venues are independent; fetch them together
+    sub_demo_account_list, sub_live_account_list = await asyncio.gather(
+        get_account_list(broker_add.access_token, True),
+        get_account_list(broker_add.access_token, False),
     )
-    return get_brokers(db, broker_filter)
+    sub_broker_adds = [
+        SubBrokerAdd(
+            user_id=broker_add.user_id,
+            broker_account_id=broker_account.id,
+            user_broker_id=str(broker_add.user_broker_id),
+            sub_account_id=str(account["id"]),
+            sub_account_name=str(account["name"]),
+            type=broker_add.type,
+            account_type=str(account["accountType"]),
+            is_demo=is_demo,
+            status=account["active"],
+        )
+        for is_demo, account_list in ((True, sub_demo_account_list), (False, sub_live_account_list))
+        for account in account_list or []
+    ]
+    user_add_sub_brokers_bulk(db, sub_broker_adds)
+    venue_index.invalidate(broker_account.id)
+    websocket_token_store.invalidate_user(broker_add.user_id)
+    # Only the broker that was just added is returned
+    return get_brokers(db, BrokerFilter(id=broker_account.id))
 
 
 def get_brokers(db: Session, broker_filter: BrokerFilter) -> list[BrokerInfo] | None:
-    brokers = user_get_brokers(db, broker_filter)
-    fixed_brokers: list[BrokerInfo] = []
-    for broker in brokers:
-        summary_sub_broker = get_summary_sub_broker(
-            db, broker_filter.user_id, broker.user_broker_id
-        )
-        broker.live = summary_sub_broker.live
-        broker.paper = summary_sub_broker.paper
-        broker.enable = summary_sub_broker.enable
-        fixed_brokers.append(broker)
-    return fixed_brokers
+    # Brokers and their live/paper/enable counts come back in one round-trip
+    return user_get_brokers_with_summary(db, broker_filter)
 
 
 def get_summary_sub_broker(
@@ -154,6 +153,48 @@ def get_summary_sub_broker(
     return user_get_summary_sub_broker(db, user_id, user_broker_id)
 
 
+async def _get_sub_broker_balances(sub_broker_info_list) -> dict[str, float]:
+    """Balance per sub_account_id, fetched as one cashBalance/list call per token and venue.
+
+    If a bulk call fails, that group falls back to per-account
+    cashBalance/deps requests, at most BALANCE_FETCH_CONCURRENCY at a time.
+    """
+    groups: dict[tuple[str, bool], list] = {}
+    for sub_broker_info in sub_broker_info_list:
+        broker_account = sub_broker_info.broker_account
+        if broker_account is None or not broker_account.access_token:
+            continue
+        groups.setdefault((broker_account.access_token, sub_broker_info.is_demo), []).append(sub_broker_info)
+    if not groups:
+        return {}
+
+    keys = list(groups)
+    cash_balance_lists = await asyncio.gather(
+        *(get_cash_balances(token, is_demo) for token, is_demo in keys)
+    )
+    balances: dict[str, float] = {}
+    fallback: list[tuple[str, bool, str]] = []
+    for (token, is_demo), cash_balances in zip(keys, cash_balance_lists):
+        if cash_balances is None:
+            fallback.extend((token, is_demo, s.sub_account_id) for s in groups[(token, is_demo)])
+            continue
+        for cash_balance in cash_balances:
+            # Same as cashBalance/deps[0]: first balance listed for the account
+            balances.setdefault(str(cash_balance.get("accountId")), cash_balance.get("amount", 0))
+
+    if fallback:
+        semaphore = asyncio.Semaphore(BALANCE_FETCH_CONCURRENCY)
+
+        async def fetch(token: str, is_demo: bool, sub_account_id: str):
+            async with semaphore:
+                return sub_account_id, await get_account_balance(token, sub_account_id, is_demo)
+
+        for sub_account_id, response in await asyncio.gather(*(fetch(*f) for f in fallback)):
+            if response:
+                balances[sub_account_id] = response[0]["amount"]
+    return balances
+
+
 async def get_sub_brokers(
     db: Session, sub_broker_filter: SubBrokerFilter
 ) -> list[SubBrokerInfoPlus] | None:
@@ -161,41 +202,30 @@ async def get_sub_brokers(
     sub_broker_info_list = user_get_sub_brokers(db, sub_broker_filter)
     if sub_broker_info_list == None:
         return None
-    db_broker_account = (
-        db.query(BrokerAccount)
-        .filter(BrokerAccount.user_broker_id == sub_broker_filter.user_broker_id)
-        .first()
-    )
-    access_token = db_broker_account.access_token
-    if sub_broker_info_list:
-        for sub_broker_info in sub_broker_info_list:
-            response = await get_account_balance(
-                access_token, sub_broker_info.sub_account_id, sub_broker_info.is_demo
-            )
-            if response:
-                balance = response[0]["amount"]
-            else:
-                balance = 0
-            sub_broker_info_plus = SubBrokerInfoPlus(
-                user_id=sub_broker_info.user_id,
-                user_broker_id=sub_broker_info.user_broker_id,
-                sub_account_id=sub_broker_info.sub_account_id,
-                nickname=sub_broker_info.nickname,
-                sub_account_name=sub_broker_info.sub_account_name,
-                type=sub_broker_info.type,
-                account_type=sub_broker_info.account_type,
-                is_demo=sub_broker_info.is_demo,
-                status=sub_broker_info.status,
-                id=sub_broker_info.id,
-                last_sync=sub_broker_info.last_sync,
-                is_active=sub_broker_info.is_active,
-                balance=balance,
-            )
-            sub_broker_info_plus_list.append(sub_broker_info_plus)
+    balances = await _get_sub_broker_balances(sub_broker_info_list)
+    for sub_broker_info in sub_broker_info_list:
+        sub_broker_info_plus = SubBrokerInfoPlus(
+            user_id=sub_broker_info.user_id,
+            user_broker_id=sub_broker_info.user_broker_id,
+            sub_account_id=sub_broker_info.sub_account_id,
+            nickname=sub_broker_info.nickname,
+            sub_account_name=sub_broker_info.sub_account_name,
+            type=sub_broker_info.type,
+            account_type=sub_broker_info.account_type,
+            is_demo=sub_broker_info.is_demo,
+            status=sub_broker_info.status,
+            id=sub_broker_info.id,
+            last_sync=sub_broker_info.last_sync,
+            is_active=sub_broker_info.is_active,
+            balance=balances.get(sub_broker_info.sub_account_id, 0),
+        )
+        sub_broker_info_plus_list.append(sub_broker_info_plus)
     return sub_broker_info_plus_list
 
 
 def del_broker(db: Session, broker_id: UUID) -> list[BrokerInfo]:
+    websocket_token_store.forget_broker(broker_id)
+    venue_index.invalidate(broker_id)
     return user_del_broker(db, broker_id)
 
 
@@ -209,11 +239,13 @@ async def refresh_new_token(db: Session):
                 new_tokens = get_renew_token(broker.access_token)
                 if new_tokens:
                     await user_refresh_token(db, broker.id, new_tokens)
+                    websocket_token_store.update_broker(broker.id, new_tokens, websocket=False)
             # Refresh WebSocket tokens
             if getattr(broker, "websocket_access_token", None):
                 new_websocket_tokens = get_renew_token(broker.websocket_access_token)
                 if new_websocket_tokens:
                     await user_refresh_websocket_token(db, broker.id, new_websocket_tokens)
+                    websocket_token_store.update_broker(broker.id, new_websocket_tokens, websocket=True)
 
 
 def change_broker(db: Session, broker_change: BrokerChange):
@@ -221,201 +253,256 @@ def change_broker(db: Session, broker_change: BrokerChange):
 
 
 def change_sub_brokers(db: Session, sub_broker_change: SubBrokerChange):
-    return user_change_sub_brokers(db, sub_broker_change)
+    db_sub_broker_account = user_change_sub_brokers(db, sub_broker_change)
+    # is_active may have changed which venues the broker is read from
+    venue_index.invalidate(db_sub_broker_account.broker_account_id)
+    return db_sub_broker_account
 
 
-async def get_positions(db: Session, user_id: UUID):
-    positions_status: list[TradovatePositionListResponse] = []
-    positions_for_frontend: list[TradovatePositionListForFrontend] = []
-    db_broker_accounts = (
-        db.query(BrokerAccount)
-        .filter(BrokerAccount.user_id == user_id)
-        .all()
-    )
-    # Gather all demo/live calls concurrently across accounts
-    tasks = []
-    for db_broker_account in db_broker_accounts:
-        token = db_broker_account.access_token
-        tasks.append(get_position_list_of_demo_account(token))
-        tasks.append(get_position_list_of_live_account(token))
+async def _gather_lists(tasks) -> list[dict]:
+    items = []
     if tasks:
         results = await asyncio.gather(*tasks, return_exceptions=False)
         for res in results:
             if res:
-                positions_status.extend(res)
-    if positions_status != []:
-        account_ids = {str(p["accountId"]) for p in positions_status}
-        sub_accounts = (
-            db.query(SubBrokerAccount)
-            .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
-            .all()
-        )
-        sub_map = {s.sub_account_id: s for s in sub_accounts}
-        # Batch contract name lookups by (is_demo, contractId)
-        unique_keys = set()
-        for pos in positions_status:
-            sba = sub_map.get(str(pos["accountId"]))
+                items.extend(res)
+    return items
+
+
+def _sub_account_map(db: Session, *item_lists: list[dict]) -> dict[str, SubBrokerAccount]:
+    account_ids = {str(item["accountId"]) for items in item_lists for item in items}
+    if not account_ids:
+        return {}
+    sub_accounts = (
+        db.query(SubBrokerAccount)
+        .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
+        .all()
+    )
+    return {s.sub_account_id: s for s in sub_accounts}
+
+
+def _venue_tokens(db_broker_accounts: list[BrokerAccount], venues) -> dict[bool, str | None]:
+    # pick first available token per venue, preferring brokers that trade on it
+    tokens = {True: None, False: None}
+    for ba in db_broker_accounts:
+        for is_demo in venues.get(ba.id, ()):
+            tokens[is_demo] = tokens[is_demo] or ba.access_token
+    for ba in db_broker_accounts:
+        tokens[True] = tokens[True] or ba.access_token
+        tokens[False] = tokens[False] or ba.access_token
+    return tokens
+
+
+async def _resolve_contract_names(
+    sub_map: dict[str, SubBrokerAccount],
+    tokens: dict[bool, str | None],
+    *item_lists: list[dict],
+) -> dict[tuple[bool, int], str]:
+    # Batch contract name lookups by (is_demo, contractId)
+    unique_keys = set()
+    for items in item_lists:
+        for item in items:
+            sba = sub_map.get(str(item["accountId"]))
             if not sba:
                 continue
-            unique_keys.add((sba.is_demo, pos["contractId"]))
-        # Pick first available token per venue
-        # pick first available token per venue
-        tokens = {True: None, False: None}
-        for ba in db.query(BrokerAccount).filter(BrokerAccount.user_id == user_id).all():
-            tokens[True] = tokens[True] or ba.access_token
-            tokens[False] = tokens[False] or ba.access_token
-        fetch_tasks = [get_contract_item(cid, tokens[is_demo], is_demo) for (is_demo, cid) in unique_keys]
-        results = await asyncio.gather(*fetch_tasks, return_exceptions=True) if unique_keys else []
-        key_list = list(unique_keys)
-        contract_name_map = {}
-        for idx, res in enumerate(results):
-            try:
-                key = key_list[idx]
-                if res and isinstance(res, dict):
-                    contract_name_map[key] = res.get("name")
-            except Exception:
-                continue
-        for position in positions_status:
-            sba = sub_map.get(str(position["accountId"]))
-            if not sba or not sba.is_active:
-                continue
-            name = contract_name_map.get((sba.is_demo, position["contractId"]))
-            p = TradovatePositionListForFrontend(
-                id=position["id"],
-                accountId=position["accountId"],
-                contractId=position["contractId"],
-                accountNickname=sba.nickname,
-                symbol=name if name else str(position["contractId"]),
-                netPos=position["netPos"],
-                netPrice=position.get("netPrice", 0),
-                bought=position["bought"],
-                boughtValue=position["boughtValue"],
-                sold=position["sold"],
-                soldValue=position["soldValue"],
-                accountDisplayName=sba.sub_account_name,
-            )
-            positions_for_frontend.append(p)
+            unique_keys.add((sba.is_demo, item["contractId"]))
+    if not unique_keys:
+        return {}
+    key_list = list(unique_keys)
+    fetch_tasks = [get_contract_item(cid, tokens[is_demo], is_demo) for (is_demo, cid) in key_list]
+    results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
+    contract_name_map = {}
+    for key, res in zip(key_list, results):
+        if res and isinstance(res, dict):
+            contract_name_map[key] = res.get("name")
+    return contract_name_map
+
+
+def _positions_for_frontend(positions_status, sub_map, contract_name_map) -> list[TradovatePositionListForFrontend]:
+    positions_for_frontend = []
+    for position in positions_status:
+        sba = sub_map.get(str(position["accountId"]))
+        if not sba or not sba.is_active:
+            continue
+        name = contract_name_map.get((sba.is_demo, position["contractId"]))
+        p = TradovatePositionListForFrontend(
+            id=position["id"],
+            accountId=position["accountId"],
+            contractId=position["contractId"],
+            accountNickname=sba.nickname,
+            symbol=name if name else str(position["contractId"]),
+            netPos=position["netPos"],
+            netPrice=position.get("netPrice", 0),
+            bought=position["bought"],
+            boughtValue=position["boughtValue"],
+            sold=position["sold"],
+            soldValue=position["soldValue"],
+            accountDisplayName=sba.sub_account_name,
+        )
+        positions_for_frontend.append(p)
     return positions_for_frontend
 
 
-async def get_orders(db: Session, user_id: UUID):
-    order_status: list[TradovateOrderListResponse] = []
+def _orders_for_frontend(order_status, sub_map, contract_name_map) -> list[TradovateOrderForFrontend]:
     order_for_frontend = []
-    db_broker_accounts = (
-        db.query(BrokerAccount)
-        .filter(BrokerAccount.user_id == user_id)
-        .all()
-    )
-    tasks = []
-    for db_broker_account in db_broker_accounts:
-        token = db_broker_account.access_token
-        tasks.append(get_order_list_of_demo_account(token))
-        tasks.append(get_order_list_of_live_account(token))
-    if tasks:
-        results = await asyncio.gather(*tasks, return_exceptions=False)
-        for res in results:
-            if res:
-                order_status.extend(res)
-    if order_status != []:
-        account_ids = {str(o["accountId"]) for o in order_status}
-        sub_accounts = (
-            db.query(SubBrokerAccount)
-            .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
-            .all()
+    for order in order_status:
+        sba = sub_map.get(str(order["accountId"]))
+        if not sba or not sba.is_active:
+            continue
+        name = contract_name_map.get((sba.is_demo, order["contractId"]))
+        o = TradovateOrderForFrontend(
+            id=order["id"],
+            accountId=order["accountId"],
+            accountNickname=sba.nickname,
+            price=0,
+            contractId=order["contractId"],
+            timestamp=order["timestamp"],
+            action=order["action"],
+            ordStatus=order["ordStatus"],
+            executionProviderId=order.get("executionProviderId"),
+            archived=order["archived"],
+            external=order["external"],
+            admin=order["admin"],
+            symbol=name if name else str(order["contractId"]),
+            accountDisplayName=sba.sub_account_name,
         )
-        sub_map = {s.sub_account_id: s for s in sub_accounts}
-        # Batch contract names by (is_demo, contractId)
-        unique_keys = set()
-        for o in order_status:
-            sba = sub_map.get(str(o["accountId"]))
-            if not sba:
-                continue
-            unique_keys.add((sba.is_demo, o["contractId"]))
-        tokens = {True: None, False: None}
-        for ba in db.query(BrokerAccount).filter(BrokerAccount.user_id == user_id).all():
-            tokens[True] = tokens[True] or ba.access_token
-            tokens[False] = tokens[False] or ba.access_token
-        fetch_tasks = [get_contract_item(cid, tokens[is_demo], is_demo) for (is_demo, cid) in unique_keys]
-        results = await asyncio.gather(*fetch_tasks, return_exceptions=True) if unique_keys else []
-        key_list = list(unique_keys)
-        contract_name_map = {}
-        for idx, res in enumerate(results):
-            try:
-                key = key_list[idx]
-                if res and isinstance(res, dict):
-                    contract_name_map[key] = res.get("name")
-            except Exception:
-                continue
-        for order in order_status:
-            sba = sub_map.get(str(order["accountId"]))
-            if not sba or not sba.is_active:
-                continue
-            name = contract_name_map.get((sba.is_demo, order["contractId"]))
-            o = TradovateOrderForFrontend(
-                id=order["id"],
-                accountId=order["accountId"],
-                accountNickname=sba.nickname,
-                price=0,
-                contractId=order["contractId"],
-                timestamp=order["timestamp"],
-                action=order["action"],
-                ordStatus=order["ordStatus"],
-                executionProviderId=order.get("executionProviderId"),
-                archived=order["archived"],
-                external=order["external"],
-                admin=order["admin"],
-                symbol=name if name else str(order["contractId"]),
-                accountDisplayName=sba.sub_account_name,
-            )
-            order_for_frontend.append(o)
+        order_for_frontend.append(o)
     return order_for_frontend
 
 
-async def get_accounts(db: Session, user_id: UUID):
-    accounts_status: list[TradovateCashBalanceResponse] = []
+def _accounts_for_frontend(accounts_status, sub_map) -> list[TradovateAccountsForFrontend]:
     accounts_for_dashboard = []
-    db_broker_accounts = (
+    for account in accounts_status:
+        sba = sub_map.get(str(account["accountId"]))
+        if not sba or not sba.is_active:
+            continue
+        a = TradovateAccountsForFrontend(
+            id=account["id"],
+            accountId=account["accountId"],
+            accountNickname=sba.nickname,
+            timestamp=account["timestamp"],
+            currencyId=account["currencyId"],
+            amount=account["amount"],
+            realizedPnL=account["realizedPnL"],
+            weekRealizedPnL=account["weekRealizedPnL"],
+            archived=account["archived"],
+            amountSOD=account["amountSOD"],
+            accountDisplayName=sba.sub_account_name,
+        )
+        accounts_for_dashboard.append(a)
+    return accounts_for_dashboard
+
+
+def _fetch_positions(token: str, is_demo: bool):
+    if is_demo:
+        return get_position_list_of_demo_account(token)
+    return get_position_list_of_live_account(token)
+
+
+def _fetch_orders(token: str, is_demo: bool):
+    if is_demo:
+        return get_order_list_of_demo_account(token)
+    return get_order_list_of_live_account(token)
+
+
+def _venue_tasks(db_broker_accounts, venues, fetch) -> list:
+    # Only venues the broker has active sub-accounts on; the rest would be filtered out below
+    return [
+        fetch(ba.access_token, is_demo)
+        for ba in db_broker_accounts
+        for is_demo in venues.get(ba.id, ())
+    ]
+
+
+def _user_broker_accounts(db: Session, user_id: UUID) -> list[BrokerAccount]:
+    return (
         db.query(BrokerAccount)
         .filter(BrokerAccount.user_id == user_id)
         .all()
     )
-    tasks = []
-    for db_broker_account in db_broker_accounts:
-        token = db_broker_account.access_token
-        tasks.append(get_cash_balances(token, True))
-        tasks.append(get_cash_balances(token, False))
-    if tasks:
-        results = await asyncio.gather(*tasks, return_exceptions=False)
-        for res in results:
-            if res:
-                accounts_status.extend(res)
-    if accounts_status != []:
-        account_ids = {str(a["accountId"]) for a in accounts_status}
-        sub_accounts = (
-            db.query(SubBrokerAccount)
-            .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
-            .all()
-        )
-        sub_map = {s.sub_account_id: s for s in sub_accounts}
-        for account in accounts_status:
-            sba = sub_map.get(str(account["accountId"]))
-            if not sba or not sba.is_active:
-                continue
-            a = TradovateAccountsForFrontend(
-                id=account["id"],
-                accountId=account["accountId"],
-                accountNickname=sba.nickname,
-                timestamp=account["timestamp"],
-                currencyId=account["currencyId"],
-                amount=account["amount"],
-                realizedPnL=account["realizedPnL"],
-                weekRealizedPnL=account["weekRealizedPnL"],
-                archived=account["archived"],
-                amountSOD=account["amountSOD"],
-                accountDisplayName=sba.sub_account_name,
-            )
-            accounts_for_dashboard.append(a)
-    return accounts_for_dashboard
+
+
+def _user_broker_venues(db: Session, user_id: UUID):
+    db_broker_accounts = _user_broker_accounts(db, user_id)
+    venues = venue_index.venues(db, [ba.id for ba in db_broker_accounts])
+    return db_broker_accounts, venues
+
+
+async def get_positions(db: Session, user_id: UUID):
+    db_broker_accounts, venues = _user_broker_venues(db, user_id)
+    # Gather all venue calls concurrently across accounts
+    positions_status = await _gather_lists(_venue_tasks(db_broker_accounts, venues, _fetch_positions))
+    if positions_status == []:
+        return []
+    sub_map = _sub_account_map(db, positions_status)
+    contract_name_map = await _resolve_contract_names(
+        sub_map, _venue_tokens(db_broker_accounts, venues), positions_status
+    )
+    return _positions_for_frontend(positions_status, sub_map, contract_name_map)
+
+
+async def get_orders(db: Session, user_id: UUID):
+    db_broker_accounts, venues = _user_broker_venues(db, user_id)
+    order_status = await _gather_lists(_venue_tasks(db_broker_accounts, venues, _fetch_orders))
+    if order_status == []:
+        return []
+    sub_map = _sub_account_map(db, order_status)
+    contract_name_map = await _resolve_contract_names(
+        sub_map, _venue_tokens(db_broker_accounts, venues), order_status
+    )
+    return _orders_for_frontend(order_status, sub_map, contract_name_map)
+
+
+async def get_accounts(db: Session, user_id: UUID):
+    db_broker_accounts, venues = _user_broker_venues(db, user_id)
+    accounts_status = await _gather_lists(_venue_tasks(db_broker_accounts, venues, get_cash_balances))
+    if accounts_status == []:
+        return []
+    sub_map = _sub_account_map(db, accounts_status)
+    return _accounts_for_frontend(accounts_status, sub_map)
+
+
+# A user's snapshot is reused this long, so dashboards and tabs polling
+# together make one round of Tradovate calls
+SNAPSHOT_CACHE_SECONDS = 2.0
+# user_id -> (perf_counter() when fetched, snapshot)
+_snapshots: dict[UUID, tuple[float, dict]] = {}
+
+
+async def get_snapshot(db: Session, user_id: UUID) -> dict:
+    """Positions, orders and accounts from one concurrent upstream pass.
+
+    The three datasets share one BrokerAccount query, one SubBrokerAccount
+    query and one round of contract-name lookups. A snapshot fetched within
+    SNAPSHOT_CACHE_SECONDS is returned as is.
+    """
+    now = perf_counter()
+    cached = _snapshots.get(user_id)
+    if cached is not None and now - cached[0] < SNAPSHOT_CACHE_SECONDS:
+        return cached[1]
+    snapshot = await _fetch_snapshot(db, user_id)
+    for stale in [u for u, (fetched_at, _) in _snapshots.items() if now - fetched_at >= SNAPSHOT_CACHE_SECONDS]:
+        del _snapshots[stale]
+    _snapshots[user_id] = (perf_counter(), snapshot)
+    return snapshot
+
+
+async def _fetch_snapshot(db: Session, user_id: UUID) -> dict:
+    db_broker_accounts, venues = _user_broker_venues(db, user_id)
+    positions_status, order_status, accounts_status = await asyncio.gather(
+        _gather_lists(_venue_tasks(db_broker_accounts, venues, _fetch_positions)),
+        _gather_lists(_venue_tasks(db_broker_accounts, venues, _fetch_orders)),
+        _gather_lists(_venue_tasks(db_broker_accounts, venues, get_cash_balances)),
+    )
+    sub_map = _sub_account_map(db, positions_status, order_status, accounts_status)
+    contract_name_map = await _resolve_contract_names(
+        sub_map, _venue_tokens(db_broker_accounts, venues), positions_status, order_status
+    )
+    return {
+        "positions": _positions_for_frontend(positions_status, sub_map, contract_name_map),
+        "orders": _orders_for_frontend(order_status, sub_map, contract_name_map),
+        "accounts": _accounts_for_frontend(accounts_status, sub_map),
+    }
 
 
 async def get_sub_brokers_for_group(
@@ -571,8 +658,8 @@ def get_token_for_websocket(
 def get_all_tokens_for_websocket(
     db: Session, user_id: UUID
 ) -> list[WebSocketTokens]:
-    from app.db.repositories.broker_repository import user_get_all_tokens_for_websocket
-    return user_get_all_tokens_for_websocket(db, user_id)
+    # Served from memory; renewal happens in the background warmer
+    return websocket_token_store.get_all(db, user_id)
 
 def get_token_for_group_websocket(
     db: Session, group_id: UUID
@@ -580,162 +667,295 @@ def get_token_for_group_websocket(
     from app.db.repositories.broker_repository import user_get_tokens_for_group
     return user_get_tokens_for_group(db, group_id)
 
-async def execute_market_order(db: Session, order: MarketOrder):
+def _build_market_order(order: MarketOrder, sub_account: SubBrokerAccount, subbroker: GroupBroker):
+    return TradovateMarketOrder(
+        accountId=int(sub_account.sub_account_id),
+        accountSpec=sub_account.sub_account_name,
+        symbol=order.symbol,
+        orderQty=int(order.quantity * subbroker.qty),
+        orderType='Market',
+        action=order.action,
+        isAutomated=True
+    )
+
+
+def _build_limit_order(order: LimitOrder, sub_account: SubBrokerAccount, subbroker: GroupBroker):
+    return TradovateLimitOrder(
+        accountId=int(sub_account.sub_account_id),
+        accountSpec=sub_account.sub_account_name,
+        symbol=order.symbol,
+        orderQty=int(order.quantity * subbroker.qty),
+        price=order.price,
+        orderType='Limit',
+        action=order.action,
+        isAutomated=True
+    )
+
+
+def _build_limit_order_with_sltp(order: LimitOrderWithSLTP, sub_account: SubBrokerAccount, subbroker: GroupBroker):
+    sltp:SLTP = order.sltp
+    bracket1 = TradovateLimitBracket(
+        action = "Sell" if order.action == "Buy" else "Buy",
+        orderType='Limit',
+        price=sltp.tp + order.price if order.action == "Buy" else order.price - sltp.tp
+    )
+    bracket2 = TradovateStopBracket(
+        action = "Sell" if order.action == "Buy" else "Buy",
+        orderType='Stop',
+        stopPrice=order.price - sltp.sl if order.action == "Buy" else order.price + sltp.tp
+    )
+    return TradovateLimitOrderWithSLTP(
+        accountId=int(sub_account.sub_account_id),
+        accountSpec=sub_account.sub_account_name,
+        symbol=order.symbol,
+        orderQty=int(order.quantity * subbroker.qty),
+        price=order.price,
+        orderType='Limit',
+        action=order.action,
+        isAutomated=True,
+        bracket1=bracket1,
+        bracket2=bracket2
+    )
+
+
+# kind -> (build Tradovate payload, send it)
+GROUP_ORDER_KINDS = {
+    "market": (_build_market_order, tradovate_execute_market_order),
+    "limit": (_build_limit_order, tradovate_execute_limit_order),
+    "limitwithsltp": (_build_limit_order_with_sltp, tradovate_execute_limit_order_with_sltp),
+}
+
+
+def _follower_failure(sub_broker_id: str, error: str, sub_account: SubBrokerAccount | None = None) -> dict:
+    return {
+        "sub_broker_id": sub_broker_id,
+        "account_id": sub_account.sub_account_id if sub_account else None,
+        "account_name": sub_account.sub_account_name if sub_account else None,
+        "status": "failed",
+        "order_id": None,
+        "error": error,
+        "replayed": False,
+        "latency_ms": None,
+    }
+
+
+def count_group_followers(db: Session, group_id) -> int:
+    return db.query(GroupBroker).filter(GroupBroker.group_id == group_id).count()
+
+
+async def iter_group_order_results(
+    db: Session, order: MarketOrder, kind: str
+) -> AsyncGenerator[dict, None]:
+    """Send a group order follower by follower and yield each result as soon as Tradovate answers.
+
+    Each result carries the follower's Tradovate order ID, the round-trip
+    latency of the placement call and the error, if any. Results, then a
+    done event, are also published to the group owner's client streams.
+    """
+    owner_id = db.query(Group.user_id).filter(Group.id == order.group_id).scalar()
+    event = {"group_id": str(order.group_id), "client_order_id": order.client_order_id, "kind": kind}
+    counts = {"sent": 0, "failed": 0, "pending": 0}
+    async for result in _send_group_order(db, order, kind):
+        counts[result["status"]] += 1
+        if owner_id is not None:
+            await publish_order_event(owner_id, {"type": "result", **event, **result})
+        yield result
+    if owner_id is not None:
+        # pnl_service imports this module
+        from app.services.pnl_service import expire_pnl_resume
+        # Positions and orders have changed; the next snapshot and PnL stream fetch them
+        _snapshots.pop(owner_id, None)
+        await expire_pnl_resume(owner_id)
+        await publish_order_event(
+            owner_id,
+            {"type": "done", **event, "sent": counts["sent"], "failed": counts["failed"], "in_flight": counts["pending"]},
+        )
+
+
+async def _send_group_order(
+    db: Session, order: MarketOrder, kind: str
+) -> AsyncGenerator[dict, None]:
+    build_order, execute = GROUP_ORDER_KINDS[kind]
     db_subroker_accounts = (
         db.query(GroupBroker).filter(GroupBroker.group_id == order.group_id).all()
     )
-    errors: list[dict] = []
-    for subbroker in db_subroker_accounts:
-        db_subbroker_account = (
-            db.query(SubBrokerAccount).filter(SubBrokerAccount.id == subbroker.sub_broker_id).first()
-        )
-        if db_subbroker_account is None:
-            errors.append({"error": "SubBrokerAccount not found", "sub_broker_id": str(subbroker.sub_broker_id)})
-            continue
-        db_broker_account = (
-            db.query(BrokerAccount).filter(BrokerAccount.id == db_subbroker_account.broker_account_id).first()
-        )
-        if db_broker_account is None:
-            errors.append({"error": "BrokerAccount not found", "broker_account_id": str(db_subbroker_account.broker_account_id)})
-            continue
-        try:
-            tradovate_order = TradovateMarketOrder(
-                accountId=int(db_subbroker_account.sub_account_id),
-                accountSpec=db_subbroker_account.sub_account_name,
-                symbol=order.symbol,
-                orderQty=int(order.quantity * subbroker.qty),
-                orderType='Market',
-                action=order.action,
-                isAutomated=True
+    # A retried request replays what was recorded instead of re-sending
+    prior: dict[str, DispatchResult] = {}
+    to_release: set[str] = set()
+    finished: dict[str, DispatchResult] = {}
+    if order.client_order_id:
+        sub_broker_ids = [str(subbroker.sub_broker_id) for subbroker in db_subroker_accounts]
+        prior = await order_dispatch_store.claim(order.client_order_id, sub_broker_ids)
+        # Claimed followers stay here until their order goes out
+        to_release = set(sub_broker_ids) - prior.keys()
+    try:
+        for subbroker in db_subroker_accounts:
+            sub_broker_id = str(subbroker.sub_broker_id)
+            db_subbroker_account = (
+                db.query(SubBrokerAccount).filter(SubBrokerAccount.id == subbroker.sub_broker_id).first()
             )
-        except Exception as e:
-            errors.append({"error": f"Invalid order payload: {e}", "sub_broker_id": str(subbroker.sub_broker_id)})
-            continue
-        # Get access token and refresh if needed
-        access_token = db_broker_account.access_token
-        if not access_token:
-            errors.append({"error": "No access token available", "sub_broker_id": str(subbroker.sub_broker_id)})
-            continue
+            if db_subbroker_account is None:
+                yield _follower_failure(sub_broker_id, "SubBrokerAccount not found")
+                continue
+            db_broker_account = (
+                db.query(BrokerAccount).filter(BrokerAccount.id == db_subbroker_account.broker_account_id).first()
+            )
+            if db_broker_account is None:
+                yield _follower_failure(sub_broker_id, "BrokerAccount not found", db_subbroker_account)
+                continue
+            try:
+                tradovate_order = build_order(order, db_subbroker_account, subbroker)
+            except Exception as e:
+                yield _follower_failure(sub_broker_id, f"Invalid order payload: {e}", db_subbroker_account)
+                continue
+            # Get access token and refresh if needed
+            access_token = db_broker_account.access_token
+            if not access_token:
+                yield _follower_failure(sub_broker_id, "No access token available", db_subbroker_account)
+                continue
+
+            if sub_broker_id in prior:
+                result = prior[sub_broker_id].as_dict(sub_broker_id, replayed=True)
+                result.update(
+                    account_id=db_subbroker_account.sub_account_id,
+                    account_name=db_subbroker_account.sub_account_name,
+                    latency_ms=None,
+                )
+                yield result
+                continue
         
-        # Try to refresh token before using it
+            # Try to refresh token before using it
+            try:
+                new_tokens = get_renew_token(access_token)
+                if new_tokens:
+                    access_token = new_tokens.access_token
+                    # Update token in database for future use
+                    db_broker_account.access_token = new_tokens.access_token
+                    db_broker_account.md_access_token = new_tokens.md_access_token
+                    db.commit()
+            except Exception as e:
+                pass  # Using existing token
+        
+            is_demo = db_subbroker_account.is_demo
+            started = perf_counter()
+            # Left pending if the fan-out is cancelled while the order is on its way
+            to_release.discard(sub_broker_id)
+            try:
+                response = await execute(tradovate_order, access_token, is_demo)
+            except Exception as e:
+                # The order did not go out; a retry may send it
+                to_release.add(sub_broker_id)
+                yield _follower_failure(sub_broker_id, f"Order execution failed: {e}", db_subbroker_account)
+                continue
+            latency_ms = (perf_counter() - started) * 1000
+            dispatch = result_from_response(response)
+            if dispatch is None:
+                # No definite answer, e.g. 401, 429 or 5xx; a retry may send it
+                to_release.add(sub_broker_id)
+                yield _follower_failure(sub_broker_id, "Order execution failed", db_subbroker_account)
+                continue
+            finished[sub_broker_id] = dispatch
+            result = dispatch.as_dict(sub_broker_id, replayed=False)
+            result.update(
+                account_id=db_subbroker_account.sub_account_id,
+                account_name=db_subbroker_account.sub_account_name,
+                latency_ms=round(latency_ms, 1),
+            )
+            if isinstance(response, dict) and response.get("oso1Id") is not None:
+                result["bracket_order_ids"] = [response.get("oso1Id"), response.get("oso2Id")]
+            yield result
+    finally:
+        # Recorded once for all followers, off the path between them
+        if order.client_order_id:
+            await order_dispatch_store.release(order.client_order_id, sorted(to_release))
+            await order_dispatch_store.finish(order.client_order_id, finished)
+
+
+# Group order fan-outs still running; the event loop only keeps weak references to tasks
+_group_order_tasks: set[asyncio.Task] = set()
+
+
+def start_group_order(order: MarketOrder, kind: str) -> asyncio.Queue:
+    """Run stream_group_order in a task of its own and return the queue it feeds.
+
+    The fan-out does not depend on the caller reading the queue, so a client
+    that disconnects midway does not stop orders to the remaining followers.
+    The queue ends with None.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run() -> None:
         try:
-            new_tokens = get_renew_token(access_token)
-            if new_tokens:
-                access_token = new_tokens.access_token
-                # Update token in database for future use
-                db_broker_account.access_token = new_tokens.access_token
-                db_broker_account.md_access_token = new_tokens.md_access_token
-                db.commit()
+            async for event in stream_group_order(order, kind):
+                events.put_nowait(event)
         except Exception as e:
-            pass  # Using existing token
-        
-        is_demo = db_subbroker_account.is_demo
-        response = await tradovate_execute_market_order(tradovate_order, access_token, is_demo)
-        if response is None or (isinstance(response, dict) and response.get("error")):
-            errors.append({"error": "Order execution failed", "sub_broker_id": str(subbroker.sub_broker_id), "response": response})
+            print(f"[GROUP ORDER] Fan-out for group {order.group_id} failed: {e}")
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    _group_order_tasks.add(task)
+    task.add_done_callback(_group_order_tasks.discard)
+    return events
+
+
+async def stream_group_order(order: MarketOrder, kind: str) -> AsyncGenerator[dict, None]:
+    """Events for the streaming execute-order routes: start, one per follower, done.
+
+    Uses its own session because the fan-out outlives the request's
+    dependency-scoped one.
+    """
+    db = SessionLocal()
+    try:
+        started = perf_counter()
+        yield {
+            "type": "start",
+            "total": count_group_followers(db, order.group_id),
+            "client_order_id": order.client_order_id,
+        }
+        counts = {"sent": 0, "failed": 0, "pending": 0}
+        async for result in iter_group_order_results(db, order, kind):
+            counts[result["status"]] += 1
+            yield {"type": "result", **result}
+        yield {
+            "type": "done",
+            # A replayed pending follower is still on its way from an earlier request
+            "success": counts["failed"] == 0 and counts["pending"] == 0,
+            "sent": counts["sent"],
+            "failed": counts["failed"],
+            "in_flight": counts["pending"],
+            "elapsed_ms": round((perf_counter() - started) * 1000, 1),
+        }
+    finally:
+        db.close()
+
+
+async def execute_market_order(db: Session, order: MarketOrder):
+    errors: list[dict] = []
+    in_flight: list[str] = []
+    dispatches: list[dict] = []
+    async for result in iter_group_order_results(db, order, "market"):
+        dispatches.append(result)
+        if result["status"] == "failed":
+            errors.append({"error": result["error"], "sub_broker_id": result["sub_broker_id"]})
+        elif result["status"] == "pending":
+            # Claimed by an earlier request that has not recorded its result yet
+            in_flight.append(result["sub_broker_id"])
+    response = {"success": not errors and not in_flight, "orders": dispatches}
     if errors:
-        return {"success": False, "errors": errors}
-    return {"success": True}
+        response["errors"] = errors
+    if in_flight:
+        response["in_flight"] = in_flight
+    if order.client_order_id:
+        response["client_order_id"] = order.client_order_id
+    return response
 
 async def execute_limit_order(db: Session, order: LimitOrder):
-    db_subroker_accounts = (
-        db.query(GroupBroker).filter(GroupBroker.group_id == order.group_id).all()
-    )
-    for subbroker in db_subroker_accounts:
-        db_subroker_account = (
-            db.query(SubBrokerAccount).filter(SubBrokerAccount.id == subbroker.sub_broker_id).first()
-        )
-        tradovate_order = TradovateLimitOrder(
-            accountId=int(db_subroker_account.sub_account_id),
-            accountSpec=db_subroker_account.sub_account_name,
-            symbol=order.symbol,
-            orderQty=int(order.quantity * subbroker.qty),
-            price=order.price,
-            orderType='Limit',
-            action=order.action,
-            isAutomated=True
-        )
-        db_broker_account = (
-            db.query(BrokerAccount).filter(BrokerAccount.id == db_subroker_account.broker_account_id).first()
-        )
-        if not db_broker_account:
-            continue
-        # Get access token and refresh if needed
-        access_token = db_broker_account.access_token
-        if not access_token:
-            continue
-        
-        # Try to refresh token before using it
-        try:
-            new_tokens = get_renew_token(access_token)
-            if new_tokens:
-                access_token = new_tokens.access_token
-                # Update token in database for future use
-                db_broker_account.access_token = new_tokens.access_token
-                db_broker_account.md_access_token = new_tokens.md_access_token
-                db.commit()
-        except Exception as e:
-            pass  # Using existing token
-        
-        is_demo = db_subroker_account.is_demo
-        response = await tradovate_execute_limit_order(tradovate_order, access_token, is_demo)
-    
+    async for _ in iter_group_order_results(db, order, "limit"):
+        pass
     return "Success"
 
 async def execute_limit_order_with_sltp(db: Session, order: LimitOrderWithSLTP):
-    db_subroker_accounts = (
-        db.query(GroupBroker).filter(GroupBroker.group_id == order.group_id).all()
-    )
-    for subbroker in db_subroker_accounts:
-        db_subroker_account = (
-            db.query(SubBrokerAccount).filter(SubBrokerAccount.id == subbroker.sub_broker_id).first()
-        )
-        sltp:SLTP = order.sltp
-        bracket1 = TradovateLimitBracket(
-            action = "Sell" if order.action == "Buy" else "Buy",
-            orderType='Limit',
-            price=sltp.tp + order.price if order.action == "Buy" else order.price - sltp.tp
-        )
-        bracket2 = TradovateStopBracket(
-            action = "Sell" if order.action == "Buy" else "Buy",
-            orderType='Stop',
-            stopPrice=order.price - sltp.sl if order.action == "Buy" else order.price + sltp.tp
-        )
-        tradovate_order = TradovateLimitOrderWithSLTP(
-            accountId=int(db_subroker_account.sub_account_id),
-            accountSpec=db_subroker_account.sub_account_name,
-            symbol=order.symbol,
-            orderQty=int(order.quantity * subbroker.qty),
-            price=order.price,
-            orderType='Limit',
-            action=order.action,
-            isAutomated=True,
-            bracket1=bracket1,
-            bracket2=bracket2
-        )
-        db_broker_account = (
-            db.query(BrokerAccount).filter(BrokerAccount.id == db_subroker_account.broker_account_id).first()
-        )
-        if not db_broker_account:
-            continue
-        # Get access token and refresh if needed
-        access_token = db_broker_account.access_token
-        if not access_token:
-            continue
-        
-        # Try to refresh token before using it
-        try:
-            new_tokens = get_renew_token(access_token)
-            if new_tokens:
-                access_token = new_tokens.access_token
-                # Update token in database for future use
-                db_broker_account.access_token = new_tokens.access_token
-                db_broker_account.md_access_token = new_tokens.md_access_token
-                db.commit()
-        except Exception as e:
-            pass  # Using existing token
-        
-        is_demo = db_subroker_account.is_demo
-        response = await tradovate_execute_limit_order_with_sltp(tradovate_order, access_token, is_demo)
-    
+    async for _ in iter_group_order_results(db, order, "limitwithsltp"):
+        pass
     return "Success"
@@ -7,7 +7,6 @@ from datetime import datetime, date, time
 import asyncio
 import databento as db
 from app.core.config import settings
-from app.utils.databento import convert_rawsymbol_intrument_id
 
 async def databento_price_stream(request: Request, symbols: list[str]):
     # Initialize Databento live client with your API key
@@ -0,0 +1,93 @@
+"""Bounded thread pool for blocking Databento Historical calls.
+
+get_range, to_df and symbology.resolve are synchronous. Async endpoints
+hand them to HistoricalExecutor.run, so a slow response ties up one of
+HISTORICAL_MAX_WORKERS threads instead of the event loop. Calls beyond
+that many wait for a free thread.
+
+Each call has a timeout. The awaiting request stops waiting when it
+expires, but the thread runs the call to completion; the Databento
+client offers no way to abort it. Per-call-name metrics are kept for
+/historical-metrics.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+
+HISTORICAL_MAX_WORKERS = 8
+HISTORICAL_CALL_TIMEOUT_SECONDS = 30.0
+
+
+@dataclass
+class _CallMetrics:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    # Calls a request is still awaiting
+    in_flight: int = 0
+    # Calls that got a thread (a call that timed out while queued never does)
+    runs: int = 0
+    # Time spent waiting for a free thread, and running on it
+    queue_seconds_total: float = 0.0
+    run_seconds_total: float = 0.0
+    run_seconds_max: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "run_seconds_avg": self.run_seconds_total / self.runs if self.runs else 0.0,
+        }
+
+
+class HistoricalExecutor:
+    def __init__(self, max_workers: int = HISTORICAL_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="databento-historical")
+        self._metrics: dict[str, _CallMetrics] = {}
+        self._lock = threading.Lock()
+
+    async def run(self, name: str, fn, *args, timeout: float = HISTORICAL_CALL_TIMEOUT_SECONDS, **kwargs):
+        """Run fn(*args, **kwargs) on the pool. Raises TimeoutError after `timeout` seconds."""
+        with self._lock:
+            metrics = self._metrics.setdefault(name, _CallMetrics())
+            metrics.calls += 1
+            metrics.in_flight += 1
+        submitted = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    metrics.runs += 1
+                    metrics.queue_seconds_total += started - submitted
+                    metrics.run_seconds_total += elapsed
+                    metrics.run_seconds_max = max(metrics.run_seconds_max, elapsed)
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, call)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except TimeoutError:
+            with self._lock:
+                metrics.timeouts += 1
+            print(f"[Historical] {name} timed out after {timeout:g}s")
+            raise
+        except Exception:
+            with self._lock:
+                metrics.errors += 1
+            raise
+        finally:
+            with self._lock:
+                metrics.in_flight -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls = {name: metrics.as_dict() for name, metrics in self._metrics.items()}
+        return {"max_workers": self.max_workers, "calls": calls}
+
+
+historical_executor = HistoricalExecutor()
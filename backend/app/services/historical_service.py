@@ -0,0 +1,150 @@
+"""Historical OHLCV bars for the chart endpoint.
+
+Bars are fetched with timeseries.get_range and turned into one DataFrame
+with epoch-second times. Serializers work on whole columns instead of
+boxing each row:
+
+- records: the original list of per-bar dicts
+- columns: parallel arrays, the layout lightweight-charts consumes directly
+- arrow: an Arrow IPC stream of the same columns
+- dbn: the DBN bytes as Databento returned them
+"""
+import re
+from datetime import datetime, timezone, timedelta
+import databento as dbt
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from app.core.config import settings
+
+DATASET = "GLBX.MDP3"
+HISTORICAL_MAX_RETRIES = 3
+# Databento publishes bars a few minutes behind real time
+HISTORICAL_END_LAG = timedelta(minutes=5)
+OHLCV_COLUMNS = ["time", "symbol", "open", "high", "low", "close", "volume"]
+HISTORICAL_FORMATS = ("records", "columns", "arrow", "dbn")
+# Upper bound on bars in one aggregated/downsampled response
+HISTORICAL_MAX_POINTS = 5000
+
+
+def clamp_range(start: str, end: str) -> tuple[datetime, datetime]:
+    start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
+    end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
+
+    # Use the earlier of: requested end time or safe end time
+    safe_end_time = datetime.now(timezone.utc) - HISTORICAL_END_LAG
+    if end_dt > safe_end_time:
+        end_dt = safe_end_time
+        print(f"⚠️ Adjusted end time to {end_dt.isoformat()} to stay within available data range")
+
+    # If start is after or equal to end, go back 1 hour from end
+    if start_dt >= end_dt:
+        start_dt = end_dt - timedelta(hours=1)
+        print(f"⚠️ Adjusted start time to {start_dt.isoformat()} to ensure valid range")
+    return start_dt, end_dt
+
+
+def fetch_ohlcv(symbol: str, start_dt: datetime, end_dt: datetime, schema: str):
+    """Blocking get_range with the data_end_after_available_end retry.
+
+    Returns the DBNStore and the end time actually used.
+    """
+    client = dbt.Historical(key=settings.DATABENTO_KEY)
+    retry_count = 0
+    while True:
+        try:
+            store = client.timeseries.get_range(
+                dataset=DATASET,
+                start=start_dt.isoformat(),
+                end=end_dt.isoformat(),
+                symbols=[symbol],
+                schema=schema,
+            )
+            return store, end_dt
+        except Exception as api_error:
+            error_msg = str(api_error)
+            if "data_end_after_available_end" not in error_msg or retry_count >= HISTORICAL_MAX_RETRIES - 1:
+                raise
+            retry_count += 1
+            print(f"⚠️ Retry {retry_count}/{HISTORICAL_MAX_RETRIES}: {error_msg}")
+
+            # Format: "data available up to '2025-10-29 05:20:00+00:00'"
+            match = re.search(r"data available up to '([^']+)'", error_msg)
+            try:
+                # Set end time to 1 minute before available end
+                end_dt = datetime.fromisoformat(match.group(1)) - timedelta(minutes=1)
+                print(f"🔄 Adjusted end time to {end_dt.isoformat()} based on available data range")
+            except Exception:
+                # If we can't parse the available end time, subtract more time
+                end_dt = end_dt - timedelta(minutes=10)
+                print(f"🔄 Fallback: Adjusted end time to {end_dt.isoformat()}")
+
+
+def fetch_range_df(symbols: list[str], start_dt: datetime, end_dt: datetime, schema: str = "ohlcv-1m") -> pd.DataFrame:
+    """Blocking get_range + to_df for the short look-back queries of the SSE fallbacks."""
+    client = dbt.Historical(key=settings.DATABENTO_KEY)
+    store = client.timeseries.get_range(
+        dataset=DATASET,
+        start=start_dt.isoformat(),
+        end=end_dt.isoformat(),
+        symbols=symbols,
+        schema=schema,
+    )
+    return store.to_df()
+
+
+def ohlcv_frame(store, symbol: str) -> pd.DataFrame:
+    """OHLCV_COLUMNS with ``time`` in epoch seconds (UTC)."""
+    df = store.to_df().reset_index()
+    if df.empty:
+        return pd.DataFrame({column: [] for column in OHLCV_COLUMNS})
+    ts = pd.to_datetime(df["ts_event"], utc=True).dt.tz_localize(None)
+    return pd.DataFrame({
+        "time": ts.to_numpy("datetime64[s]").astype("int64"),
+        "symbol": df["symbol"] if "symbol" in df.columns else symbol,
+        "open": df["open"].astype("float64"),
+        "high": df["high"].astype("float64"),
+        "low": df["low"].astype("float64"),
+        "close": df["close"].astype("float64"),
+        "volume": df["volume"].astype("int64"),
+    })
+
+
+def to_columns(frame: pd.DataFrame) -> dict[str, list]:
+    return {column: frame[column].tolist() for column in OHLCV_COLUMNS}
+
+
+def to_records(frame: pd.DataFrame) -> list[dict]:
+    # Same ISO form FastAPI produced for the ts_event Timestamp
+    timestamps = np.char.add(
+        np.datetime_as_string(frame["time"].to_numpy().astype("datetime64[s]"), unit="s"), "+00:00"
+    )
+    return [
+        {
+            "timestamp": timestamp,
+            "symbol": symbol,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+        }
+        for timestamp, symbol, open_, high, low, close, volume in zip(
+            timestamps.tolist(),
+            frame["symbol"].tolist(),
+            frame["open"].tolist(),
+            frame["high"].tolist(),
+            frame["low"].tolist(),
+            frame["close"].tolist(),
+            frame["volume"].tolist(),
+        )
+    ]
+
+
+def to_arrow_ipc(frame: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(frame[OHLCV_COLUMNS], preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
@@ -0,0 +1,71 @@
+"""Per-subscription routing of Live records by instrument_id.
+
+A Live session announces each instrument with a SymbolMappingMsg before
+sending its data. The requested symbols are matched against the mapping's
+symbol once, there. After that, routing a data record is one dict lookup
+on its integer instrument_id, with no string work per record.
+"""
+
+
+def symbol_variants(symbol: str) -> set[str]:
+    """Upper-cased symbol with and without the .FUT parent suffix."""
+    s = (symbol or "").upper()
+    variants = {s, s.replace('.FUT', '')}
+    if not s.endswith('.FUT'):
+        variants.add(s + '.FUT')
+    return variants
+
+
+class InstrumentIndex:
+    def __init__(self, symbols, match_variants: bool = True):
+        """
+        Args:
+            symbols: Requested symbols, or a dict of requested symbol -> value to
+                route to (the symbol itself is routed when a list is given)
+            match_variants: Treat ES and ES.FUT as the same symbol, like the
+                price stream does; otherwise mapping symbols must match exactly
+        """
+        self.match_variants = match_variants
+        self._targets: dict[str, object] = {}
+        self._wanted: dict[str, str] = {}
+        # instrument_id -> (mapped symbol, routed value)
+        self.routes: dict[int, tuple[str, object]] = {}
+        self.add_symbols(symbols)
+
+    def add_symbols(self, symbols) -> None:
+        """Route further symbols (same forms as the constructor) from their next mapping on."""
+        targets = symbols if isinstance(symbols, dict) else {s: s for s in symbols}
+        self._targets.update(targets)
+        for symbol in targets:
+            keys = symbol_variants(symbol) if self.match_variants else {symbol}
+            for key in keys:
+                self._wanted.setdefault(key, symbol)
+
+    def _requested(self, symbol: str) -> str | None:
+        if not self.match_variants:
+            return self._wanted.get(symbol)
+        for key in symbol_variants(symbol):
+            requested = self._wanted.get(key)
+            if requested is not None:
+                return requested
+        return None
+
+    def add_mapping(self, instrument_id: int, symbol: str | None) -> bool:
+        """Record a SymbolMappingMsg. Returns whether the instrument is routed."""
+        if instrument_id is None or not symbol:
+            return False
+        requested = self._requested(symbol)
+        if requested is None:
+            self.routes.pop(instrument_id, None)
+            return False
+        self.routes[instrument_id] = (symbol, self._targets[requested])
+        return True
+
+    def preload(self, instrument_ids: dict[str, list[int]]) -> None:
+        """Seed routes from a symbology resolve (symbol -> instrument_ids)."""
+        for symbol, ids in instrument_ids.items():
+            for instrument_id in ids:
+                self.add_mapping(instrument_id, symbol)
+
+    def get(self, instrument_id: int) -> tuple[str, object] | None:
+        return self.routes.get(instrument_id)
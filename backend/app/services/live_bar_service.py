@@ -0,0 +1,261 @@
+"""Live 1-minute bars built from the shared DataBento MBP-1 feed.
+
+Bars open no upstream session of their own. The quote feed's owner hands
+every record of its session to the bar builder (see
+QuoteFeed.add_upstream_listener). Trades (MBP-1 action T, or TradeMsg)
+set the bar's prices and volume. Quote updates move it by the mid price
+when no trade has printed yet in that minute. Every
+LIVE_BAR_PUSH_INTERVAL_SECONDS the owner publishes the bars that changed
+on bars:<raw symbol>, and writes the symbol's newest bars to the bus
+under bars-ring:<raw symbol>.
+
+Every worker, the owner included, keeps the newest LIVE_BAR_RING_SIZE
+bars per symbol its /sse/bars streams want. It seeds them from the bus
+when the first stream subscribes, then applies the published bars.
+merge_live_tail appends them to historical bars, which end
+HISTORICAL_END_LAG behind real time. A stream's symbols are held in the
+quote feed's upstream session, whose replay (QUOTE_REPLAY_SECONDS)
+covers the gap between the historical end and now.
+"""
+import asyncio
+import math
+import pandas as pd
+from app.core.serialization import dumps, loads
+from app.services.historical_service import OHLCV_COLUMNS
+from app.services.market_bus_service import market_bus
+from app.services.quote_feed_service import quote_feed
+from app.services.symbology_service import symbology
+
+LIVE_BAR_RING_SIZE = 240
+# Subscribers are woken at most this often; in between, bar updates coalesce
+LIVE_BAR_PUSH_INTERVAL_SECONDS = 0.25
+LIVE_BAR_CHANNEL_PREFIX = "bars:"
+LIVE_BAR_RING_PREFIX = "bars-ring:"
+LIVE_BAR_RING_TTL_SECONDS = 24 * 3600.0
+_NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class _Bar:
+    __slots__ = ("time", "open", "high", "low", "close", "volume", "traded", "opened_at", "closed_at")
+
+    def __init__(self, time: int, price: float, ts: int):
+        self.time = time
+        self.open = self.high = self.low = self.close = price
+        self.volume = 0
+        self.traded = False
+        self.opened_at = self.closed_at = ts
+
+    def update(self, price: float, size: int, trade: bool, ts: int) -> None:
+        """Apply a tick; ticks may arrive out of order, e.g. from a replay next to the live session."""
+        if trade and not self.traded:
+            # First print of the minute replaces the quote-derived prices
+            self.open = self.high = self.low = self.close = price
+            self.opened_at = self.closed_at = ts
+            self.traded = True
+        elif not trade and self.traded:
+            return
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        if ts >= self.closed_at:
+            self.close, self.closed_at = price, ts
+        if ts < self.opened_at:
+            self.open, self.opened_at = price, ts
+        self.volume += size
+
+    def as_dict(self, symbol: str) -> dict:
+        return {
+            "time": self.time,
+            "symbol": symbol,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+        }
+
+
+def _tick_from_record(record) -> tuple[int, float, int, bool, int] | None:
+    """(minute start in epoch seconds, price, size, is_trade, ts_event) or None."""
+    name = type(record).__name__
+    if name == "TradeMsg" or (name == "MBP1Msg" and str(getattr(record, "action", "")) in ("T", "Action.TRADE")):
+        price, size, trade = float(record.pretty_price), int(record.size), True
+    elif name in ("MBP1Msg", "MBPMsg"):
+        levels = getattr(record, "levels", None)
+        level = levels[0] if isinstance(levels, list) and levels else levels
+        if level is None:
+            return None
+        bid, ask = float(level.pretty_bid_px), float(level.pretty_ask_px)
+        if not (math.isfinite(bid) and math.isfinite(ask)) or bid <= 0 or ask <= 0:
+            return None
+        price, size, trade = (bid + ask) / 2, 0, False
+    else:
+        return None
+    if not math.isfinite(price):
+        return None
+    return record.ts_event // _NS_PER_MINUTE * 60, price, size, trade, record.ts_event
+
+
+class _Subscriber:
+    def __init__(self, symbols: set[str]):
+        self.symbols = symbols
+        # Raw symbol -> the requested symbols it serves
+        self.raw: dict[str, set[str]] = {}
+        for symbol in symbols:
+            self.raw.setdefault(symbology.price_symbol(symbol), set()).add(symbol)
+        self.changed: set[str] = set()
+        self.event = asyncio.Event()
+
+
+class LiveBarService:
+    def __init__(self, bus=market_bus, feed=quote_feed, ring_size: int = LIVE_BAR_RING_SIZE):
+        self.bus = bus
+        self.feed = feed
+        self.ring_size = ring_size
+        # Owner: bars built from upstream records, and the minutes not yet published, by raw symbol
+        self._building: dict[str, dict[int, _Bar]] = {}
+        self._dirty: dict[str, set[int]] = {}
+        # Every worker: published bars by raw symbol and minute
+        self._bars: dict[str, dict[int, dict]] = {}
+        self._subscribers: set[_Subscriber] = set()
+        feed.add_upstream_listener(self)
+
+    # ---- builder (quote feed owner) ----------------------------------------
+
+    def upstream_replaying(self, symbols: list[str]) -> None:
+        # The replay rebuilds these bars from scratch
+        for symbol in symbols:
+            self._building.pop(symbol, None)
+
+    def upstream_record(self, symbol: str, record) -> None:
+        tick = _tick_from_record(record)
+        if tick is not None:
+            self.apply_tick(symbol, *tick)
+
+    def apply_tick(self, symbol: str, minute: int, price: float, size: int, trade: bool, ts: int) -> None:
+        bars = self._building.get(symbol)
+        if bars is None:
+            bars = self._building[symbol] = {}
+        bar = bars.get(minute)
+        if bar is None:
+            if len(bars) >= self.ring_size and minute < min(bars):
+                # Older than anything kept
+                return
+            bar = bars[minute] = _Bar(minute, price, ts)
+            if len(bars) > self.ring_size:
+                del bars[min(bars)]
+        bar.update(price, size, trade, ts)
+        self._dirty.setdefault(symbol, set()).add(minute)
+
+    async def _publish(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        messages = []
+        for symbol, minutes in dirty.items():
+            bars = self._building.get(symbol)
+            if not bars:
+                continue
+            changed = [bars[minute].as_dict(symbol) for minute in sorted(minutes) if minute in bars]
+            messages.append((LIVE_BAR_CHANNEL_PREFIX + symbol, dumps({"symbol": symbol, "bars": changed})))
+        if not messages:
+            return
+        await self.bus.publish_many(messages)
+        for symbol in dirty:
+            bars = self._building.get(symbol)
+            if bars:
+                ring = [bars[minute].as_dict(symbol) for minute in sorted(bars)]
+                await self.bus.set_value(
+                    LIVE_BAR_RING_PREFIX + symbol, dumps({"symbol": symbol, "bars": ring}), LIVE_BAR_RING_TTL_SECONDS
+                )
+
+    async def run(self) -> None:
+        """Publish the owner's changed bars every LIVE_BAR_PUSH_INTERVAL_SECONDS."""
+        while True:
+            await asyncio.sleep(LIVE_BAR_PUSH_INTERVAL_SECONDS)
+            try:
+                await self._publish()
+            except Exception as e:
+                print(f"[Live Bars] Publishing bars failed: {e}")
+
+    # ---- rings (every worker) ----------------------------------------------
+
+    def _on_bars(self, payload: bytes) -> None:
+        message = loads(payload)
+        symbol = message["symbol"]
+        self._apply_bars(symbol, message["bars"])
+        self._mark_changed(symbol)
+
+    def _apply_bars(self, symbol: str, bars: list[dict], replace: bool = True) -> None:
+        ring = self._bars.get(symbol)
+        if ring is None:
+            return
+        for bar in bars:
+            if replace or bar["time"] not in ring:
+                ring[bar["time"]] = bar
+        for minute in sorted(ring)[: max(0, len(ring) - self.ring_size)]:
+            del ring[minute]
+
+    def _mark_changed(self, symbol: str) -> None:
+        for subscriber in self._subscribers:
+            requested = subscriber.raw.get(symbol)
+            if requested:
+                subscriber.changed |= requested
+                subscriber.event.set()
+
+    def tail(self, symbol: str, since: int | None = None) -> list[dict]:
+        ring = self._bars.get(symbology.price_symbol(symbol))
+        if not ring:
+            return []
+        return [{**ring[minute], "symbol": symbol} for minute in sorted(ring) if since is None or minute >= since]
+
+    async def subscribe(self, symbols: list[str]) -> _Subscriber:
+        subscriber = _Subscriber(set(symbols))
+        self._subscribers.add(subscriber)
+        for symbol in subscriber.raw:
+            if symbol in self._bars:
+                continue
+            self._bars[symbol] = {}
+            self.feed.hold([symbol])
+            await self.bus.subscribe(LIVE_BAR_CHANNEL_PREFIX + symbol, self._on_bars)
+            stored = await self.bus.get_value(LIVE_BAR_RING_PREFIX + symbol)
+            if stored is not None:
+                # Bars published since the subscribe above are newer
+                self._apply_bars(symbol, loads(stored)["bars"], replace=False)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: _Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        still_wanted = set().union(*(s.raw.keys() for s in self._subscribers))
+        for symbol in subscriber.raw.keys() - still_wanted:
+            if self._bars.pop(symbol, None) is not None:
+                self.feed.release([symbol])
+                await self.bus.unsubscribe(LIVE_BAR_CHANNEL_PREFIX + symbol, self._on_bars)
+
+    async def wait(self, subscriber: _Subscriber, timeout: float) -> set[str]:
+        """Symbols whose bars changed since the last call (empty on timeout)."""
+        try:
+            await asyncio.wait_for(subscriber.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return set()
+        # Let a burst of ticks coalesce into one push
+        await asyncio.sleep(LIVE_BAR_PUSH_INTERVAL_SECONDS)
+        subscriber.event.clear()
+        changed, subscriber.changed = subscriber.changed, set()
+        return changed
+
+
+def merge_live_tail(bars: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """Historical 1-minute bars with the live ring appended.
+
+    Live bars replace historical ones for the same minute, since the
+    historical end may cut a minute short.
+    """
+    last_time = int(bars["time"].iloc[-1]) if not bars.empty else None
+    tail = live_bars.tail(symbol, since=last_time)
+    if not tail:
+        return bars
+    live = pd.DataFrame(tail, columns=OHLCV_COLUMNS)
+    if last_time is not None:
+        bars = bars[bars["time"] < int(live["time"].iloc[0])]
+    return pd.concat([bars, live], ignore_index=True)
+
+
+live_bars = LiveBarService()
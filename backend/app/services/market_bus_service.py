@@ -0,0 +1,206 @@
+"""Pub/sub between API workers for market data.
+
+Uvicorn workers are separate processes. The quote feed uses a bus to
+elect the one worker that holds the upstream Databento session, to tell
+it which symbols the others need, and to deliver its quotes to every
+worker's SSE clients. Short-lived values that any worker may need to
+read back, such as stream subscriptions, are kept on it with a TTL.
+
+MARKET_BUS_URL picks the implementation. Empty (the default) gives
+InProcessBus, for a single worker. A redis:// URL gives RedisBus, which
+works with any server speaking the Redis protocol (Redis, Valkey,
+Dragonfly). Messages are bytes; handlers are called on the event loop
+and must not block.
+"""
+import asyncio
+import time
+from typing import Callable
+from app.core.config import settings
+
+BusHandler = Callable[[bytes], None]
+
+# Take the lease if it is free or already ours, and extend it
+_ACQUIRE_LEASE = """
+local holder = redis.call('GET', KEYS[1])
+if holder == false or holder == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+_RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _Handlers:
+    def __init__(self):
+        self._by_channel: dict[str, list[BusHandler]] = {}
+
+    def add(self, channel: str, handler: BusHandler) -> bool:
+        """Returns whether this is the channel's first handler."""
+        handlers = self._by_channel.setdefault(channel, [])
+        handlers.append(handler)
+        return len(handlers) == 1
+
+    def remove(self, channel: str, handler: BusHandler) -> bool:
+        """Returns whether the channel has no handlers left."""
+        handlers = self._by_channel.get(channel)
+        if not handlers:
+            return False
+        try:
+            handlers.remove(handler)
+        except ValueError:
+            return False
+        if handlers:
+            return False
+        del self._by_channel[channel]
+        return True
+
+    def dispatch(self, channel: str, payload: bytes) -> None:
+        for handler in tuple(self._by_channel.get(channel, ())):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"[Market Bus] Handler for {channel} failed: {e}")
+
+
+class InProcessBus:
+    """Single-worker bus: publish calls the subscribed handlers directly."""
+
+    def __init__(self):
+        self._handlers = _Handlers()
+        # lease name -> (holder, expires at)
+        self._leases: dict[str, tuple[str, float]] = {}
+        # key -> (value, expires at)
+        self._values: dict[str, tuple[bytes, float]] = {}
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        self._handlers.dispatch(channel, payload)
+
+    async def publish_many(self, messages: list[tuple[str, bytes]]) -> None:
+        for channel, payload in messages:
+            self._handlers.dispatch(channel, payload)
+
+    async def subscribe(self, channel: str, handler: BusHandler) -> None:
+        self._handlers.add(channel, handler)
+
+    async def unsubscribe(self, channel: str, handler: BusHandler) -> None:
+        self._handlers.remove(channel, handler)
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        now = time.monotonic()
+        current = self._leases.get(name)
+        if current is not None and current[0] != holder and current[1] > now:
+            return False
+        self._leases[name] = (holder, now + ttl_seconds)
+        return True
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        if self._leases.get(name, ("",))[0] == holder:
+            del self._leases[name]
+
+    async def set_value(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        now = time.monotonic()
+        for stale in [k for k, (_, expires_at) in self._values.items() if expires_at <= now]:
+            del self._values[stale]
+        self._values[key] = (value, now + ttl_seconds)
+
+    async def get_value(self, key: str) -> bytes | None:
+        entry = self._values.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    async def delete_value(self, key: str) -> None:
+        self._values.pop(key, None)
+
+    async def close(self) -> None:
+        self._leases.clear()
+        self._values.clear()
+
+
+class RedisBus:
+    """Bus over Redis PUBLISH/SUBSCRIBE, with leases as keys that expire."""
+
+    def __init__(self, url: str):
+        # Only multi-worker deployments need the client
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._handlers = _Handlers()
+        self._reader: asyncio.Task | None = None
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        await self._redis.publish(channel, payload)
+
+    async def publish_many(self, messages: list[tuple[str, bytes]]) -> None:
+        """One round-trip for the lot."""
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for channel, payload in messages:
+                pipe.publish(channel, payload)
+            await pipe.execute()
+
+    async def subscribe(self, channel: str, handler: BusHandler) -> None:
+        if self._handlers.add(channel, handler):
+            await self._pubsub.subscribe(channel)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, handler: BusHandler) -> None:
+        if self._handlers.remove(channel, handler):
+            await self._pubsub.unsubscribe(channel)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The next get_message reconnects and re-subscribes every channel
+                print(f"[Market Bus] Redis subscription error: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._handlers.dispatch(channel, message["data"])
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        return bool(await self._redis.eval(_ACQUIRE_LEASE, 1, name, holder, int(ttl_seconds * 1000)))
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        await self._redis.eval(_RELEASE_LEASE, 1, name, holder)
+
+    async def set_value(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        await self._redis.set(key, value, px=int(ttl_seconds * 1000))
+
+    async def get_value(self, key: str) -> bytes | None:
+        return await self._redis.get(key)
+
+    async def delete_value(self, key: str) -> None:
+        await self._redis.delete(key)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+def create_bus(url: str = settings.MARKET_BUS_URL) -> InProcessBus | RedisBus:
+    if not url:
+        return InProcessBus()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBus(url)
+    raise ValueError(f"Unsupported MARKET_BUS_URL scheme: {url.split(':', 1)[0]}")
+
+
+market_bus = create_bus()
@@ -0,0 +1,191 @@
+"""Idempotent follower dispatch for group orders.
+
+A group order may carry a client-generated ``client_order_id``. Before a
+follower order is sent, it is claimed here. A retried request whose follower
+was already claimed gets the recorded result back instead of sending a
+second order. Recent orders stay in a bounded in-memory map. The
+``order_dispatches`` table handles restarts and other workers. All
+followers of an order are claimed in one commit before the fan-out, and
+their results are written in one commit after it, each on a session of
+its own in the threadpool. Writes therefore never commit the caller's
+pending changes or block the event loop between followers.
+
+Only a definite Tradovate answer is recorded: an order ID, or a rejection
+with a failureReason. A claim whose send raised, or got no usable
+response (e.g. 401, 429 or 5xx), is released, so a retry sends that
+follower. A claim stuck in pending, e.g. by a restart, can be taken over
+after DISPATCH_PENDING_TIMEOUT_SECONDS. Rows are kept for
+DISPATCH_RETENTION_DAYS.
+
+Every follower result is also published on the market bus, on the group
+owner's ORDER_EVENTS_CHANNEL_PREFIX channel. The owner's client streams
+on any worker pick it up from there.
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from uuid import UUID
+from starlette.concurrency import run_in_threadpool
+from app.core.serialization import dumps
+from app.db.repositories.order_dispatch_repository import (
+    claim_order_dispatches,
+    finish_order_dispatches,
+    prune_order_dispatches,
+    release_order_dispatches,
+)
+from app.db.session import SessionLocal
+from app.services.market_bus_service import market_bus
+
+DISPATCH_CACHE_MAX_ORDERS = 2048
+DISPATCH_PENDING_TIMEOUT_SECONDS = 120
+DISPATCH_RETENTION_DAYS = 7
+DISPATCH_PRUNE_INTERVAL_SECONDS = 3600
+ORDER_EVENTS_CHANNEL_PREFIX = "orders:"
+
+
+@dataclass
+class DispatchResult:
+    status: str  # pending | sent | failed
+    order_id: int | None = None
+    error: str | None = None
+
+    def as_dict(self, sub_broker_id: str, replayed: bool) -> dict:
+        return {
+            "sub_broker_id": sub_broker_id,
+            "status": self.status,
+            "order_id": self.order_id,
+            "error": self.error,
+            "replayed": replayed,
+        }
+
+
+def result_from_response(response) -> DispatchResult | None:
+    """Map a Tradovate order response to a dispatch result.
+
+    None when the response says nothing definite, e.g. the None the
+    Tradovate helpers return for any non-200 or empty response.
+    """
+    if not isinstance(response, dict):
+        return None
+    if response.get("failureReason"):
+        error = response["failureReason"]
+        if response.get("failureText"):
+            error = f"{error}: {response['failureText']}"
+        return DispatchResult("failed", error=str(error))
+    order_id = response.get("orderId")
+    if order_id is None:
+        return None
+    return DispatchResult("sent", order_id=int(order_id))
+
+
+def _on_own_session(write, *args):
+    db = SessionLocal()
+    try:
+        return write(db, *args)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _claim_rows(client_order_id: str, sub_broker_ids: list[str]) -> dict[str, DispatchResult]:
+    rows = _on_own_session(
+        claim_order_dispatches,
+        client_order_id,
+        sub_broker_ids,
+        timedelta(seconds=DISPATCH_PENDING_TIMEOUT_SECONDS),
+    )
+    return {sub_broker_id: DispatchResult(row.status, row.order_id, row.error) for sub_broker_id, row in rows.items()}
+
+
+class OrderDispatchStore:
+    def __init__(self, max_orders: int = DISPATCH_CACHE_MAX_ORDERS):
+        self.max_orders = max_orders
+        # client_order_id -> sub_broker_id -> result
+        self._orders: OrderedDict[str, dict[str, DispatchResult]] = OrderedDict()
+
+    def _remember(self, client_order_id: str, sub_broker_id: str, result: DispatchResult) -> None:
+        followers = self._orders.get(client_order_id)
+        if followers is None:
+            followers = self._orders[client_order_id] = {}
+        self._orders.move_to_end(client_order_id)
+        followers[sub_broker_id] = result
+        while len(self._orders) > self.max_orders:
+            self._orders.popitem(last=False)
+
+    def _forget(self, client_order_id: str, sub_broker_id: str) -> None:
+        followers = self._orders.get(client_order_id)
+        if followers is not None:
+            followers.pop(sub_broker_id, None)
+
+    async def claim(self, client_order_id: str, sub_broker_ids: list[str]) -> dict[str, DispatchResult]:
+        """Claim the followers of an order. Returns the prior result of each follower not to send.
+
+        Followers are marked pending in memory before the first await, so two
+        requests on the same event loop cannot both claim one.
+        """
+        followers = self._orders.get(client_order_id, {})
+        prior = {sub_broker_id: followers[sub_broker_id] for sub_broker_id in sub_broker_ids if sub_broker_id in followers}
+        new = [sub_broker_id for sub_broker_id in sub_broker_ids if sub_broker_id not in prior]
+        if not new:
+            return prior
+        for sub_broker_id in new:
+            self._remember(client_order_id, sub_broker_id, DispatchResult("pending"))
+        try:
+            claimed_before = await run_in_threadpool(_claim_rows, client_order_id, new)
+        except Exception as e:
+            # The in-memory claims still protect this worker
+            print(f"[ORDER DISPATCH] Failed to persist claims for {client_order_id}: {e}")
+            return prior
+        for sub_broker_id, result in claimed_before.items():
+            self._remember(client_order_id, sub_broker_id, result)
+        return {**prior, **claimed_before}
+
+    async def finish(self, client_order_id: str, results: dict[str, DispatchResult]) -> None:
+        """Record the definite results of claimed followers."""
+        if not results:
+            return
+        for sub_broker_id, result in results.items():
+            self._remember(client_order_id, sub_broker_id, result)
+        rows = {sub_broker_id: (r.status, r.order_id, r.error) for sub_broker_id, r in results.items()}
+        try:
+            await run_in_threadpool(_on_own_session, finish_order_dispatches, client_order_id, rows)
+        except Exception as e:
+            print(f"[ORDER DISPATCH] Failed to persist results for {client_order_id}: {e}")
+
+    async def release(self, client_order_id: str, sub_broker_ids: list[str]) -> None:
+        """Give up claims whose orders were not sent; a retry claims and sends them again."""
+        if not sub_broker_ids:
+            return
+        for sub_broker_id in sub_broker_ids:
+            self._forget(client_order_id, sub_broker_id)
+        try:
+            await run_in_threadpool(_on_own_session, release_order_dispatches, client_order_id, sub_broker_ids)
+        except Exception as e:
+            print(f"[ORDER DISPATCH] Failed to release claims for {client_order_id}: {e}")
+
+    async def run_pruner(self) -> None:
+        """Delete dispatch rows older than DISPATCH_RETENTION_DAYS, once an hour."""
+        while True:
+            try:
+                deleted = await run_in_threadpool(
+                    _on_own_session, prune_order_dispatches, timedelta(days=DISPATCH_RETENTION_DAYS)
+                )
+                if deleted:
+                    print(f"[ORDER DISPATCH] Pruned {deleted} old dispatch rows")
+            except Exception as e:
+                print(f"[ORDER DISPATCH] Failed to prune dispatch rows: {e}")
+            await asyncio.sleep(DISPATCH_PRUNE_INTERVAL_SECONDS)
+
+
+order_dispatch_store = OrderDispatchStore()
+
+
+async def publish_order_event(user_id: UUID, event: dict) -> None:
+    """Hand a group order event to the user's client streams. Never fails the order."""
+    try:
+        await market_bus.publish(f"{ORDER_EVENTS_CHANNEL_PREFIX}{user_id}", dumps(event))
+    except Exception as e:
+        print(f"[ORDER DISPATCH] Failed to publish order event for user {user_id}: {e}")
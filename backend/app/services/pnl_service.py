@@ -0,0 +1,302 @@
+"""Unrealized PnL of a user's open positions.
+
+Shared by GET /databento/sse/pnl and the pnl topic of the client stream.
+A stream fetches positions and their contract details once, from the
+database and Tradovate. It then prices them from live quotes, or from
+the last historical close when there are none.
+
+A PnL SSE stream that closes keeps that bootstrap on the market bus,
+keyed by user and stream_id, so the same stream reconnecting on any
+worker skips it. The state records the user's resume generation from
+when its positions were loaded. A finished group order moves the
+generation on, which discards every older state of the user.
+"""
+from datetime import datetime
+from uuid import UUID, uuid4
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.core.serialization import dumps, loads
+from app.models.broker_account import BrokerAccount, SubBrokerAccount
+from app.services.broker_service import get_positions
+from app.services.market_bus_service import market_bus
+from app.services.subscription_registry_service import SUBSCRIPTION_TTL_SECONDS
+from app.services.symbology_service import symbology
+from app.utils.tradovate import get_contract_item, get_contract_maturity_item, get_product_item
+
+# Positions and contract details a reconnecting PnL stream reuses instead of refetching
+PNL_RESUME_KEY_PREFIX = "pnl-resume:"
+PNL_RESUME_GENERATION_KEY_PREFIX = "pnl-resume-generation:"
+
+
+def last_close_by_symbol(df: pd.DataFrame) -> pd.Series:
+    """Last close per symbol of an ohlcv DataFrame, in one groupby pass."""
+    if df is None or df.empty:
+        return pd.Series(dtype="float64")
+    if "symbol" in df.columns:
+        symbols = df["symbol"].to_numpy()
+    else:
+        symbols = df.index.get_level_values("symbol").to_numpy()
+    return df["close"].groupby(symbols, sort=False).last()
+
+
+def historical_pnl_rows(
+    positions: list[dict],
+    last_close: pd.Series,
+    contract_details_cache: dict[int, dict],
+    fill_missing_with_entry: bool,
+) -> list[dict]:
+    """Unrealized PnL for every open position against the last historical close.
+
+    Each position is priced from symbology.price_symbol of its symbol
+    (the symbol itself for outrights, the front month for parents).
+    Positions without a price are dropped, or priced at entry when
+    fill_missing_with_entry is set.
+    """
+    frame = pd.DataFrame.from_records(
+        positions,
+        columns=["symbol", "accountId", "accountNickname", "accountDisplayName", "netPos", "netPrice", "contractId"],
+    )
+    frame["netPos"] = frame["netPos"].fillna(0)
+    frame = frame[frame["netPos"] != 0]
+    if frame.empty:
+        return []
+    entry = frame["netPrice"].fillna(0).astype("float64")
+    raw = frame["symbol"].fillna("").astype(str)
+    current = raw.map({s: symbology.price_symbol(s) for s in raw.unique()}).map(last_close)
+    if fill_missing_with_entry:
+        current = current.fillna(entry)
+    value_per_point = frame["contractId"].map(
+        {cid: details.get("valuePerPoint", 50) for cid, details in contract_details_cache.items()}
+    ).fillna(50)
+    pnl = ((current - entry) * frame["netPos"] * value_per_point).round(2)
+    result = pd.DataFrame({
+        "symbol": frame["symbol"],
+        "accountId": frame["accountId"],
+        "accountNickname": frame["accountNickname"].fillna(""),
+        "accountDisplayName": frame["accountDisplayName"].fillna(""),
+        "netPos": frame["netPos"],
+        "entryPrice": entry,
+        "currentPrice": current,
+        "unrealizedPnL": pnl,
+    })
+    return result[current.notna()].to_dict("records")
+
+
+async def load_positions(db: Session, user_id: UUID) -> tuple[list[dict], dict[int, dict]]:
+    """The user's positions as dicts, and contract details (valuePerPoint, tickSize, symbol) by contract id."""
+    positions_dict = []
+    contract_details_cache = {}
+    positions = await get_positions(db, user_id)
+    # Convert Pydantic models to dicts for serialization
+    for pos in positions:
+        if isinstance(pos, dict):
+            positions_dict.append(pos)
+        else:
+            # Convert Pydantic model to dict
+            positions_dict.append({
+                "id": getattr(pos, "id", None),
+                "accountId": getattr(pos, "accountId", None),
+                "contractId": getattr(pos, "contractId", None),
+                "accountNickname": getattr(pos, "accountNickname", None),
+                "symbol": getattr(pos, "symbol", None),
+                "netPos": getattr(pos, "netPos", 0),
+                "netPrice": getattr(pos, "netPrice", 0),
+                "bought": getattr(pos, "bought", 0),
+                "boughtValue": getattr(pos, "boughtValue", 0),
+                "sold": getattr(pos, "sold", 0),
+                "soldValue": getattr(pos, "soldValue", 0),
+                "accountDisplayName": getattr(pos, "accountDisplayName", None),
+            })
+
+    # Fetch contract details for all positions while we still have the DB session
+    account_ids = {str(p.get("accountId") or getattr(p, "accountId", None)) for p in positions_dict if (p.get("netPos") or getattr(p, "netPos", 0) or 0) != 0}
+    if account_ids:
+        sub_accounts = (
+            db.query(SubBrokerAccount)
+            .filter(SubBrokerAccount.sub_account_id.in_(list(account_ids)))
+            .all()
+        )
+        sub_map = {s.sub_account_id: s for s in sub_accounts}
+
+        # Get unique contract IDs
+        unique_contracts = {}
+        for pos in positions_dict:
+            net_pos = pos.get("netPos") or 0
+            if net_pos != 0:
+                contract_id = pos.get("contractId")
+                account_id = str(pos.get("accountId"))
+                if contract_id and account_id in sub_map:
+                    sba = sub_map[account_id]
+                    key = (sba.is_demo, contract_id)
+                    if key not in unique_contracts:
+                        unique_contracts[key] = {
+                            "contract_id": contract_id,
+                            "is_demo": sba.is_demo,
+                            "broker_account": db.query(BrokerAccount)
+                                .filter(BrokerAccount.user_broker_id == sba.user_broker_id)
+                                .first()
+                        }
+
+        # Fetch contract details for all unique contracts
+        for (is_demo, contract_id), info in unique_contracts.items():
+            if info["broker_account"]:
+                try:
+                    contract_item = await get_contract_item(
+                        contract_id, info["broker_account"].access_token, is_demo=is_demo
+                    )
+                    if contract_item:
+                        contract_maturity = await get_contract_maturity_item(
+                            contract_item["contractMaturityId"], info["broker_account"].access_token, is_demo=is_demo
+                        )
+                        if contract_maturity:
+                            product_item = await get_product_item(
+                                contract_maturity["productId"], info["broker_account"].access_token, is_demo=is_demo
+                            )
+                            if product_item:
+                                contract_details_cache[contract_id] = {
+                                    "valuePerPoint": product_item.get("valuePerPoint", 50),
+                                    "tickSize": product_item.get("tickSize", 0.25),
+                                    "symbol": contract_item.get("name", "")
+                                }
+                except Exception:
+                    # Use defaults
+                    contract_details_cache[contract_id] = {
+                        "valuePerPoint": 50,
+                        "tickSize": 0.25,
+                        "symbol": ""
+                    }
+    return positions_dict, contract_details_cache
+
+
+async def pnl_resume_generation(user_id: UUID) -> str | None:
+    """The user's resume generation; read it before loading positions."""
+    generation = await market_bus.get_value(f"{PNL_RESUME_GENERATION_KEY_PREFIX}{user_id}")
+    return generation.decode() if generation is not None else None
+
+
+async def expire_pnl_resume(user_id: UUID) -> None:
+    """Discard the resume state of every PnL stream of the user, e.g. once an order has changed positions. Never fails."""
+    try:
+        # Outlives every state saved before it, which lapses SUBSCRIPTION_TTL_SECONDS after its save
+        await market_bus.set_value(
+            f"{PNL_RESUME_GENERATION_KEY_PREFIX}{user_id}", uuid4().hex.encode(), SUBSCRIPTION_TTL_SECONDS
+        )
+    except Exception as e:
+        print(f"[PnL] Failed to expire resume state for user {user_id}: {e}")
+
+
+async def save_pnl_resume(
+    user_id: UUID,
+    stream_id: str,
+    generation: str | None,
+    positions: list[dict],
+    contract_details_cache: dict[int, dict],
+) -> None:
+    state = {"generation": generation, "positions": positions, "contract_details": contract_details_cache}
+    await market_bus.set_value(f"{PNL_RESUME_KEY_PREFIX}{user_id}:{stream_id}", dumps(state), SUBSCRIPTION_TTL_SECONDS)
+
+
+async def load_pnl_resume(user_id: UUID, stream_id: str) -> tuple[str | None, list[dict], dict[int, dict]] | None:
+    """A closed stream's generation, positions and contract details, unless an order has changed positions since."""
+    key = f"{PNL_RESUME_KEY_PREFIX}{user_id}:{stream_id}"
+    stored = await market_bus.get_value(key)
+    if stored is None:
+        return None
+    state = loads(stored)
+    if state["generation"] != await pnl_resume_generation(user_id):
+        await market_bus.delete_value(key)
+        return None
+    # JSON object keys are strings; contract ids are ints
+    contract_details = {int(k): v for k, v in state["contract_details"].items()}
+    return state["generation"], state["positions"], contract_details
+
+
+def positions_by_symbol(positions: list[dict], contract_details_cache: dict[int, dict]) -> dict[str, list[dict]]:
+    """Open positions grouped by symbol, each with its contract details."""
+    # Store position data for PnL calculation grouped by symbol
+    # Some users may have multiple positions for the same symbol across accounts
+    symbol_to_positions: dict[str, list[dict]] = {}
+
+    for pos in positions:
+        net_pos = pos.get('netPos') or 0
+        if net_pos != 0:
+            contract_id = pos.get('contractId')
+            account_id = pos.get('accountId')
+            symbol_name = pos.get('symbol')
+            account_nickname = pos.get('accountNickname')
+            account_display = pos.get('accountDisplayName')
+            net_price = pos.get('netPrice') or 0
+
+            symbol_to_positions.setdefault(symbol_name, []).append({
+                "accountId": account_id,
+                "accountNickname": account_nickname,
+                "accountDisplayName": account_display,
+                "netPos": net_pos,
+                "netPrice": net_price,
+                "contractId": contract_id,
+                "symbol": symbol_name,
+                # Contract details from the cache fetched before the stream started
+                "contractDetails": contract_details_cache.get(contract_id, {
+                    "valuePerPoint": 50,  # Default ES multiplier
+                    "tickSize": 0.25,  # Default ES tick size
+                    "symbol": symbol_name
+                })
+            })
+    return symbol_to_positions
+
+
+def quote_pnl(
+    symbol: str,
+    positions: list[dict],
+    bid_price: float | None,
+    ask_price: float | None,
+    last_price: float | None,
+) -> list[dict]:
+    """PnL of one symbol's positions (from positions_by_symbol) at a quote."""
+    rows = []
+    now = datetime.now().isoformat()
+    for position in positions:
+        netPos = position["netPos"]
+        netPrice = position["netPrice"]
+        contractDetails = position["contractDetails"]
+        valuePerPoint = contractDetails["valuePerPoint"]
+        tickSize = contractDetails["tickSize"]
+
+        # Determine which price to use based on position direction
+        # Long positions: use BID (what you'd get if you sell now)
+        # Short positions: use ASK (what you'd pay if you buy back now)
+        if netPos > 0:  # Long position
+            current_price = bid_price if bid_price is not None else (last_price if last_price is not None else ask_price)
+            if current_price is None:
+                continue
+            # PnL = (Current Price - Entry Price) * Quantity * Contract Multiplier
+            price_diff = current_price - netPrice
+            unrealized_pnl = price_diff * netPos * valuePerPoint
+        else:  # Short position
+            current_price = ask_price if ask_price is not None else (last_price if last_price is not None else bid_price)
+            if current_price is None:
+                continue
+            # PnL = (Entry Price - Current Price) * Quantity * Contract Multiplier
+            price_diff = netPrice - current_price
+            unrealized_pnl = price_diff * abs(netPos) * valuePerPoint
+
+        pnl_data = {
+            "symbol": symbol,
+            "accountId": position["accountId"],
+            "accountNickname": position["accountNickname"],
+            "accountDisplayName": position["accountDisplayName"],
+            "netPos": netPos,
+            "entryPrice": netPrice,
+            "currentPrice": current_price,
+            "unrealizedPnL": round(unrealized_pnl, 2),
+            "bidPrice": bid_price,
+            "askPrice": ask_price,
+            "lastPrice": last_price,
+            "valuePerPoint": valuePerPoint,
+            "tickSize": tickSize,
+            "priceDiff": round(price_diff, 4),
+            "timestamp": now,
+            "positionKey": f"{symbol}:{position['accountId']}"
+        }
+        rows.append(pnl_data)
+    return rows
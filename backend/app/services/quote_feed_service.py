@@ -0,0 +1,583 @@
+"""One upstream Databento session shared by every worker's price streams.
+
+Workers elect an owner through a lease on the market bus. The owner runs
+a single Live MBP-1 session for every symbol any worker needs. It
+publishes one normalized quote per record on quotes:<raw symbol>. Every
+worker, the owner included, subscribes to the channels its own SSE
+clients want and fans the quotes out to them. /sse/current-price and
+/sse/pnl therefore open no Live session of their own.
+
+Each worker announces the symbols its subscription registry holds on
+QUOTE_INTEREST_CHANNEL, whenever they change and every
+QUOTE_INTEREST_SECONDS. An announcement that is not refreshed within
+QUOTE_INTEREST_TTL_SECONDS no longer counts, so a dead worker's symbols
+drop out. A dead owner's lease lapses, and another worker takes the
+upstream session within QUOTE_UPSTREAM_LEASE_SECONDS. Live sessions
+cannot unsubscribe, so the owner reopens the session without symbols
+that have been unwanted for QUOTE_IDLE_SECONDS.
+
+A quote carries the whole top of book and the last trade price. A
+subscriber that falls behind is handed only the newest quote per symbol,
+not a queue of stale ones. The owner coalesces the same way: its
+upstream loop never waits for the bus. A publisher task sends the newest
+pending quote per symbol in one batch (one pipeline on Redis) while the
+loop reads on, so a slow bus thins quotes out instead of backing records
+up in the Live buffer.
+
+The owner stamps every quote with a seq that increases across owners,
+which streams send as the SSE event id. Each worker keeps the newest
+quote per symbol and keeps listening while the subscription registry
+holds the symbol, which it does for a while after the stream closes. A
+stream that reconnects with the last id it saw is handed the quotes it
+missed, newest per symbol, as for a slow subscriber.
+
+A new stream does not wait for the next market update. The owner keeps
+the latest book per symbol and writes it to the bus under
+quotes-book:<raw symbol>, where it outlasts a weekend. Each worker seeds
+its newest quotes from there, so a subscriber gets the current top of
+book at once, also while the market is closed. Live sessions only offer
+snapshots for MBO, so a new session replays the last
+QUOTE_REPLAY_SECONDS of MBP-1 instead and publishes just the resulting
+book per symbol. A running session streams symbols added to it live
+only, so a short-lived second session replays those and closes.
+
+Upstream listeners (see add_upstream_listener) see every record of the
+owner's sessions, replayed ones included, e.g. to build live bars
+without an upstream session of their own. Replays start on a minute
+boundary.
+"""
+import asyncio
+import math
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Protocol
+import databento as dbt
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+from app.services.historical_service import DATASET, HISTORICAL_END_LAG
+from app.services.instrument_index_service import InstrumentIndex
+from app.services.market_bus_service import market_bus
+from app.services.subscription_registry_service import subscriptions
+from app.services.symbology_service import symbology
+
+QUOTE_SCHEMA = "mbp-1"
+QUOTE_CHANNEL_PREFIX = "quotes:"
+QUOTE_INTEREST_CHANNEL = "quotes-interest"
+# Upstream errors, delivered to every subscriber
+QUOTE_STATUS_CHANNEL = "quotes-status"
+QUOTE_UPSTREAM_LEASE = "quotes-upstream"
+QUOTE_UPSTREAM_LEASE_SECONDS = 10.0
+QUOTE_INTEREST_SECONDS = 3.0
+QUOTE_INTEREST_TTL_SECONDS = 3 * QUOTE_INTEREST_SECONDS
+# Before reopening an upstream session that failed or was closed
+QUOTE_UPSTREAM_RETRY_SECONDS = 5.0
+# Unwanted symbols stay subscribed this long, so reconnects do not churn the session
+QUOTE_IDLE_SECONDS = 30.0
+QUOTE_BOOK_PREFIX = "quotes-book:"
+# Cached books outlast a weekend close
+QUOTE_BOOK_TTL_SECONDS = 4 * 24 * 3600.0
+# A book quoted more recently than this shows the market is open
+QUOTE_BOOK_FRESH_SECONDS = 300.0
+# Intraday replay that fills the book, and the live bars back past the historical end, when an upstream session opens
+QUOTE_REPLAY_SECONDS = HISTORICAL_END_LAG.total_seconds() + 300.0
+# Longest a replay session for symbols added to a running session stays open
+QUOTE_REPLAY_TIMEOUT_SECONDS = 60.0
+# Longest the upstream loop runs on buffered records before letting the publisher send
+QUOTE_PUBLISH_SECONDS = 0.005
+_NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class UpstreamListener(Protocol):
+    def upstream_replaying(self, symbols: list[str]) -> None:
+        """A replay of these raw symbols starts; records seen for them before are replayed again."""
+
+    def upstream_record(self, symbol: str, record) -> None:
+        """A record of the owner's upstream session, routed to its raw symbol."""
+
+
+def _replay_start(replay_until: int) -> int:
+    return (replay_until - int(QUOTE_REPLAY_SECONDS * 1e9)) // _NS_PER_MINUTE * _NS_PER_MINUTE
+
+
+def _price(value) -> float | None:
+    price = float(value)
+    return price if math.isfinite(price) else None
+
+
+def _quote_from_record(record, symbol: str, last_trades: dict[int, float]) -> dict | None:
+    """Normalized quote for an MBP-1 (or trade) record; last_trades carries trade prices across records."""
+    name = type(record).__name__
+    if name not in ("MBP1Msg", "MBPMsg", "TradeMsg"):
+        return None
+    instrument_id = record.instrument_id
+    if name == "TradeMsg" or str(getattr(record, "action", "")) in ("T", "Action.TRADE"):
+        last_price = _price(record.pretty_price)
+        if last_price is not None:
+            last_trades[instrument_id] = last_price
+    bid_price = ask_price = bid_size = ask_size = None
+    levels = getattr(record, "levels", None)
+    level = levels[0] if isinstance(levels, list) and levels else levels
+    if level is not None and hasattr(level, "bid_px"):
+        bid_price = _price(level.pretty_bid_px)
+        ask_price = _price(level.pretty_ask_px)
+        bid_size = int(level.bid_sz)
+        ask_size = int(level.ask_sz)
+    return {
+        "symbol": symbol,
+        "instrument_id": instrument_id,
+        "ts_event": record.ts_event,
+        "bid_price": bid_price,
+        "ask_price": ask_price,
+        "bid_size": bid_size,
+        "ask_size": ask_size,
+        "last_price": last_trades.get(instrument_id),
+        "record_type": name,
+    }
+
+
+class QuoteSubscriber:
+    def __init__(self, symbols: set[str]):
+        self.symbols = symbols
+        # symbol -> newest quote not yet taken
+        self._quotes: dict[str, dict] = {}
+        self._status: list[dict] = []
+        self._event = asyncio.Event()
+
+    def push_quote(self, quote: dict) -> None:
+        self._quotes[quote["symbol"]] = quote
+        self._event.set()
+
+    def push_status(self, status: dict) -> None:
+        self._status.append(status)
+        self._event.set()
+
+    async def get(self) -> list[dict]:
+        """Waits for news: status messages (with an "error" key) first, then quotes."""
+        await self._event.wait()
+        self._event.clear()
+        messages = self._status + sorted(self._quotes.values(), key=lambda quote: quote["seq"])
+        self._status = []
+        self._quotes = {}
+        return messages
+
+
+class QuoteFeed:
+    def __init__(self, bus=market_bus):
+        self.bus = bus
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_owner = False
+        # Local fan-out: raw symbol -> subscribers
+        self._subscribers: dict[str, set[QuoteSubscriber]] = {}
+        # Quote channels this worker listens to, and the newest quote on each
+        self._channels: set[str] = set()
+        self._latest: dict[str, dict] = {}
+        # Highest quote seq seen (or, on the owner, stamped)
+        self._seq = 0
+        # Owner: newest quote per upstream symbol, and those not yet written to the bus
+        self._book: dict[str, dict] = {}
+        self._dirty: set[str] = set()
+        # Owner: newest quote per symbol not yet published
+        self._outgoing: dict[str, dict] = {}
+        self._outgoing_ready = asyncio.Event()
+        # Other workers' announcements: worker_id -> (symbols, expires at)
+        self._remote: dict[str, tuple[frozenset[str], float]] = {}
+        self._wake = asyncio.Event()
+        # Upstream session, on the owner only
+        self._client = None
+        self._index: InstrumentIndex | None = None
+        self._upstream: asyncio.Task | None = None
+        self._upstream_symbols: set[str] = set()
+        # Replay sessions for symbols added to the running session
+        self._replays: set[asyncio.Task] = set()
+        self._retry_at = 0.0
+        # When the upstream session last started carrying symbols nobody wants
+        self._idle_since: float | None = None
+        self._upstream_listeners: list[UpstreamListener] = []
+        # Raw symbols held by other services on this worker, e.g. live bars
+        self._held: Counter[str] = Counter()
+        subscriptions.add_listener(self._wake.set)
+
+    def add_upstream_listener(self, listener: UpstreamListener) -> None:
+        self._upstream_listeners.append(listener)
+
+    def hold(self, symbols: list[str]) -> None:
+        """Keep raw symbols in the upstream session without subscribing to their quotes."""
+        self._held.update(symbols)
+        self._wake.set()
+
+    def release(self, symbols: list[str]) -> None:
+        self._held.subtract(symbols)
+        self._held = +self._held
+        self._wake.set()
+
+    # ---- local subscribers -------------------------------------------------
+
+    def cursor(self) -> int:
+        """Seq of the newest quote seen; a stream resumed after it misses nothing from here on."""
+        return self._seq
+
+    def latest(self, symbol: str) -> dict | None:
+        """Newest quote this worker has for a raw symbol it listens to."""
+        return self._latest.get(symbol)
+
+    async def books(self, symbols: list[str]) -> dict[str, dict]:
+        """Cached top of book for raw symbols: from memory, else from the bus. Symbols never quoted are left out."""
+        books = {}
+        for symbol in symbols:
+            quote = self._latest.get(symbol) or self._book.get(symbol)
+            if quote is None:
+                stored = await self.bus.get_value(QUOTE_BOOK_PREFIX + symbol)
+                quote = loads(stored) if stored is not None else None
+            if quote is not None:
+                books[symbol] = quote
+        return books
+
+    async def subscribe(self, symbols: list[str], since: int | None = None) -> QuoteSubscriber:
+        """Raw symbols (see SymbologyService.price_symbol) to receive quotes for.
+
+        The cached book of each symbol is handed over at once; with since
+        (a seq from an earlier stream), only quotes newer than it.
+        """
+        subscriber = QuoteSubscriber(set(symbols))
+        for symbol in subscriber.symbols:
+            self._subscribers.setdefault(symbol, set()).add(subscriber)
+            if symbol not in self._channels:
+                self._channels.add(symbol)
+                await self.bus.subscribe(QUOTE_CHANNEL_PREFIX + symbol, self._on_quote)
+                self._wake.set()
+        for symbol, quote in (await self.books(list(subscriber.symbols))).items():
+            # A quote published meanwhile is newer than the cached one
+            quote = self._latest.setdefault(symbol, quote)
+            self._seq = max(self._seq, quote["seq"])
+            if since is None or quote["seq"] > since:
+                subscriber.push_quote(quote)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: QuoteSubscriber) -> None:
+        # The channel stays open while the registry holds the symbol; see _sync_channels
+        for symbol in subscriber.symbols:
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[symbol]
+                self._wake.set()
+
+    async def _sync_channels(self) -> None:
+        """Stop listening to symbols no stream holds or may reconnect for."""
+        for symbol in self._channels - self.local_symbols():
+            self._channels.discard(symbol)
+            self._latest.pop(symbol, None)
+            await self.bus.unsubscribe(QUOTE_CHANNEL_PREFIX + symbol, self._on_quote)
+
+    def _on_quote(self, payload: bytes) -> None:
+        quote = loads(payload)
+        self._seq = max(self._seq, quote["seq"])
+        self._latest[quote["symbol"]] = quote
+        for subscriber in self._subscribers.get(quote["symbol"], ()):
+            subscriber.push_quote(quote)
+
+    def _on_status(self, payload: bytes) -> None:
+        status = loads(payload)
+        for subscriber in {s for subscribers in self._subscribers.values() for s in subscribers}:
+            subscriber.push_status(status)
+
+    # ---- interest and election ---------------------------------------------
+
+    def _on_interest(self, payload: bytes) -> None:
+        message = loads(payload)
+        worker = message["worker"]
+        if worker == self.worker_id:
+            return
+        symbols = frozenset(message["symbols"])
+        previous = self._remote.get(worker)
+        self._remote[worker] = (symbols, time.monotonic() + QUOTE_INTEREST_TTL_SECONDS)
+        if self.is_owner and (previous is None or previous[0] != symbols):
+            self._wake.set()
+
+    def local_symbols(self) -> set[str]:
+        """Registered symbols, including ones POSTed for a stream that has not opened yet."""
+        return subscriptions.symbols() | set(self._subscribers) | set(self._held)
+
+    def wanted_symbols(self) -> set[str]:
+        now = time.monotonic()
+        for worker, (_symbols, expires_at) in list(self._remote.items()):
+            if expires_at < now:
+                del self._remote[worker]
+        return self.local_symbols().union(*(symbols for symbols, _ in self._remote.values()))
+
+    async def _tick(self) -> None:
+        await self._sync_channels()
+        await self.bus.publish(
+            QUOTE_INTEREST_CHANNEL, dumps({"worker": self.worker_id, "symbols": sorted(self.local_symbols())})
+        )
+        owner = await self.bus.acquire_lease(QUOTE_UPSTREAM_LEASE, self.worker_id, QUOTE_UPSTREAM_LEASE_SECONDS)
+        if owner != self.is_owner:
+            print(f"[Quote Feed] Worker {self.worker_id} {'now owns' if owner else 'lost'} the upstream session")
+            self.is_owner = owner
+        if owner:
+            await self._reconcile()
+            await self._flush_book()
+        else:
+            self._stop_upstream()
+
+    async def run(self) -> None:
+        await self.bus.subscribe(QUOTE_INTEREST_CHANNEL, self._on_interest)
+        await self.bus.subscribe(QUOTE_STATUS_CHANNEL, self._on_status)
+        try:
+            while True:
+                try:
+                    await self._tick()
+                except Exception as e:
+                    print(f"[Quote Feed] Error: {e}")
+                # asyncio.wait, unlike wait_for on 3.11, never swallows a cancel that races the wake-up
+                waiter = asyncio.ensure_future(self._wake.wait())
+                try:
+                    await asyncio.wait((waiter,), timeout=QUOTE_INTEREST_SECONDS)
+                finally:
+                    waiter.cancel()
+                self._wake.clear()
+        finally:
+            self._stop_upstream()
+            if self.is_owner:
+                await self.bus.release_lease(QUOTE_UPSTREAM_LEASE, self.worker_id)
+
+    # ---- upstream session (owner) ------------------------------------------
+
+    def _next_seq(self) -> int:
+        # Microseconds since the epoch, so a new owner carries on above the old one's ids
+        self._seq = max(self._seq + 1, time.time_ns() // 1000)
+        return self._seq
+
+    def _publish(self, quote: dict) -> None:
+        """Stamp a quote and hand it to the publisher; an unsent older quote for the symbol is dropped."""
+        quote["seq"] = self._next_seq()
+        self._book[quote["symbol"]] = quote
+        self._dirty.add(quote["symbol"])
+        self._outgoing[quote["symbol"]] = quote
+        self._outgoing_ready.set()
+
+    async def _send_outgoing(self) -> None:
+        batch, self._outgoing = self._outgoing, {}
+        if not batch:
+            return
+        try:
+            await self.bus.publish_many(
+                [(QUOTE_CHANNEL_PREFIX + symbol, dumps(quote)) for symbol, quote in batch.items()]
+            )
+        except Exception as e:
+            print(f"[Quote Feed] Publishing {len(batch)} quotes failed: {e}")
+
+    async def _publisher(self) -> None:
+        while True:
+            await self._outgoing_ready.wait()
+            self._outgoing_ready.clear()
+            await self._send_outgoing()
+
+    async def _flush_book(self) -> None:
+        """Write the books that changed since the last tick to the bus, for every worker's new streams."""
+        dirty, self._dirty = self._dirty, set()
+        for symbol in dirty:
+            await self.bus.set_value(QUOTE_BOOK_PREFIX + symbol, dumps(self._book[symbol]), QUOTE_BOOK_TTL_SECONDS)
+
+    async def _reconcile(self) -> None:
+        wanted = self.wanted_symbols() if settings.DATABENTO_KEY else set()
+        now = time.monotonic()
+        if self._upstream is None or self._upstream.done():
+            if wanted and now >= self._retry_at:
+                self._start_upstream(wanted)
+            return
+        if self._upstream_symbols - wanted:
+            if self._idle_since is None:
+                self._idle_since = now
+            elif now - self._idle_since >= QUOTE_IDLE_SECONDS:
+                print(f"[Quote Feed] Dropping idle symbols {sorted(self._upstream_symbols - wanted)}")
+                self._stop_upstream()
+                if wanted:
+                    self._start_upstream(wanted)
+                return
+        else:
+            self._idle_since = None
+        added = wanted - self._upstream_symbols
+        if added and self._client is not None:
+            # A running session takes further subscriptions
+            self._upstream_symbols |= added
+            self._index.add_symbols(added)
+            self._index.preload({s: symbology.instrument_ids(s) for s in added})
+            # The replay covers up to here, the running session from here on
+            replay_until = time.time_ns()
+            for listener in self._upstream_listeners:
+                listener.upstream_replaying(sorted(added))
+            await run_in_threadpool(
+                self._client.subscribe, dataset=DATASET, schema=QUOTE_SCHEMA, symbols=sorted(added), stype_in="raw_symbol"
+            )
+            replay = asyncio.create_task(self._replay(sorted(added), replay_until))
+            self._replays.add(replay)
+            replay.add_done_callback(self._replays.discard)
+
+    def _start_upstream(self, symbols: set[str]) -> None:
+        self._upstream_symbols = set(symbols)
+        self._idle_since = None
+        self._index = InstrumentIndex(sorted(symbols), match_variants=False)
+        self._index.preload({s: symbology.instrument_ids(s) for s in symbols})
+        self._client = None
+        self._upstream = asyncio.create_task(self._stream(sorted(symbols)))
+
+    def _stop_upstream(self) -> None:
+        if self._upstream is not None:
+            self._upstream.cancel()
+            self._upstream = None
+        for replay in self._replays:
+            replay.cancel()
+        self._upstream_symbols = set()
+
+    async def _stream(self, symbols: list[str]) -> None:
+        print(f"[Quote Feed] Opening upstream session for {symbols}")
+        client = dbt.Live(key=settings.DATABENTO_KEY)
+        index = self._index
+        last_trades: dict[int, float] = {}
+        # Replayed records only build the book, published once per symbol when the replay ends
+        replay_until = time.time_ns()
+        replayed: dict[str, dict] | None = {}
+        self._outgoing = {}
+        publisher = asyncio.create_task(self._publisher())
+        # Buffered records come back without suspending; see QUOTE_PUBLISH_SECONDS
+        yielded_at = time.monotonic()
+        listeners = self._upstream_listeners
+        for listener in listeners:
+            listener.upstream_replaying(symbols)
+        try:
+            # Connecting and authenticating block
+            await run_in_threadpool(
+                client.subscribe, dataset=DATASET, schema=QUOTE_SCHEMA, symbols=symbols, stype_in="raw_symbol",
+                start=_replay_start(replay_until),
+            )
+            self._client = client
+            async for record in client:
+                name = type(record).__name__
+                if name == "SymbolMappingMsg":
+                    index.add_mapping(record.instrument_id, getattr(record, "stype_in_symbol", None))
+                    continue
+                if name == "SystemMsg":
+                    if replayed is not None and record.code == dbt.SystemCode.REPLAY_COMPLETED:
+                        for quote in replayed.values():
+                            self._publish(quote)
+                        replayed = None
+                    continue
+                route = index.get(record.instrument_id)
+                if route is None:
+                    continue
+                for listener in listeners:
+                    listener.upstream_record(route[1], record)
+                quote = _quote_from_record(record, route[1], last_trades)
+                if quote is None:
+                    continue
+                if replayed is not None:
+                    if record.ts_event < replay_until:
+                        replayed[route[1]] = quote
+                        continue
+                    # Live already, without a replay-completed message
+                    for replayed_quote in replayed.values():
+                        self._publish(replayed_quote)
+                    replayed = None
+                self._publish(quote)
+                if time.monotonic() - yielded_at >= QUOTE_PUBLISH_SECONDS:
+                    await asyncio.sleep(0)
+                    yielded_at = time.monotonic()
+            await self._send_outgoing()
+            print("[Quote Feed] Upstream session closed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Quote Feed] Upstream session failed: {e}")
+            await self.bus.publish(
+                QUOTE_STATUS_CHANNEL, dumps({"error": str(e), "timestamp": datetime.now().isoformat()})
+            )
+        finally:
+            publisher.cancel()
+            self._retry_at = time.monotonic() + QUOTE_UPSTREAM_RETRY_SECONDS
+            if self._client is client:
+                self._client = None
+            try:
+                client.terminate()
+            except Exception:
+                pass
+
+    async def _replay(self, symbols: list[str], replay_until: int) -> None:
+        """Fill the book of symbols added to the running session from a replay session of their own.
+
+        Records up to replay_until, when the running session took the
+        symbols, are replayed. A replayed book is published only if the
+        running session has not quoted the symbol since.
+        """
+        client = dbt.Live(key=settings.DATABENTO_KEY)
+        index = InstrumentIndex(symbols, match_variants=False)
+        index.preload({s: symbology.instrument_ids(s) for s in symbols})
+        last_trades: dict[int, float] = {}
+        replayed: dict[str, dict] = {}
+        yielded_at = time.monotonic()
+        try:
+            async with asyncio.timeout(QUOTE_REPLAY_TIMEOUT_SECONDS):
+                await run_in_threadpool(
+                    client.subscribe, dataset=DATASET, schema=QUOTE_SCHEMA, symbols=symbols, stype_in="raw_symbol",
+                    start=_replay_start(replay_until),
+                )
+                async for record in client:
+                    name = type(record).__name__
+                    if name == "SymbolMappingMsg":
+                        index.add_mapping(record.instrument_id, getattr(record, "stype_in_symbol", None))
+                        continue
+                    if name == "SystemMsg":
+                        if record.code == dbt.SystemCode.REPLAY_COMPLETED:
+                            break
+                        continue
+                    route = index.get(record.instrument_id)
+                    if route is None:
+                        continue
+                    if record.ts_event >= replay_until:
+                        # The running session has it; stop without a replay-completed message
+                        break
+                    for listener in self._upstream_listeners:
+                        listener.upstream_record(route[1], record)
+                    quote = _quote_from_record(record, route[1], last_trades)
+                    if quote is None:
+                        continue
+                    replayed[route[1]] = quote
+                    if time.monotonic() - yielded_at >= QUOTE_PUBLISH_SECONDS:
+                        await asyncio.sleep(0)
+                        yielded_at = time.monotonic()
+        except TimeoutError:
+            print(f"[Quote Feed] Replay for {symbols} timed out")
+        except Exception as e:
+            print(f"[Quote Feed] Replay for {symbols} failed: {e}")
+        finally:
+            try:
+                client.terminate()
+            except Exception:
+                pass
+        for symbol, quote in replayed.items():
+            current = self._book.get(symbol)
+            if current is None or current["ts_event"] < quote["ts_event"]:
+                self._publish(quote)
+        print(f"[Quote Feed] Replayed books for {sorted(replayed)}")
+
+    def status(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "is_owner": self.is_owner,
+            "local_symbols": sorted(self.local_symbols()),
+            "local_subscribers": len({s for subscribers in self._subscribers.values() for s in subscribers}),
+            "cursor": self._seq,
+            "workers": len(self._remote) + 1,
+            "upstream_symbols": sorted(self._upstream_symbols) if self.is_owner else [],
+            "subscriptions": subscriptions.status(),
+        }
+
+
+quote_feed = QuoteFeed()
@@ -0,0 +1,73 @@
+"""Connection lifecycle for SSE streams.
+
+stream_until_disconnect runs a stream's producer (an async generator of
+encoded SSE frames) as its own task, feeding a bounded queue that the
+response drains. One watcher task per connection waits for the client's
+http.disconnect and cancels the producer. The producer's record loop
+therefore never polls request.is_disconnected(). Its finally block, which
+releases the upstream subscription, runs as soon as the client leaves,
+even on a symbol that is not ticking. Frames that queue up while the
+client is being written to are sent together in one chunk.
+"""
+import asyncio
+from typing import AsyncGenerator
+from fastapi import Request
+
+# Frames buffered for a slow client before the producer waits for it
+SSE_QUEUE_SIZE = 256
+
+_END = object()
+
+
+async def stream_until_disconnect(
+    request: Request,
+    frames: AsyncGenerator[bytes, None],
+    name: str = "SSE",
+) -> AsyncGenerator[bytes, None]:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+
+    async def produce() -> None:
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+        finally:
+            # Cancelled while waiting on the queue: close the generator now, not at GC
+            await frames.aclose()
+
+    def produced(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[{name}] Stream producer failed: {task.exception()}")
+        if not queue.full():
+            queue.put_nowait(_END)
+
+    async def watch() -> None:
+        try:
+            while (await request.receive())["type"] != "http.disconnect":
+                pass
+        except Exception:
+            # A broken receive channel means the client is gone as well
+            pass
+        producer.cancel()
+
+    producer = asyncio.create_task(produce())
+    producer.add_done_callback(produced)
+    watcher = asyncio.create_task(watch())
+    try:
+        while True:
+            if queue.empty() and producer.done():
+                return
+            frame = await queue.get()
+            if frame is _END:
+                return
+            # SSE frames are self-delimiting; whatever queued up meanwhile goes out in one write
+            batch = [frame]
+            while not queue.empty():
+                frame = queue.get_nowait()
+                if frame is _END:
+                    yield b"".join(batch)
+                    return
+                batch.append(frame)
+            yield b"".join(batch)
+    finally:
+        watcher.cancel()
+        producer.cancel()
@@ -0,0 +1,178 @@
+"""Which symbols each user's price streams want.
+
+A registration is keyed by (user, connection_id). The user is the
+subject of the access_token cookie. A request with a cookie that does not
+verify has no user. Only a request without a cookie falls back to the
+user_id the client sent; that user is unauthenticated and kept under its
+own "unauthenticated:" prefix, so it can never overwrite a signed-in
+user's registrations. It is never the client's IP address, which users
+behind one NAT or proxy share. POST /sse/current-price registers symbols
+and returns a connection_id; the GET that follows finds them by that id. The
+registration is also written to the market bus, so the GET can land on
+any worker.
+
+A registration does not expire while a stream holds it. Once no stream
+holds it, or none ever opened, it lapses after SUBSCRIPTION_TTL_SECONDS.
+An EventSource that reconnects within that time therefore keeps its
+symbols. Symbols are reference-counted over live registrations. The
+quote feed announces exactly those symbols, and the upstream session
+drops any that stay unused.
+"""
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID
+from jose import JWTError
+from starlette.requests import HTTPConnection
+from app.core.security import decode_access_token
+from app.core.serialization import dumps, loads
+from app.services.market_bus_service import market_bus
+from app.services.symbology_service import symbology
+
+SUBSCRIPTION_TTL_SECONDS = 60.0
+SUBSCRIPTION_KEY_PREFIX = "subscriptions:"
+# Users named by a user_id parameter rather than a verified cookie
+UNAUTHENTICATED_USER_PREFIX = "unauthenticated:"
+
+
+@dataclass
+class _Registration:
+    symbols: tuple[str, ...]
+    # Open streams holding the registration; it only expires at zero
+    streams: int = 0
+    expires_at: float = 0.0
+
+
+def stream_user(connection: HTTPConnection, user_id: UUID | None = None) -> str | None:
+    """Who a stream belongs to: the access_token cookie's subject; without a cookie, the user_id sent.
+
+    None when the cookie does not verify, or there is neither.
+    """
+    cookie = connection.cookies.get("access_token")
+    if cookie:
+        try:
+            return decode_access_token(cookie.removeprefix("Bearer ").strip())["sub"]
+        except (JWTError, KeyError):
+            # Never fall back to a client-supplied id when the cookie is bad
+            return None
+    return f"{UNAUTHENTICATED_USER_PREFIX}{user_id}" if user_id else None
+
+
+def _key(user: str, connection_id: str) -> str:
+    return f"{SUBSCRIPTION_KEY_PREFIX}{user}:{connection_id}"
+
+
+def _latest_key(user: str) -> str:
+    return f"{SUBSCRIPTION_KEY_PREFIX}{user}:latest"
+
+
+class SubscriptionRegistry:
+    def __init__(self, bus=market_bus, ttl_seconds: float = SUBSCRIPTION_TTL_SECONDS):
+        self.bus = bus
+        self.ttl_seconds = ttl_seconds
+        self._registrations: dict[tuple[str, str], _Registration] = {}
+        # requested symbol -> live registrations that include it
+        self._refcounts: Counter[str] = Counter()
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Called (on the event loop) whenever a symbol gains its first or loses its last registration."""
+        self._listeners.append(listener)
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def _set(self, key: tuple[str, str], registration: _Registration | None) -> None:
+        """Replace key's registration (None removes it), keeping refcounts in step."""
+        before = set(self._refcounts)
+        previous = self._registrations.pop(key, None)
+        if previous is not None:
+            self._refcounts.subtract(previous.symbols)
+            for symbol in previous.symbols:
+                if self._refcounts[symbol] <= 0:
+                    del self._refcounts[symbol]
+        if registration is not None:
+            self._registrations[key] = registration
+            self._refcounts.update(registration.symbols)
+        if self._refcounts.keys() != before:
+            self._notify()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key, registration in list(self._registrations.items()):
+            if registration.streams == 0 and registration.expires_at <= now:
+                self._set(key, None)
+
+    # ---- POST then GET -----------------------------------------------------
+
+    async def register(self, user: str, symbols: list[str], connection_id: str | None = None) -> str:
+        connection_id = connection_id or uuid.uuid4().hex[:12]
+        key = (user, connection_id)
+        symbols = tuple(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+        previous = self._registrations.get(key)
+        self._set(key, _Registration(
+            symbols,
+            streams=previous.streams if previous else 0,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        ))
+        await self.bus.set_value(_key(user, connection_id), dumps(list(symbols)), self.ttl_seconds)
+        await self.bus.set_value(_latest_key(user), connection_id.encode(), self.ttl_seconds)
+        return connection_id
+
+    async def lookup(self, user: str, connection_id: str | None = None) -> tuple[str, list[str]] | None:
+        """(connection_id, symbols) of a registration; without an id, the user's latest one."""
+        self._prune()
+        if connection_id is None:
+            latest = await self.bus.get_value(_latest_key(user))
+            if latest is None:
+                return None
+            connection_id = latest.decode() if isinstance(latest, bytes) else latest
+        registration = self._registrations.get((user, connection_id))
+        if registration is not None:
+            return connection_id, list(registration.symbols)
+        # Registered on another worker, or before this one restarted
+        stored = await self.bus.get_value(_key(user, connection_id))
+        if stored is None:
+            return None
+        return connection_id, loads(stored)
+
+    # ---- open streams ------------------------------------------------------
+
+    def hold(self, user: str, connection_id: str, symbols: list[str]) -> None:
+        """A stream for the registration opened; it stays live until release."""
+        key = (user, connection_id)
+        previous = self._registrations.get(key)
+        self._set(key, _Registration(
+            tuple(dict.fromkeys(symbols)),
+            streams=(previous.streams if previous else 0) + 1,
+        ))
+
+    def release(self, user: str, connection_id: str) -> None:
+        registration = self._registrations.get((user, connection_id))
+        if registration is None:
+            return
+        registration.streams = max(registration.streams - 1, 0)
+        if registration.streams == 0:
+            # Kept for a reconnect
+            registration.expires_at = time.monotonic() + self.ttl_seconds
+
+    # ---- interest ----------------------------------------------------------
+
+    def symbols(self) -> set[str]:
+        """Raw symbols with at least one live registration (parents as their front month)."""
+        self._prune()
+        return {symbology.price_symbol(s) for s in self._refcounts}
+
+    def status(self) -> dict:
+        self._prune()
+        return {
+            "registrations": len(self._registrations),
+            "streams": sum(r.streams for r in self._registrations.values()),
+            "symbols": dict(self._refcounts),
+        }
+
+
+subscriptions = SubscriptionRegistry()
@@ -0,0 +1,222 @@
+"""Daily symbology for GLBX.MDP3 futures.
+
+Parent symbols (ES.FUT) are resolved once per CME trading day to every
+outright contract (raw symbol and instrument_id) and to the front month,
+taken as the volume leader ES.v.0. The map is written to
+SYMBOLOGY_CACHE_PATH, so a restart starts from the file and only calls
+symbology.resolve when the trading day has rolled.
+
+Request paths only read the in-memory map. A symbol whose parent is not
+known yet is used as given, and the parent is queued for the background
+warmer.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.historical_executor_service import historical_executor
+from app.services.historical_service import DATASET
+from app.utils.databento import resolve_symbology
+
+# Resolved at startup even before anyone asks for them
+SYMBOLOGY_PARENTS = (
+    "ES.FUT", "NQ.FUT", "YM.FUT", "RTY.FUT", "GC.FUT", "CL.FUT",
+    "MES.FUT", "MNQ.FUT", "MYM.FUT", "M2K.FUT",
+)
+SYMBOLOGY_CHECK_INTERVAL_SECONDS = 15 * 60
+# Three resolves, the last one covering every instrument of every parent
+SYMBOLOGY_RESOLVE_TIMEOUT_SECONDS = 120
+
+_CHICAGO = ZoneInfo("America/Chicago")
+# The session opening at 17:00 Chicago time belongs to the next trade date
+_SESSION_ROLL = timedelta(hours=7)
+# Root, month code, year: ESZ5, MNQH26, 6EM5
+_OUTRIGHT = re.compile(r"([A-Z0-9]{1,4}?)[FGHJKMNQUVXZ]\d{1,2}")
+
+
+def trading_day(now: datetime | None = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    return (now.astimezone(_CHICAGO) + _SESSION_ROLL).date().isoformat()
+
+
+def _resolve_parents(parents: list[str]) -> dict[str, dict]:
+    """Blocking: parent -> {"front_month": raw symbol | None, "outrights": {raw symbol: instrument_id}}."""
+    day = datetime.now(timezone.utc).date()
+    roots = {parent: parent[:-len(".FUT")] for parent in parents}
+    parent_ids = resolve_symbology(DATASET, parents, "parent", "instrument_id", day)
+    leaders = resolve_symbology(
+        DATASET, [f"{root}.v.0" for root in roots.values()], "continuous", "instrument_id", day
+    )
+    all_ids = sorted({iid for ids in parent_ids.values() for iid in ids})
+    raw_symbols = resolve_symbology(DATASET, all_ids, "instrument_id", "raw_symbol", day) if all_ids else {}
+
+    resolved = {}
+    for parent in parents:
+        outrights = {}
+        for iid in parent_ids.get(parent, []):
+            for raw in raw_symbols.get(iid, []):
+                # Calendar spreads (ESZ5-ESH6) and options (ESZ5 C6000) are not outrights
+                if _OUTRIGHT.fullmatch(raw):
+                    outrights[raw] = int(iid)
+        leader_ids = set(leaders.get(f"{roots[parent]}.v.0", []))
+        front_month = next((raw for raw, iid in outrights.items() if str(iid) in leader_ids), None)
+        resolved[parent] = {"front_month": front_month, "outrights": outrights}
+    return resolved
+
+
+class SymbologyService:
+    def __init__(self, path: str = settings.SYMBOLOGY_CACHE_PATH):
+        self.path = path
+        # Trading day the map was resolved for
+        self._day: str | None = None
+        self._parents: dict[str, dict] = {}
+        # raw symbol -> (parent, instrument_id)
+        self._outrights: dict[str, tuple[str, int]] = {}
+        self._wanted: set[str] = set(SYMBOLOGY_PARENTS)
+        self._lock = threading.Lock()
+        self._warming = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    # ---- lookups (request paths) -------------------------------------------
+
+    def parent_of(self, symbol: str) -> str | None:
+        s = (symbol or "").strip().upper()
+        if s.endswith(".FUT"):
+            return s
+        known = self._outrights.get(s)
+        if known is not None:
+            return known[0]
+        match = _OUTRIGHT.fullmatch(s)
+        return f"{match.group(1)}.FUT" if match else None
+
+    def price_symbol(self, symbol: str) -> str:
+        """Raw symbol to query for `symbol`: the front month for a parent, else the symbol itself."""
+        s = (symbol or "").strip().upper()
+        if s.endswith(".FUT"):
+            entry = self._parents.get(s)
+            if entry is None:
+                self._want(s)
+            elif entry["front_month"]:
+                return entry["front_month"]
+            return s
+        if s not in self._outrights:
+            parent = self.parent_of(s)
+            if parent is not None:
+                self._want(parent)
+        return s
+
+    def price_symbols(self, symbols: list[str]) -> list[str]:
+        return list(dict.fromkeys(self.price_symbol(s) for s in symbols if s))
+
+    def instrument_ids(self, symbol: str) -> list[int]:
+        """Outright instrument_ids for a parent, or the one for a raw symbol (empty if unknown)."""
+        s = (symbol or "").strip().upper()
+        if s.endswith(".FUT"):
+            entry = self._parents.get(s)
+            return list(entry["outrights"].values()) if entry else []
+        known = self._outrights.get(s)
+        return [known[1]] if known else []
+
+    def _want(self, parent: str) -> None:
+        with self._lock:
+            if parent in self._wanted:
+                return
+            self._wanted.add(parent)
+        self._schedule_warm()
+
+    # ---- resolving (background) --------------------------------------------
+
+    def _schedule_warm(self) -> None:
+        try:
+            asyncio.get_running_loop().create_task(self.warm())
+        except RuntimeError:
+            # Called from the threadpool; hand the work to the warmer's loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self.warm()))
+
+    def _pending(self, day: str) -> list[str]:
+        with self._lock:
+            if self._day != day:
+                return sorted(self._wanted)
+            return sorted(self._wanted - self._parents.keys())
+
+    async def warm(self) -> None:
+        if self._warming:
+            return
+        self._warming = True
+        try:
+            while True:
+                day = trading_day()
+                pending = self._pending(day)
+                if not pending:
+                    return
+                try:
+                    resolved = await historical_executor.run(
+                        "symbology_resolve", _resolve_parents, pending, timeout=SYMBOLOGY_RESOLVE_TIMEOUT_SECONDS
+                    )
+                except Exception as e:
+                    print(f"[Symbology] Resolve failed for {pending}: {e}")
+                    return
+                self._apply(day, resolved)
+                await run_in_threadpool(self.save)
+                fronts = {parent: entry["front_month"] for parent, entry in resolved.items()}
+                print(f"[Symbology] Resolved {day}: {fronts}")
+        finally:
+            self._warming = False
+
+    def _apply(self, day: str, resolved: dict[str, dict]) -> None:
+        with self._lock:
+            parents = dict(self._parents) if self._day == day else {}
+            parents.update(resolved)
+            # Replace whole dicts so readers never see a half-built map
+            self._outrights = {
+                raw: (parent, iid)
+                for parent, entry in parents.items()
+                for raw, iid in entry["outrights"].items()
+            }
+            self._parents = parents
+            self._day = day
+            self._wanted.update(resolved)
+
+    def load(self) -> None:
+        """Start from the saved map; a map from an earlier trading day is used until re-resolved."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self._apply(saved["trading_day"], saved["parents"])
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[Symbology] Ignoring unreadable {self.path}: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            saved = {"trading_day": self._day, "parents": self._parents}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[Symbology] Could not write {self.path}: {e}")
+
+    async def run_warmer(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        await run_in_threadpool(self.load)
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                print(f"[Symbology] Warmer error: {e}")
+            await asyncio.sleep(SYMBOLOGY_CHECK_INTERVAL_SECONDS)
+
+
+symbology = SymbologyService()
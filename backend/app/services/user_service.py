@@ -25,7 +25,9 @@ def register_user(db: Session, user_create: UserBase) -> User:
     return create_user(db, user_create)
 
 
-def authenticate_user(db: Session, email: str) -> User | None | bool:
+def authenticate_user(
+    db: Session, email: str, background_tasks: BackgroundTasks | None = None
+) -> User | None | bool:
     user = get_user_by_email(db, email)
     if not user:
         return None
@@ -34,7 +36,11 @@ def authenticate_user(db: Session, email: str) -> User | None | bool:
     else:
         otp_data = generate_otp()
         user_create_otp_code(db, email, otp_data)
-        send_otp_email(email, otp_data.otp)
+        if background_tasks is not None:
+            # Deliver after the response so the EmailJS round trip is not on the login path
+            background_tasks.add_task(send_otp_email, email, otp_data.otp)
+        else:
+            send_otp_email(email, otp_data.otp)
     return user
 
 
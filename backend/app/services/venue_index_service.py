@@ -0,0 +1,71 @@
+"""Which Tradovate venues (demo/live) each broker has active sub-accounts on.
+
+The read paths (positions, orders, cash balances) used to call both the
+demo and live endpoints for every broker. Results for accounts without an
+active SubBrokerAccount are dropped anyway, so only venues listed here are
+queried. Entries are loaded in one query for all brokers that are missing,
+dropped whenever a broker's sub-accounts change, and re-read after
+VENUE_REFRESH_SECONDS as a safety net.
+
+A drop is published on VENUE_INVALIDATE_CHANNEL of the market bus, so
+every worker re-reads the broker, not only the one that made the change.
+"""
+import asyncio
+import time
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.db.repositories.broker_repository import user_get_active_venues
+from app.services.market_bus_service import market_bus
+
+VENUE_REFRESH_SECONDS = 300
+VENUE_INVALIDATE_CHANNEL = "venues-invalidate"
+
+
+class VenueIndex:
+    def __init__(self, bus=market_bus):
+        self.bus = bus
+        # broker_account_id -> (loaded_at, venues as is_demo flags, demo first)
+        self._venues: dict[UUID, tuple[float, tuple[bool, ...]]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def venues(self, db: Session, broker_ids: list[UUID]) -> dict[UUID, tuple[bool, ...]]:
+        now = time.monotonic()
+        missing = [
+            broker_id for broker_id in broker_ids
+            if broker_id not in self._venues
+            or now - self._venues[broker_id][0] > VENUE_REFRESH_SECONDS
+        ]
+        if missing:
+            found: dict[UUID, set[bool]] = {broker_id: set() for broker_id in missing}
+            for row in user_get_active_venues(db, missing):
+                found.setdefault(row.broker_account_id, set()).add(bool(row.is_demo))
+            for broker_id, flags in found.items():
+                self._venues[broker_id] = (now, tuple(sorted(flags, reverse=True)))
+        return {broker_id: self._venues[broker_id][1] for broker_id in broker_ids}
+
+    def invalidate(self, broker_id: UUID) -> None:
+        """Drop a broker here and on every other worker."""
+        self._venues.pop(broker_id, None)
+        try:
+            asyncio.get_running_loop().create_task(self._publish(broker_id))
+        except RuntimeError:
+            # Sync endpoints run in the threadpool; publish from the listener's loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self._publish(broker_id)))
+
+    async def _publish(self, broker_id: UUID) -> None:
+        try:
+            await self.bus.publish(VENUE_INVALIDATE_CHANNEL, str(broker_id).encode())
+        except Exception as e:
+            print(f"[Venue Index] Failed to publish invalidation for broker {broker_id}: {e}")
+
+    def _on_invalidate(self, payload: bytes) -> None:
+        self._venues.pop(UUID(payload.decode()), None)
+
+    async def listen(self) -> None:
+        """Take other workers' invalidations; called once at startup."""
+        self._loop = asyncio.get_running_loop()
+        await self.bus.subscribe(VENUE_INVALIDATE_CHANNEL, self._on_invalidate)
+
+
+venue_index = VenueIndex()
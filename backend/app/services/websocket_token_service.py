@@ -0,0 +1,226 @@
+"""In-memory store behind /broker/websockettoken/all.
+
+Requests never renew tokens themselves. Each user's broker list is read
+with one grouped query and reused for USER_REFRESH_SECONDS. A background
+warmer renews tokens that are unknown or close to expiry and writes them
+back to the database, so the endpoint answers from memory regardless of
+how many brokers a user has. Users whose tokens have not been read for
+USER_IDLE_SECONDS are dropped, so the warmer stops renewing their tokens.
+
+The endpoint is a sync def, so the store is read from the threadpool while
+the warmer runs on the event loop; a lock guards its maps.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from uuid import UUID
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.db.session import SessionLocal
+from app.db.repositories.broker_repository import (
+    user_get_websocket_token_rows,
+    user_store_renewed_tokens,
+)
+from app.schemas.broker import Tokens, WebSocketTokens
+from app.utils.tradovate import get_renew_token
+
+# Tradovate access tokens live for 90 minutes; renew well before that
+TOKEN_LIFETIME_SECONDS = 90 * 60
+RENEW_MARGIN_SECONDS = 20 * 60
+# How long a user's broker list is trusted before it is re-read
+USER_REFRESH_SECONDS = 60
+# Users not read for this long are dropped and their tokens no longer renewed
+USER_IDLE_SECONDS = 2 * 60 * 60
+WARM_INTERVAL_SECONDS = 60
+RENEW_CONCURRENCY = 4
+
+
+@dataclass
+class _TokenEntry:
+    user_id: UUID
+    access_token: str
+    md_access_token: str | None
+    is_demo: bool
+    # Which columns the token came from: websocket_* or the REST access_token pair
+    websocket: bool
+    # time.monotonic() deadline; None until we have renewed it ourselves
+    expires_at: float | None = None
+
+    def to_schema(self, broker_id: UUID) -> WebSocketTokens:
+        return WebSocketTokens(
+            id=broker_id,
+            access_token=self.access_token,
+            # Fallback to access_token if md_token is None
+            md_access_token=self.md_access_token or self.access_token,
+            is_demo=self.is_demo,
+        )
+
+
+class WebSocketTokenStore:
+    def __init__(self):
+        self._entries: dict[UUID, _TokenEntry] = {}
+        # user_id -> (loaded_at, broker ids in query order)
+        self._users: dict[UUID, tuple[float, list[UUID]]] = {}
+        # user_id -> when get_all last served them
+        self._read_at: dict[UUID, float] = {}
+        self._lock = threading.Lock()
+        self._renewing: set[UUID] = set()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def get_all(self, db: Session, user_id: UUID) -> list[WebSocketTokens]:
+        now = time.monotonic()
+        with self._lock:
+            self._read_at[user_id] = now
+            cached = self._users.get(user_id)
+        if cached is None or now - cached[0] > USER_REFRESH_SECONDS:
+            cached = self._load_user(db, user_id)
+        with self._lock:
+            return [
+                self._entries[broker_id].to_schema(broker_id)
+                for broker_id in cached[1]
+                if broker_id in self._entries
+            ]
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        """Forget a user's broker list, e.g. after a broker was added or removed."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def forget_broker(self, broker_id: UUID) -> None:
+        with self._lock:
+            entry = self._entries.pop(broker_id, None)
+            if entry is not None:
+                self._users.pop(entry.user_id, None)
+
+    def update_broker(self, broker_id: UUID, tokens: Tokens, websocket: bool) -> None:
+        """Record tokens renewed elsewhere (e.g. the periodic refresh job)."""
+        with self._lock:
+            entry = self._entries.get(broker_id)
+        if entry is None or entry.websocket != websocket:
+            return
+        entry.access_token = tokens.access_token
+        entry.md_access_token = tokens.md_access_token
+        entry.expires_at = time.monotonic() + TOKEN_LIFETIME_SECONDS
+
+    def _load_user(self, db: Session, user_id: UUID) -> tuple[float, list[UUID]]:
+        # The query runs outside the lock; only the map updates hold it
+        rows = user_get_websocket_token_rows(db, user_id)
+        broker_ids = []
+        with self._lock:
+            for row in rows:
+                websocket = bool(row.websocket_access_token)
+                access_token = row.websocket_access_token if websocket else row.access_token
+                if not access_token:
+                    continue
+                broker_ids.append(row.id)
+                entry = self._entries.get(row.id)
+                if entry is not None and entry.websocket == websocket and entry.expires_at is not None:
+                    # Ours is at least as fresh as the database copy
+                    entry.is_demo = bool(row.is_demo)
+                    continue
+                self._entries[row.id] = _TokenEntry(
+                    user_id=user_id,
+                    access_token=access_token,
+                    md_access_token=row.websocket_md_access_token if websocket else row.md_access_token,
+                    is_demo=bool(row.is_demo),
+                    websocket=websocket,
+                )
+            cached = self._users[user_id] = (time.monotonic(), broker_ids)
+        self._schedule_warm()
+        return cached
+
+    # ---- background renewal -------------------------------------------------
+
+    def _evict_idle(self) -> None:
+        """Drop users nobody has read for USER_IDLE_SECONDS, with their tokens."""
+        cutoff = time.monotonic() - USER_IDLE_SECONDS
+        with self._lock:
+            idle = {user_id for user_id, read_at in self._read_at.items() if read_at < cutoff}
+            if not idle:
+                return
+            for user_id in idle:
+                del self._read_at[user_id]
+                self._users.pop(user_id, None)
+            for broker_id in [b for b, entry in self._entries.items() if entry.user_id in idle]:
+                del self._entries[broker_id]
+
+    def _due(self) -> list[UUID]:
+        deadline = time.monotonic() + RENEW_MARGIN_SECONDS
+        with self._lock:
+            return [
+                broker_id for broker_id, entry in self._entries.items()
+                if broker_id not in self._renewing
+                and (entry.expires_at is None or entry.expires_at < deadline)
+            ]
+
+    def _schedule_warm(self) -> None:
+        try:
+            asyncio.get_running_loop().create_task(self.warm())
+        except RuntimeError:
+            # Sync endpoints run in the threadpool; hand the work to the warmer's loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self.warm()))
+
+    async def warm(self) -> None:
+        self._evict_idle()
+        due = self._due()
+        if not due:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(RENEW_CONCURRENCY)
+        self._renewing.update(due)
+        try:
+            await asyncio.gather(*(self._renew(broker_id) for broker_id in due))
+        finally:
+            self._renewing.difference_update(due)
+
+    async def _renew(self, broker_id: UUID) -> None:
+        with self._lock:
+            entry = self._entries.get(broker_id)
+        if entry is None:
+            return
+        async with self._semaphore:
+            try:
+                # get_renew_token and the write-back are blocking; keep them off the loop
+                tokens = await run_in_threadpool(
+                    _renew_and_store, broker_id, entry.access_token, entry.websocket
+                )
+            except Exception as e:
+                print(f"[WebSocket Tokens] Renewal failed for broker {broker_id}: {e}")
+                return
+        if tokens is None:
+            print(f"[WebSocket Tokens] Renewal returned nothing for broker {broker_id}, keeping existing token")
+            return
+        entry.access_token = tokens.access_token
+        entry.md_access_token = tokens.md_access_token
+        entry.expires_at = time.monotonic() + TOKEN_LIFETIME_SECONDS
+
+    async def run_warmer(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                print(f"[WebSocket Tokens] Warmer error: {e}")
+            await asyncio.sleep(WARM_INTERVAL_SECONDS)
+
+
+def _renew_and_store(broker_id: UUID, access_token: str, websocket: bool) -> Tokens | None:
+    tokens = get_renew_token(access_token)
+    if tokens is None:
+        return None
+    db = SessionLocal()
+    try:
+        user_store_renewed_tokens(db, broker_id, tokens, websocket)
+    except Exception as e:
+        # The renewed token is still valid; serve it from memory regardless
+        db.rollback()
+        print(f"[WebSocket Tokens] Could not persist renewed token for broker {broker_id}: {e}")
+    finally:
+        db.close()
+    return tokens
+
+
+websocket_token_store = WebSocketTokenStore()
@@ -1,17 +1,32 @@
+from datetime import date, timedelta
 import databento as db
 from app.core.config import settings
 
-client = db.Historical(settings.DATABENTO_KEY)
-
-async def convert_rawsymbol_intrument_id(symbols=list[str]):
-    result = await client.symbology.resolve(
-        dataset="GLBX.MDP3",
-        symbols=symbols,
-        stype_in="raw_symbol",
-        stype_out="instrument_id",
-        start_date="2025-10-01"
-    )
-    result_list = [{symbol: values[0]['s']} for symbol, values in result['result'].items()]
-    return result_list
+# Databento accepts at most this many symbols per symbology request
+RESOLVE_BATCH_SIZE = 2000
 
 
+def resolve_symbology(
+    dataset: str,
+    symbols: list[str],
+    stype_in: str,
+    stype_out: str,
+    day: date,
+) -> dict[str, list[str]]:
+    """Blocking symbology.resolve over one UTC day: input symbol -> mapped symbols."""
+    client = db.Historical(settings.DATABENTO_KEY)
+    mapped: dict[str, list[str]] = {}
+    for i in range(0, len(symbols), RESOLVE_BATCH_SIZE):
+        result = client.symbology.resolve(
+            dataset=dataset,
+            symbols=symbols[i:i + RESOLVE_BATCH_SIZE],
+            stype_in=stype_in,
+            stype_out=stype_out,
+            start_date=day,
+            end_date=day + timedelta(days=1),
+        )
+        for symbol, intervals in (result.get("result") or {}).items():
+            mapped.setdefault(symbol, []).extend(
+                str(interval["s"]) for interval in intervals if interval.get("s")
+            )
+    return mapped
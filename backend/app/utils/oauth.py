@@ -1,13 +1,112 @@
+import asyncio
+import re
+import time
 from fastapi import FastAPI, HTTPException
 import httpx
+from jose import jwt, JWTError
 from app.core.config import settings
-async def verify_token(token: str):
-    # Call Google's tokeninfo endpoint to verify JWT
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://oauth2.googleapis.com/tokeninfo", params={"id_token": token})
+from app.core.security import TokenCache
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_TOKENINFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Used when Google's response carries no Cache-Control max-age
+JWKS_DEFAULT_TTL_SECONDS = 3600
+# An unknown "kid" triggers a refetch (key rotation), but at most this often
+JWKS_MIN_REFRESH_SECONDS = 60
+
+_http_client: httpx.AsyncClient | None = None
+_jwks: dict[str, dict] = {}
+_jwks_expires_at = 0.0
+_jwks_fetched_at = 0.0
+_jwks_lock = asyncio.Lock()
+_verified_tokens = TokenCache()
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=10.0)
+    return _http_client
+
+
+def _max_age(cache_control: str | None) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else JWKS_DEFAULT_TTL_SECONDS
+
+
+async def refresh_google_jwks(force: bool = False) -> dict[str, dict]:
+    """Fetch Google's signing keys unless the cached set is still fresh.
+
+    A failed fetch keeps whatever keys are already cached.
+    """
+    global _jwks, _jwks_expires_at, _jwks_fetched_at
+    async with _jwks_lock:
+        now = time.monotonic()
+        if _jwks and now < _jwks_expires_at and not force:
+            return _jwks
+        if force and now - _jwks_fetched_at < JWKS_MIN_REFRESH_SECONDS:
+            return _jwks
+        _jwks_fetched_at = now
+        try:
+            response = await _get_http_client().get(GOOGLE_CERTS_URL)
+            response.raise_for_status()
+            keys = response.json().get("keys", [])
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"[OAUTH] Failed to refresh Google JWKS: {e}")
+            return _jwks
+        _jwks = {key["kid"]: key for key in keys if "kid" in key}
+        _jwks_expires_at = now + _max_age(response.headers.get("cache-control"))
+        return _jwks
+
+
+async def _get_signing_key(kid: str) -> dict | None:
+    keys = await refresh_google_jwks()
+    if kid not in keys:
+        # Google rotated its keys since our last fetch
+        keys = await refresh_google_jwks(force=True)
+    return keys.get(kid)
+
+
+async def _verify_with_tokeninfo(token: str) -> dict:
+    response = await _get_http_client().get(GOOGLE_TOKENINFO_URL, params={"id_token": token})
     if response.status_code != 200:
         raise HTTPException(status_code=400, detail="Invalid token")
     data = response.json()
+    # tokeninfo returns numeric claims as strings; TokenCache bounds entries by an int exp
+    if isinstance(data.get("exp"), str) and data["exp"].isdigit():
+        data["exp"] = int(data["exp"])
+    return data
+
+
+async def verify_token(token: str):
+    cached = _verified_tokens.get(token)
+    if cached is not None:
+        return cached
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise HTTPException(status_code=400, detail="Invalid token")
+
+    key = await _get_signing_key(header.get("kid", ""))
+    if key is not None:
+        try:
+            data = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                issuer=GOOGLE_ISSUERS,
+                options={"verify_aud": False, "verify_at_hash": False},
+            )
+        except JWTError:
+            raise HTTPException(status_code=400, detail="Invalid token")
+    elif not _jwks:
+        # Certs endpoint unreachable and nothing cached; let Google verify it
+        data = await _verify_with_tokeninfo(token)
+    else:
+        raise HTTPException(status_code=400, detail="Invalid token")
+
     if data.get("aud") != settings.GOOGLE_CLIENT_ID:
         raise HTTPException(status_code=400, detail="Invalid audience")
-    return data
\ No newline at end of file
+    _verified_tokens.put(token, data)
+    return data
@@ -0,0 +1,69 @@
+import math
+import os
+import socket
+
+
+# Settings() refuses to start without these; benchmarks never talk to the real
+# services so placeholders are enough unless the caller already exported values.
+_PLACEHOLDER_ENV = {
+    "SECRET_KEY": "benchmark-secret",
+    "EMAILJS_SERVICE_ID": "benchmark",
+    "EMAILJS_OTP_TEMPLATE_ID": "benchmark",
+    "EMAILJS_PUBLIC_KEY": "benchmark",
+    "EMAILJS_RRIVATE_KEY": "benchmark",
+    "OTP_EXPIRE_MINUTES": "10",
+    "GOOGLE_CLIENT_ID": "benchmark",
+    "ENVIRONMENT": "benchmark",
+    "APP_VERSION": "0.0.0",
+    "APP_ID": "benchmark",
+    "CID": "0",
+    "SEC": "benchmark",
+    "TRADOVATE_REDIRECT_URL": "http://127.0.0.1/callback",
+    "TRADOVATE_AUTH_URL": "http://127.0.0.1/auth",
+    "TRADOVATE_EXCHANGE_URL": "http://127.0.0.1/exchange",
+    "TRADOVATE_API_ME_URL": "http://127.0.0.1/me",
+    "DATABENTO_KEY": "db-benchmark",
+}
+
+
+def configure_env(overrides: dict[str, str] | None = None) -> None:
+    """Prepare the environment before anything under ``app`` is imported.
+
+    ``overrides`` always win over the shell and ``.env`` so a benchmark can
+    never be pointed at a live upstream by accident.
+    """
+    for key, value in _PLACEHOLDER_ENV.items():
+        os.environ.setdefault(key, value)
+    for key, value in (overrides or {}).items():
+        os.environ[key] = value
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile, good enough for latency reporting."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def print_table(title: str, header: list[str], rows: list[list]) -> None:
+    cells = [header] + [[_fmt(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    print(f"\n{title}")
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in cells[1:]:
+        print("  ".join(c.ljust(w) for c, w in zip(row, widths)))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
@@ -0,0 +1,188 @@
+"""Local stand-in for the Tradovate REST API.
+
+Serves the handful of endpoints the order path touches under ``/demo`` and
+``/live`` prefixes so both venues can be pointed at one process:
+
+    TRADOVATE_DEMO_API_URL=http://127.0.0.1:<port>/demo
+    TRADOVATE_LIVE_API_URL=http://127.0.0.1:<port>/live
+
+Every request is recorded with its arrival time (``time.perf_counter``) so a
+benchmark running in the same process can measure fan-out skew precisely.
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FakeTradovateConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Per-path latency overrides, e.g. {"/auth/renewaccesstoken": 80}
+    path_latency_ms: dict[str, float] = field(default_factory=dict)
+    seed: int | None = None
+
+
+@dataclass
+class RecordedRequest:
+    venue: str
+    path: str
+    arrived_at: float
+    account_id: int | None
+    status: int
+
+
+class FakeTradovate:
+    def __init__(self, config: FakeTradovateConfig | None = None):
+        self.config = config or FakeTradovateConfig()
+        self.requests: list[RecordedRequest] = []
+        # accountId -> position rows served from /position/list
+        self.positions: dict[int, list[dict]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1_000_000)
+        self._random = random.Random(self.config.seed)
+        self._server: uvicorn.Server | None = None
+        self._thread: threading.Thread | None = None
+        self.app = self._build_app()
+
+    # ---- recording -------------------------------------------------------
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def arrivals(self, path: str, account_ids: set[int], since: float, until: float) -> list[RecordedRequest]:
+        with self._lock:
+            return [
+                r for r in self.requests
+                if r.path == path
+                and r.account_id in account_ids
+                and since <= r.arrived_at <= until
+            ]
+
+    def _record(self, venue: str, path: str, arrived_at: float, account_id: int | None, status: int) -> None:
+        with self._lock:
+            self.requests.append(RecordedRequest(venue, path, arrived_at, account_id, status))
+
+    # ---- behaviour knobs ---------------------------------------------------
+
+    async def _delay(self, path: str) -> None:
+        base = self.config.path_latency_ms.get(path, self.config.latency_ms)
+        jitter = self._random.uniform(0, self.config.jitter_ms) if self.config.jitter_ms else 0.0
+        total = base + jitter
+        if total > 0:
+            await asyncio.sleep(total / 1000)
+
+    def _should_fail(self) -> bool:
+        return self.config.error_rate > 0 and self._random.random() < self.config.error_rate
+
+    def _error(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=self.config.error_status,
+            content={"errorText": "injected failure", "failureReason": "Benchmark"},
+        )
+
+    # ---- app ---------------------------------------------------------------
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Tradovate")
+
+        @app.post("/{venue}/order/placeOrder")
+        async def place_order(venue: str, request: Request):
+            arrived_at = time.perf_counter()
+            body = await request.json()
+            await self._delay("/order/placeOrder")
+            if self._should_fail():
+                self._record(venue, "/order/placeOrder", arrived_at, body.get("accountId"), self.config.error_status)
+                return self._error()
+            self._record(venue, "/order/placeOrder", arrived_at, body.get("accountId"), 200)
+            return {"orderId": next(self._ids)}
+
+        @app.post("/{venue}/order/placeoso")
+        async def place_oso(venue: str, request: Request):
+            arrived_at = time.perf_counter()
+            body = await request.json()
+            await self._delay("/order/placeoso")
+            if self._should_fail():
+                self._record(venue, "/order/placeoso", arrived_at, body.get("accountId"), self.config.error_status)
+                return self._error()
+            self._record(venue, "/order/placeoso", arrived_at, body.get("accountId"), 200)
+            order_id = next(self._ids)
+            return {"orderId": order_id, "oso1Id": next(self._ids), "oso2Id": next(self._ids)}
+
+        @app.get("/{venue}/auth/renewaccesstoken")
+        async def renew_access_token(venue: str):
+            arrived_at = time.perf_counter()
+            await self._delay("/auth/renewaccesstoken")
+            if self._should_fail():
+                self._record(venue, "/auth/renewaccesstoken", arrived_at, None, self.config.error_status)
+                return self._error()
+            self._record(venue, "/auth/renewaccesstoken", arrived_at, None, 200)
+            token_id = next(self._ids)
+            return {
+                "accessToken": f"bench-access-{token_id}",
+                "mdAccessToken": f"bench-md-{token_id}",
+                "expirationTime": "2099-01-01T00:00:00.000Z",
+            }
+
+        @app.get("/{venue}/position/list")
+        async def position_list(venue: str):
+            arrived_at = time.perf_counter()
+            await self._delay("/position/list")
+            if self._should_fail():
+                self._record(venue, "/position/list", arrived_at, None, self.config.error_status)
+                return self._error()
+            self._record(venue, "/position/list", arrived_at, None, 200)
+            with self._lock:
+                return [row for rows in self.positions.values() for row in rows]
+
+        @app.get("/{venue}/contract/item")
+        async def contract_item(venue: str, id: int):
+            arrived_at = time.perf_counter()
+            await self._delay("/contract/item")
+            if self._should_fail():
+                self._record(venue, "/contract/item", arrived_at, None, self.config.error_status)
+                return self._error()
+            self._record(venue, "/contract/item", arrived_at, None, 200)
+            return {
+                "id": id,
+                "name": f"ESZ{id % 10}",
+                "contractMaturityId": id,
+                "status": "DefinitionChecked",
+                "providerTickSize": 0.25,
+            }
+
+        return app
+
+    # ---- lifecycle ---------------------------------------------------------
+
+    def start(self, host: str, port: int) -> None:
+        """Serve from a background thread with its own event loop.
+
+        The order path still performs blocking HTTP calls on the caller's loop,
+        so the fake server must not share it.
+        """
+        config = uvicorn.Config(self.app, host=host, port=port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-tradovate", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Tradovate server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from app.core.config import settings
+from app.core.serialization import FastJSONResponse
 # Import Base from session (same one used by all models)
 from app.db.session import Base
 # Import all models to ensure they're registered with SQLAlchemy
@@ -14,11 +15,19 @@ from app.models import (
     Group,
     GroupBroker,
     UserContract,
+    OrderDispatch,
 )
 from app.services.broker_service import (
     refresh_new_token,
 )  # Your async token refresh logic
 from app.api.v1.routers import api_router  # Your routers
+from app.utils.oauth import refresh_google_jwks
+from app.services.websocket_token_service import websocket_token_store
+from app.services.symbology_service import symbology
+from app.services.quote_feed_service import quote_feed
+from app.services.live_bar_service import live_bars
+from app.services.order_dispatch_service import order_dispatch_store
+from app.services.venue_index_service import venue_index
 
 # Async SQLAlchemy engine and session maker
 # Configure connection pool to handle connection errors and stale connections
@@ -40,7 +49,8 @@ async def get_db():
         yield session
 
 
-app = FastAPI(title="My FastAPI App")
+# orjson for every JSON response; see app.core.serialization
+app = FastAPI(title="My FastAPI App", default_response_class=FastJSONResponse)
 
 # CORS origins
 origins = [
@@ -60,6 +70,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The SPA is on another origin; it needs the ETag to send If-None-Match
+    expose_headers=["ETag"],
 )
 
 app.include_router(api_router, prefix="/api/v1")
@@ -90,3 +102,17 @@ async def regenerate_access_token_periodically():
 async def on_startup():
     await init_db()
     asyncio.create_task(regenerate_access_token_periodically())
+    # Warm Google's signing keys so the first logins verify locally
+    asyncio.create_task(refresh_google_jwks())
+    # Renews cached WebSocket tokens before they expire
+    asyncio.create_task(websocket_token_store.run_warmer())
+    # Loads the saved symbology map and re-resolves it once per trading day
+    asyncio.create_task(symbology.run_warmer())
+    # Elects the worker that holds the upstream quote session and fans its quotes out
+    asyncio.create_task(quote_feed.run())
+    # Publishes the live bars that session's owner builds
+    asyncio.create_task(live_bars.run())
+    # Deletes order dispatch records past their retention
+    asyncio.create_task(order_dispatch_store.run_pruner())
+    # Drops venues that other workers invalidated
+    await venue_index.listen()
@@ -46,6 +46,10 @@ CREATE TABLE sub_broker_accounts (
     is_active BOOLEAN NOT NULL DEFAULT TRUE
 );
 
+-- Same names as the models' index=True columns; safe to re-run on an existing database
+CREATE INDEX IF NOT EXISTS ix_broker_accounts_user_id ON broker_accounts (user_id);
+CREATE INDEX IF NOT EXISTS ix_sub_broker_accounts_broker_account_id ON sub_broker_accounts (broker_account_id);
+
 
 CREATE TABLE groups (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
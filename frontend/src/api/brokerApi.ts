@@ -21,6 +21,8 @@ import {
   MarketOrder,
   LimitOrder,
   LimitOrderWithSLTP,
+  GroupOrderKind,
+  GroupOrderEvent,
 } from "../types/broker";
 
 const API_BASE =
@@ -191,37 +193,59 @@ export const getAccounts = async (
   }
 };
 
-// Combined function to get all trading data in one request
-export const getAllTradingData = async (
-  user_id: string
+export interface TradingSnapshot {
+  accounts: TradovateAccountsResponse[];
+  positions: TradovatePositionListResponse[];
+  orders: TradovateOrderListResponse[];
+}
+
+// Positions, orders and accounts in one request. Pass the previous ETag to
+// get `notModified: true` (and no body) when nothing has changed.
+export const getSnapshot = async (
+  user_id: string,
+  etag?: string | null
 ): Promise<{
-  accounts: TradovateAccountsResponse[] | null;
-  positions: TradovatePositionListResponse[] | null;
-  orders: TradovateOrderListResponse[] | null;
+  snapshot: TradingSnapshot | null;
+  etag: string | null;
+  notModified: boolean;
 } | null> => {
   try {
     const params = { user_id };
-    const [accountsRes, positionsRes, ordersRes] = await Promise.all([
-      axios.get(`${API_BASE}/broker/accounts`, { params }),
-      axios.get(`${API_BASE}/broker/positions`, { params }),
-      axios.get(`${API_BASE}/broker/orders`, { params }),
-    ]);
+    const response = await axios.get(`${API_BASE}/broker/snapshot`, {
+      params,
+      headers: etag ? { "If-None-Match": etag } : undefined,
+      validateStatus: (status) =>
+        (status >= 200 && status < 300) || status === 304,
+    });
+    const notModified = response.status === 304;
     return {
-      accounts: accountsRes.data,
-      positions: positionsRes.data,
-      orders: ordersRes.data,
+      snapshot: notModified ? null : response.data,
+      etag: response.headers["etag"] ?? etag ?? null,
+      notModified,
     };
   } catch (error) {
     if (axios.isAxiosError(error)) {
-      console.error("Get All Trading Data:", error.response?.data);
-      // Don't alert for combined call to avoid spam
+      console.error("Get Snapshot:", error.response?.data);
+      // Don't alert for polled call to avoid spam
     } else {
-      console.error("Unexpected Get All Trading Data error:", error);
+      console.error("Unexpected Get Snapshot error:", error);
     }
     return null;
   }
 };
 
+// Combined function to get all trading data in one request
+export const getAllTradingData = async (
+  user_id: string
+): Promise<{
+  accounts: TradovateAccountsResponse[] | null;
+  positions: TradovatePositionListResponse[] | null;
+  orders: TradovateOrderListResponse[] | null;
+} | null> => {
+  const result = await getSnapshot(user_id);
+  return result?.snapshot ?? null;
+};
+
 export const getSubBrokersForGroup = async (
   user_id: string
 ): Promise<SubBrokerSummaryForGet[] | null> => {
@@ -374,6 +398,56 @@ export const executeLimitOrder = async (order: LimitOrder) => {
   }
 };
 
+// Submits a group order and reports each follower's result as the backend streams it.
+// EventSource cannot POST, so the SSE body is read from fetch directly.
+export const streamGroupOrder = async (
+  kind: GroupOrderKind,
+  order: MarketOrder | LimitOrder | LimitOrderWithSLTP,
+  onEvent: (event: GroupOrderEvent) => void
+): Promise<Extract<GroupOrderEvent, { type: "done" }> | null> => {
+  let done: Extract<GroupOrderEvent, { type: "done" }> | null = null;
+  try {
+    const response = await fetch(`${API_BASE}/broker/execute-order/${kind}/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      credentials: "include",
+      body: JSON.stringify(order),
+    });
+    if (!response.ok || !response.body) {
+      const detail = await response.json().catch(() => null);
+      console.error("Stream Group Order:", detail);
+      alert(detail?.detail ?? "Unknown error");
+      return null;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done: finished } = await reader.read();
+      if (finished) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+        const data = frame
+          .split("\n")
+          .filter((line) => line.startsWith("data: "))
+          .map((line) => line.slice(6))
+          .join("\n");
+        if (!data) continue;
+        const event: GroupOrderEvent = JSON.parse(data);
+        if (event.type === "done") done = event;
+        onEvent(event);
+      }
+    }
+  } catch (error) {
+    console.error("Unexpected Stream Group Order error:", error);
+  }
+  return done;
+};
+
 export const executeLimitOrderWithSLTP = async (order: LimitOrderWithSLTP) => {
   try {
     const response = await axios.post(`${API_BASE}/broker/execute-order/limitwithsltp`, order);
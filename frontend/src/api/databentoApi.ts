@@ -17,10 +17,27 @@ export interface HistoricalChartResponse {
   start: string;
   end: string;
   schema: string;
+  timeframe?: string | null;
   count: number;
   data: HistoricalCandle[];
 }
 
+// format=columns: parallel arrays, times in epoch seconds
+export interface HistoricalColumns {
+  time: number[];
+  symbol: string[];
+  open: number[];
+  high: number[];
+  low: number[];
+  close: number[];
+  volume: number[];
+}
+
+export interface HistoricalColumnsResponse
+  extends Omit<HistoricalChartResponse, "data"> {
+  data: HistoricalColumns;
+}
+
 export const getHistoricalChart = async (
   symbol: string,
   start: string,
@@ -55,6 +72,46 @@ export const getHistoricalChart = async (
   }
 };
 
+// timeframe (e.g. "15m", "4h") builds bars server-side from cached 1-minute
+// bars; maxPoints downsamples overview zooms with LTTB or min-max
+export interface HistoricalBarOptions {
+  timeframe?: string;
+  maxPoints?: number;
+  downsample?: "lttb" | "minmax";
+}
+
+export const getHistoricalColumns = async (
+  symbol: string,
+  start: string,
+  end: string,
+  schema: string = "ohlcv-1m",
+  options: HistoricalBarOptions = {}
+): Promise<HistoricalColumnsResponse | null> => {
+  try {
+    const response = await axios.get(`${API_BASE}/databento/historical`, {
+      params: {
+        symbol,
+        start,
+        end,
+        schema,
+        format: "columns",
+        timeframe: options.timeframe,
+        max_points: options.maxPoints,
+        downsample: options.downsample,
+      },
+    });
+    return response.data;
+  } catch (error) {
+    if (axios.isAxiosError(error)) {
+      console.error("Get Historical Columns:", error.response?.data);
+      alert(error.response?.data?.detail ?? "Unknown error");
+    } else {
+      console.error("Unexpected Get Historical Columns error:", error);
+    }
+    return null;
+  }
+};
+
 export interface AvailableSymbolsResponse {
   futures: { symbol: string; name: string }[];
 }
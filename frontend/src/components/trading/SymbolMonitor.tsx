@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef } from "react";
 import { createChart, ColorType, IChartApi, ISeriesApi, CandlestickSeries } from "lightweight-charts";
 import Button from "../ui/Button";
-import { getHistoricalChart } from "../../api/databentoApi";
+import { getHistoricalColumns } from "../../api/databentoApi";
 
 const API_BASE = import.meta.env.VITE_BACKEND_URL || "http://localhost:8000";
 
@@ -45,6 +45,7 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
   const [isConnecting, setIsConnecting] = useState(false);
   const [connectionStatus, setConnectionStatus] = useState("");
   const eventSourceRef = useRef<EventSource | null>(null);
+  const barsSourceRef = useRef<EventSource | null>(null);
   const chartRefs = useRef<Record<string, { chart: IChartApi; candleSeries: ISeriesApi<any> }>>({});
   const prevSymbolRef = useRef<string>("");
 
@@ -84,13 +85,6 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [symbolInput, compact]);
 
-  // Helper function to get current minute timestamp
-  const getCurrentMinuteTimestamp = (): number => {
-    const now = new Date();
-    now.setSeconds(0, 0); // Reset seconds and milliseconds
-    return Math.floor(now.getTime() / 1000);
-  };
-
   // Helper function to get timeframe in minutes
   const getTimeframeMinutes = (tf: typeof timeframe): number => {
     switch (tf) {
@@ -142,41 +136,19 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
     return Array.from(aggregatedMap.values()).sort((a, b) => a.time - b.time);
   };
 
-  // Update OHLCV data for current minute
-  const updateCurrentMinuteData = (symbol: string, price: number) => {
-    const currentMinute = getCurrentMinuteTimestamp();
-    
+  // Merge 1-minute bars from /sse/bars into the history; a bar for an
+  // existing minute replaces it, since the server's bar is the complete one
+  const mergeLiveBars = (symbol: string, bars: OHLCVData[]) => {
+    if (bars.length === 0) return;
     setOhlcvHistory(prevHistory => {
       const history = prevHistory[symbol] || [];
-      const lastCandle = history[history.length - 1];
-      
-      // Check if we need to create a new candle (new minute)
-      if (!lastCandle || lastCandle.time !== currentMinute) {
-        // Create new candle for current minute
-        const newCandle: OHLCVData = {
-          time: currentMinute,
-          open: price,
-          high: price,
-          low: price,
-          close: price,
-          volume: 1
-        };
-        
-        const updatedHistory = [...history, newCandle].slice(-1000); // Keep last 1000 candles
-        return { ...prevHistory, [symbol]: updatedHistory };
-      } else {
-        // Update existing candle for current minute
-        const updatedCandle: OHLCVData = {
-          ...lastCandle,
-          high: Math.max(lastCandle.high, price),
-          low: Math.min(lastCandle.low, price),
-          close: price,
-          volume: lastCandle.volume + 1
-        };
-        
-        const updatedHistory = [...history.slice(0, -1), updatedCandle];
-        return { ...prevHistory, [symbol]: updatedHistory };
-      }
+      const firstLive = bars[0].time;
+      const kept = history.filter(candle => candle.time < firstLive);
+      const merged = [...kept, ...bars];
+      const lastLive = bars[bars.length - 1].time;
+      const later = history.filter(candle => candle.time > lastLive);
+      const updatedHistory = [...merged, ...later].slice(-1000); // Keep last 1000 candles
+      return { ...prevHistory, [symbol]: updatedHistory };
     });
   };
 
@@ -216,19 +188,20 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
       
       for (const symbol of symbolList) {
         try {
-          const historicalData = await getHistoricalChart(symbol, start, end, "ohlcv-1m");
+          const historicalData = await getHistoricalColumns(symbol, start, end, "ohlcv-1m");
           
           if (historicalData && historicalData.data) {
-            console.log(`✅ Loaded ${historicalData.data.length} historical candles for ${symbol}`);
+            console.log(`✅ Loaded ${historicalData.count} historical candles for ${symbol}`);
             
-            // Convert historical data to OHLCVData format
-            const historicalOhlcv = historicalData.data.map(candle => ({
-              time: Math.floor(new Date(candle.timestamp).getTime() / 1000),
-              open: candle.open,
-              high: candle.high,
-              low: candle.low,
-              close: candle.close,
-              volume: candle.volume
+            // Convert historical columns to OHLCVData format
+            const { time, open, high, low, close, volume } = historicalData.data;
+            const historicalOhlcv = time.map((t, i) => ({
+              time: t,
+              open: open[i],
+              high: high[i],
+              low: low[i],
+              close: close[i],
+              volume: volume[i]
             }));
             
             // Add to existing OHLCV history
@@ -255,21 +228,31 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
         }
       } catch {}
 
-      // Now subscribe to real-time data
+      // Now subscribe to real-time data; the subscription is keyed by user and connection ID
       setConnectionStatus("Connecting to real-time stream...");
+      const user = localStorage.getItem("user");
+      const userId = user ? JSON.parse(user).id : null;
+      const userQuery = userId ? `user_id=${encodeURIComponent(userId)}` : "";
+      let streamQuery = `symbols=${encodeURIComponent(symbolList.join(","))}`;
       try {
-        const response = await fetch(`${API_BASE}/databento/sse/current-price`, {
+        const response = await fetch(`${API_BASE}/databento/sse/current-price?${userQuery}`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
+          credentials: "include",
           body: JSON.stringify({ symbols: symbolList }),
         });
         if (!response.ok) {
           throw new Error("Failed to subscribe to symbols");
         }
+        const { connection_id } = await response.json();
+        streamQuery = `connection_id=${encodeURIComponent(connection_id)}`;
       } catch {}
 
       // Then start the SSE stream
-      const es = new EventSource(`${API_BASE}/databento/sse/current-price`);
+      const es = new EventSource(
+        `${API_BASE}/databento/sse/current-price?${streamQuery}${userQuery ? `&${userQuery}` : ""}`,
+        { withCredentials: true }
+      );
       eventSourceRef.current = es;
 
       es.onopen = () => {
@@ -293,6 +276,10 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
               eventSourceRef.current.close();
               eventSourceRef.current = null;
             }
+            if (barsSourceRef.current) {
+              barsSourceRef.current.close();
+              barsSourceRef.current = null;
+            }
             setIsConnected(false);
             return;
           }
@@ -305,10 +292,6 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
             const symbol = data.symbol;
             
             setPrices((prev: Record<string, PriceData>) => ({ ...prev, [symbol]: data }));
-            
-            // Update OHLCV data for current minute
-            const midPrice = (Number(data.bid_price) + Number(data.ask_price)) / 2;
-            updateCurrentMinuteData(symbol, midPrice);
           }
         } catch (error) {
           console.error("Error parsing SSE data:", error);
@@ -322,6 +305,48 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
         es.close();
         eventSourceRef.current = null;
       };
+
+      // Candles come from the server's live bar builder (1-minute bars,
+      // aggregated to the selected timeframe client-side)
+      const barsSource = new EventSource(
+        `${API_BASE}/databento/sse/bars?symbols=${encodeURIComponent(symbolList.join(","))}`
+      );
+      barsSourceRef.current = barsSource;
+      barsSource.onmessage = (e) => {
+        try {
+          const message = JSON.parse(e.data);
+          if (message.type === "snapshot") {
+            const { time, open, high, low, close, volume } = message.bars;
+            mergeLiveBars(
+              message.symbol,
+              time.map((t: number, i: number) => ({
+                time: t,
+                open: open[i],
+                high: high[i],
+                low: low[i],
+                close: close[i],
+                volume: volume[i]
+              }))
+            );
+          } else if (message.type === "bar") {
+            mergeLiveBars(message.symbol, [{
+              time: message.time,
+              open: message.open,
+              high: message.high,
+              low: message.low,
+              close: message.close,
+              volume: message.volume
+            }]);
+          }
+        } catch (error) {
+          console.error("Error parsing bar SSE data:", error);
+        }
+      };
+      barsSource.onerror = (error: Event) => {
+        console.error("Bar SSE error:", error);
+        barsSource.close();
+        barsSourceRef.current = null;
+      };
     } catch (error) {
       console.error("Failed to connect:", error);
       alert(`Failed to connect: ${error instanceof Error ? error.message : "Unknown error"}`);
@@ -335,6 +360,10 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
       eventSourceRef.current.close();
       eventSourceRef.current = null;
     }
+    if (barsSourceRef.current) {
+      barsSourceRef.current.close();
+      barsSourceRef.current = null;
+    }
     
     // Clean up all charts
     Object.values(chartRefs.current).forEach(({ chart }) => {
@@ -538,6 +567,9 @@ const SymbolsMonitor: React.FC<SymbolsMonitorProps> = ({ initialSymbol = "", com
       if (eventSourceRef.current) {
         eventSourceRef.current.close();
       }
+      if (barsSourceRef.current) {
+        barsSourceRef.current.close();
+      }
     };
   }, []);
 
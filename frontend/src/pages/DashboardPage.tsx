@@ -21,9 +21,7 @@ import {
   TradovatePositionListResponse,
 } from "../types/broker";
 import {
-  getPositions,
-  getOrders,
-  getAccounts,
+  getSnapshot,
   exitPostion,
   exitAllPostions,
 } from "../api/brokerApi";
@@ -79,36 +77,21 @@ const DashboardPage: React.FC = () => {
   const user = localStorage.getItem("user");
   const user_id = user ? JSON.parse(user).id : null;
 
-  const fetchPositions = async () => {
-    try {
-      const positionData = await getPositions(user_id);
-      if (positionData != null) {
-        setPositions(positionData);
-      }
-    } catch (error) {
-      console.error("Error fetching positions:", error);
-    }
-  };
-
-  const fetchOrders = async () => {
-    try {
-      const orderData = await getOrders(user_id);
-      if (orderData != null) {
-        setOrders(orderData);
-      }
-    } catch (error) {
-      console.error("Error fetching orders:", error);
-    }
-  };
+  // ETag of the last snapshot; unchanged polls come back as 304 with no body
+  const snapshotEtagRef = useRef<string | null>(null);
 
-  const fetchAccounts = async () => {
+  const fetchSnapshot = async () => {
     try {
-      const accountData = await getAccounts(user_id);
-      if (accountData != null) {
-        setAccounts(accountData);
+      const result = await getSnapshot(user_id, snapshotEtagRef.current);
+      if (result == null || result.notModified || result.snapshot == null) {
+        return;
       }
+      snapshotEtagRef.current = result.etag;
+      setPositions(result.snapshot.positions);
+      setOrders(result.snapshot.orders);
+      setAccounts(result.snapshot.accounts);
     } catch (error) {
-      console.error("Error fetching accounts:", error);
+      console.error("Error fetching snapshot:", error);
     }
   };
 
@@ -116,7 +99,7 @@ const DashboardPage: React.FC = () => {
     const loadData = async () => {
       setIsInitialLoad(true);
       try {
-        await Promise.all([fetchPositions(), fetchOrders(), fetchAccounts()]);
+        await fetchSnapshot();
       } finally {
         setIsInitialLoad(false);
       }
@@ -130,7 +113,7 @@ const DashboardPage: React.FC = () => {
 
     const pollInterval = setInterval(async () => {
       try {
-        await Promise.all([fetchPositions(), fetchOrders(), fetchAccounts()]);
+        await fetchSnapshot();
       } catch (error) {
         console.error("Error polling positions/orders/accounts:", error);
       }
@@ -365,7 +348,7 @@ const DashboardPage: React.FC = () => {
         isAutomated: true,
       };
       await exitPostion(exitPostionData);
-      await fetchPositions();
+      await fetchSnapshot();
     } catch (err) {
       setError("Failed to exit position");
       console.error(err);
@@ -394,7 +377,7 @@ const DashboardPage: React.FC = () => {
         exitPostions.push(exitPostion);
       });
       await exitAllPostions(exitPostions);
-      await fetchPositions();
+      await fetchSnapshot();
     } catch (err) {
       setError("Failed to flatten all positions and orders");
       console.error(err);
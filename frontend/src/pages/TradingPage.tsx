@@ -5,9 +5,7 @@ import Footer from "../components/layout/Footer";
 import { Card, CardContent, CardHeader } from "../components/ui/Card";
 // import TradingViewWidget from "../components/trading/TradingViewWidget";
 import {
-  executeLimitOrder,
-  executeLimitOrderWithSLTP,
-  executeMarketOrder,
+  streamGroupOrder,
   getAllTradingData,
   exitAllPostions,
 } from "../api/brokerApi";
@@ -17,12 +15,14 @@ import {
   MarketOrder,
   LimitOrder,
   LimitOrderWithSLTP,
+  GroupOrderEvent,
   TradovateAccountsResponse,
   TradovatePositionListResponse,
 } from "../types/broker";
 import LoadingModal from "../components/ui/LoadingModal";
 import Modal from "../components/ui/Modal";
 import { tradovateWSMultiClient } from "../services/tradovateWsMulti";
+import { clientStreamClient } from "../services/clientStream";
 import { getAllWebSocketTokens } from "../api/brokerApi";
 import { addUserContract, getUserContracts, deleteUserContract } from "../api/userContractApi";
 import { UserContractInfo } from "../types/userContract";
@@ -35,6 +35,8 @@ const TradingPage: React.FC = () => {
   const [orderType, setOrderType] = useState<"market" | "limit">("market");
   const [limitPrice, setLimitPrice] = useState<string>("");
   const [isOrdering, setIsOrdering] = useState<boolean>(false);
+  // Follower results streamed back while a group order is being submitted
+  const [orderProgress, setOrderProgress] = useState<{ total: number; sent: number; failed: number } | null>(null);
   const [orderHistory, setOrderHistory] = useState<any[]>([]);
   const [symbol, setSymbol] = useState<string>("All");
   const [pendingSymbol, setPendingSymbol] = useState<string>("MNQZ5");
@@ -136,7 +138,8 @@ const TradingPage: React.FC = () => {
     bidSize?: number;
     askSize?: number;
   }>({});
-  const priceEventSourceRef = useRef<EventSource | null>(null);
+  // Stops this page's quotes subscription on the shared client stream
+  const priceUnsubscribeRef = useRef<(() => void) | null>(null);
   const [isPriceIdle, setIsPriceIdle] = useState<boolean>(false);
   const lastPriceTsRef = useRef<number>(0);
 
@@ -157,7 +160,8 @@ const TradingPage: React.FC = () => {
   const [customSL, setCustomSL] = useState<string>("");
   const [customTP, setCustomTP] = useState<string>("");
 
-  const eventSourceRef = useRef<EventSource | null>(null);
+  // Stops this page's PnL subscription on the shared client stream
+  const pnlUnsubscribeRef = useRef<(() => void) | null>(null);
   const user = localStorage.getItem("user");
   const user_id = user ? JSON.parse(user).id : null;
 
@@ -526,6 +530,8 @@ const TradingPage: React.FC = () => {
   const isRefreshingRef = useRef<boolean>(false);
   const wsRefreshTimerRef = useRef<number | null>(null); // Debounce timer for WebSocket-triggered refreshes
   const handleWebSocketEventRef = useRef<(() => void) | null>(null); // Ref to store WebSocket event handler
+  // client_order_id of the order being submitted, kept until it completes so retries reuse it
+  const orderIntentRef = useRef<{ intent: string; clientOrderId: string } | null>(null);
 
   // Subscribe once, filter using refs
   useEffect(() => {
@@ -606,7 +612,12 @@ const TradingPage: React.FC = () => {
       // Debounce: only reconnect after 1 second of no updates
       pnlRefreshTimerRef.current = window.setTimeout(() => {
         if (user_id) {
-          connectToPnLStream();
+          // Positions changed: the server refetches them
+          if (pnlUnsubscribeRef.current) {
+            clientStreamClient.refresh("pnl");
+          } else {
+            connectToPnLStream();
+          }
         }
       }, 1000); // 1 second debounce
     };
@@ -735,10 +746,10 @@ const TradingPage: React.FC = () => {
         wsRefreshTimerRef.current = null;
       }
       
-      // Disconnect PnL SSE when leaving TradingPage
-      if (eventSourceRef.current) {
-        eventSourceRef.current.close();
-        eventSourceRef.current = null;
+      // Stop PnL when leaving TradingPage
+      if (pnlUnsubscribeRef.current) {
+        pnlUnsubscribeRef.current();
+        pnlUnsubscribeRef.current = null;
         setIsConnectedToPnL(false);
       }
       
@@ -755,9 +766,9 @@ const TradingPage: React.FC = () => {
       prevPositionsRef.current = "";
       // If all positions are closed, clear PnL data and disconnect stream
       setPnlData({});
-      if (eventSourceRef.current) {
-        eventSourceRef.current.close();
-        eventSourceRef.current = null;
+      if (pnlUnsubscribeRef.current) {
+        pnlUnsubscribeRef.current();
+        pnlUnsubscribeRef.current = null;
         setIsConnectedToPnL(false);
       }
       return;
@@ -949,36 +960,24 @@ const TradingPage: React.FC = () => {
     }
   };
 
-  // Connect to PnL SSE stream
+  // Subscribe to PnL on the tab's client stream
   const connectToPnLStream = () => {
     if (!user_id) {
       return;
     }
 
-    // Close existing connection first
-    if (eventSourceRef.current) {
-      eventSourceRef.current.close();
-      eventSourceRef.current = null;
+    // Drop the existing subscription first
+    if (pnlUnsubscribeRef.current) {
+      pnlUnsubscribeRef.current();
+      pnlUnsubscribeRef.current = null;
       setIsConnectedToPnL(false);
     }
 
-    const API_BASE = import.meta.env.VITE_BACKEND_URL || "http://localhost:8000";
-    const url = `${API_BASE}/databento/sse/pnl?user_id=${user_id}`;
-    
-    try {
-      const eventSource = new EventSource(url);
-      eventSourceRef.current = eventSource;
-
-      eventSource.onopen = () => {
-        setIsConnectedToPnL(true);
-      };
-
-    eventSource.onmessage = (e) => {
+    clientStreamClient.connect(user_id);
+    pnlUnsubscribeRef.current = clientStreamClient.subscribe("pnl", (data) => {
       try {
-        const data = JSON.parse(e.data);
-        
         // Check for status messages
-        if (data.status === "connected") {
+        if (data.status === "subscribed") {
           setIsConnectedToPnL(true);
           return;
         }
@@ -989,12 +988,7 @@ const TradingPage: React.FC = () => {
           return;
         }
 
-        // Check for market closed status
-        if (data.status === "market_closed") {
-          setIsConnectedToPnL(false);
-          setIsMarketClosed(true);
-          return;
-        }
+        if (data.status) return;
 
         // Update PnL data; key by symbol+account to avoid overwriting
         if (data.symbol && data.unrealizedPnL !== undefined) {
@@ -1008,26 +1002,7 @@ const TradingPage: React.FC = () => {
       } catch (error) {
         // Silent error handling
       }
-    };
-
-      eventSource.onerror = (error) => {
-        setIsConnectedToPnL(false);
-        
-        // Close the connection if it's in a bad state
-        if (eventSource.readyState === EventSource.CLOSED) {
-          eventSourceRef.current = null;
-        }
-        
-        // Attempt to reconnect after a delay
-        setTimeout(() => {
-          if (user_id && !eventSourceRef.current) {
-            connectToPnLStream();
-          }
-        }, 5000);
-      };
-    } catch (error) {
-      setIsConnectedToPnL(false);
-    }
+    });
   };
 
   // Use ref to track current symbol for SSE handler
@@ -1036,16 +1011,12 @@ const TradingPage: React.FC = () => {
     currentSymbolRef.current = symbol;
   }, [symbol]);
 
-  // Track connection ID to ignore data from old connections
-  const sseConnectionIdRef = useRef<string | null>(null);
-
   // Subscribe to real-time price stream when symbol changes
   useEffect(() => {
-    // Close old connection first and clear price
-    if (priceEventSourceRef.current) {
-      priceEventSourceRef.current.close();
-      priceEventSourceRef.current = null;
-      sseConnectionIdRef.current = null;
+    // Drop the old symbol's quotes first and clear price
+    if (priceUnsubscribeRef.current) {
+      priceUnsubscribeRef.current();
+      priceUnsubscribeRef.current = null;
     }
     setCurrentPrice({});
 
@@ -1075,37 +1046,14 @@ const TradingPage: React.FC = () => {
         setIsMarketClosed(true);
       }
       
-      // Create EventSource with current symbol
+      // Subscribe the current symbol on the tab's client stream
       const currentSymbol = currentSymbolRef.current;
-      if (!currentSymbol) return; // Symbol changed while async operation was running
+      if (!currentSymbol || !user_id) return; // Symbol changed while async operation was running
       
-      const es = new EventSource(`${API_BASE}/databento/sse/current-price?symbols=${encodeURIComponent(currentSymbol)}`);
-      priceEventSourceRef.current = es;
-
-      es.onmessage = (e) => {
+      clientStreamClient.connect(user_id);
+      priceUnsubscribeRef.current = clientStreamClient.subscribe("quotes", (data) => {
         try {
-          const data = JSON.parse(e.data);
-          
-          // Handle connection status message
-          if (data.status === "connected") {
-            sseConnectionIdRef.current = data.connection_id || null;
-            setIsMarketClosed(false);
-            return;
-          }
-          
-          // Check for market closed status
-          if (data.status === "market_closed") {
-            setIsMarketClosed(true);
-            setIsPriceIdle(true);
-            return;
-          }
-          
-          if (data.test || data.error) return;
-          
-          // Ignore data from old connections
-          if (data.connection_id && sseConnectionIdRef.current && data.connection_id !== sseConnectionIdRef.current) {
-            return;
-          }
+          if (data.status || data.error) return;
           
           // Use ref to get current symbol (not closure value)
           const symbolToCheck = currentSymbolRef.current;
@@ -1132,14 +1080,7 @@ const TradingPage: React.FC = () => {
         } catch (error) {
           // Silent error handling
         }
-      };
-
-      es.onerror = () => {
-        // keep connection light; mark as idle rather than erroring UI
-        setIsPriceIdle(true);
-        es.close();
-        sseConnectionIdRef.current = null;
-      };
+      }, [currentSymbol]);
     };
 
     const idleCb = (window as any).requestIdleCallback as undefined | ((cb: () => void, opts?: any) => number);
@@ -1161,9 +1102,9 @@ const TradingPage: React.FC = () => {
     return () => {
       window.clearInterval(idleInterval);
       if (timeoutId) window.clearTimeout(timeoutId);
-      if (priceEventSourceRef.current) {
-        priceEventSourceRef.current.close();
-        priceEventSourceRef.current = null;
+      if (priceUnsubscribeRef.current) {
+        priceUnsubscribeRef.current();
+        priceUnsubscribeRef.current = null;
       }
     };
   }, [symbol]);
@@ -1263,9 +1204,9 @@ const TradingPage: React.FC = () => {
   useEffect(() => {
     if (!user_id) {
       // Close connection if user_id is cleared
-      if (eventSourceRef.current) {
-        eventSourceRef.current.close();
-        eventSourceRef.current = null;
+      if (pnlUnsubscribeRef.current) {
+        pnlUnsubscribeRef.current();
+        pnlUnsubscribeRef.current = null;
         setIsConnectedToPnL(false);
       }
       return;
@@ -1275,10 +1216,10 @@ const TradingPage: React.FC = () => {
     connectToPnLStream();
     
     return () => {
-      // Disconnect PnL SSE when component unmounts or user_id changes
-      if (eventSourceRef.current) {
-        eventSourceRef.current.close();
-        eventSourceRef.current = null;
+      // Stop PnL when component unmounts or user_id changes
+      if (pnlUnsubscribeRef.current) {
+        pnlUnsubscribeRef.current();
+        pnlUnsubscribeRef.current = null;
         setIsConnectedToPnL(false);
       }
     };
@@ -1382,6 +1323,21 @@ const TradingPage: React.FC = () => {
     }
 
     setIsOrdering(true);
+    setOrderProgress(null);
+    const handleOrderEvent = (event: GroupOrderEvent) => {
+      if (event.type === "start") {
+        setOrderProgress({ total: event.total, sent: 0, failed: 0 });
+      } else if (event.type === "result") {
+        if (event.status === "failed") {
+          console.error(`[Order] ${event.account_name ?? event.sub_broker_id} failed:`, event.error);
+        }
+        setOrderProgress((prev) => prev && {
+          ...prev,
+          sent: prev.sent + (event.status === "failed" ? 0 : 1),
+          failed: prev.failed + (event.status === "failed" ? 1 : 0),
+        });
+      }
+    };
 
     try {
       // Prepare order data for each sub-broker in the group
@@ -1418,6 +1374,13 @@ const TradingPage: React.FC = () => {
           tpValue = parseFloat(customTP);
           break;
       }
+      // One ID per order intent: a double-click or a retry of the same order is deduplicated
+      const intent = JSON.stringify([selectedGroup.id, symbol, action, orderType, orderQuantity, limitPrice, slValue, tpValue]);
+      if (orderIntentRef.current?.intent !== intent) {
+        orderIntentRef.current = { intent, clientOrderId: crypto.randomUUID() };
+      }
+      const clientOrderId = orderIntentRef.current.clientOrderId;
+      let done: Extract<GroupOrderEvent, { type: "done" }> | null = null;
       if (orderType === "market") {
         const order: MarketOrder = {
           group_id: selectedGroup.id,
@@ -1425,8 +1388,9 @@ const TradingPage: React.FC = () => {
           symbol: symbol,
           quantity: parseInt(orderQuantity),
           action: action,
+          client_order_id: clientOrderId,
         };
-        await executeMarketOrder(order);
+        done = await streamGroupOrder("market", order, handleOrderEvent);
       }
       if (orderType === "limit") {
         if (slValue == 0 && tpValue == 0) {
@@ -1437,8 +1401,9 @@ const TradingPage: React.FC = () => {
             quantity: parseInt(orderQuantity),
             action: action,
             price: parseFloat(limitPrice),
+            client_order_id: clientOrderId,
           };
-          await executeLimitOrder(order);
+          done = await streamGroupOrder("limit", order, handleOrderEvent);
         }
         else {
           const order: LimitOrderWithSLTP = {
@@ -1451,11 +1416,17 @@ const TradingPage: React.FC = () => {
             sltp: {
               sl: slValue,
               tp: tpValue
-            }
+            },
+            client_order_id: clientOrderId,
           };
-          await executeLimitOrderWithSLTP(order);
+          done = await streamGroupOrder("limitwithsltp", order, handleOrderEvent);
         }
       }
+      // Every follower was handled; the next order gets a new ID. Followers still
+      // in flight from an earlier attempt keep it, so a retry reports their result
+      if (done && !done.in_flight && orderIntentRef.current?.clientOrderId === clientOrderId) {
+        orderIntentRef.current = null;
+      }
       // Calculate SL/TP values
 
       // Send orders via WebSocket using Tradovate's startOrderStrategy
@@ -2379,7 +2350,14 @@ const TradingPage: React.FC = () => {
                       </div>
 
           {/* Group Position Monitor removed per request */}
-          <LoadingModal isOpen={isOrdering || isPageLoading} message={isOrdering ? "Submitting order..." : "Loading..."} />
+          <LoadingModal
+            isOpen={isOrdering || isPageLoading}
+            message={isOrdering
+              ? orderProgress
+                ? `Submitting order... ${orderProgress.sent}/${orderProgress.total} sent${orderProgress.failed ? `, ${orderProgress.failed} failed` : ""}`
+                : "Submitting order..."
+              : "Loading..."}
+          />
         </main>
         <Footer />
       </div>
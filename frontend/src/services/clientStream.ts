@@ -0,0 +1,118 @@
+// One WebSocket per tab to the backend's /stream/ws: quotes, PnL, positions
+// and group order results are topics on it instead of separate EventSources.
+
+type Topic = "quotes" | "pnl" | "positions" | "orders";
+type Listener = (data: any) => void;
+
+const API_BASE = import.meta.env.VITE_BACKEND_URL || "http://localhost:8000";
+const RECONNECT_DELAY_MS = 2000;
+
+export class ClientStreamClient {
+  private ws: WebSocket | null = null;
+  private userId: string | null = null;
+  private reconnectTimer: any = null;
+  private listeners = new Map<Topic, Set<Listener>>();
+  // Quote symbols -> number of callers subscribed to them
+  private quoteSymbols = new Map<string, number>();
+
+  connect(userId: string) {
+    if (this.userId === userId && this.ws && this.ws.readyState <= WebSocket.OPEN) return;
+    this.disconnect();
+    this.userId = userId;
+    const url = `${API_BASE.replace(/^http/, "ws")}/stream/ws?user_id=${encodeURIComponent(userId)}`;
+    const ws = new WebSocket(url);
+    this.ws = ws;
+
+    ws.onopen = () => {
+      // Re-send everything subscribed so far, e.g. after a reconnect
+      if (this.quoteSymbols.size) {
+        this.send({ op: "subscribe", topic: "quotes", symbols: [...this.quoteSymbols.keys()] });
+      }
+      for (const topic of ["pnl", "positions", "orders"] as Topic[]) {
+        if (this.listeners.get(topic)?.size) this.send({ op: "subscribe", topic });
+      }
+    };
+
+    ws.onmessage = (evt) => {
+      try {
+        const events = JSON.parse(evt.data) as { topic: Topic; data: any }[];
+        for (const { topic, data } of events) {
+          this.listeners.get(topic)?.forEach((cb) => cb(data));
+        }
+      } catch {
+        // Silent error handling
+      }
+    };
+
+    ws.onclose = (event) => {
+      if (this.ws !== ws) return;
+      this.ws = null;
+      if (event.code !== 1000 && this.userId && !this.reconnectTimer) {
+        this.reconnectTimer = setTimeout(() => {
+          this.reconnectTimer = null;
+          const userId = this.userId;
+          this.userId = null;
+          if (userId) this.connect(userId);
+        }, RECONNECT_DELAY_MS);
+      }
+    };
+  }
+
+  disconnect() {
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+    if (this.ws) {
+      const ws = this.ws;
+      this.ws = null;
+      try { ws.close(1000, "client disconnect"); } catch {}
+    }
+    this.userId = null;
+  }
+
+  // Listen to a topic; returns the function that stops listening
+  subscribe(topic: Topic, listener: Listener, symbols: string[] = []): () => void {
+    const listeners = this.listeners.get(topic) ?? new Set<Listener>();
+    this.listeners.set(topic, listeners);
+    listeners.add(listener);
+    if (topic === "quotes") {
+      const added = symbols.filter((s) => !this.quoteSymbols.has(s));
+      symbols.forEach((s) => this.quoteSymbols.set(s, (this.quoteSymbols.get(s) || 0) + 1));
+      if (added.length) this.send({ op: "subscribe", topic, symbols: added });
+    } else if (listeners.size === 1) {
+      this.send({ op: "subscribe", topic });
+    }
+
+    return () => {
+      listeners.delete(listener);
+      if (topic === "quotes") {
+        const removed: string[] = [];
+        symbols.forEach((s) => {
+          const count = (this.quoteSymbols.get(s) || 0) - 1;
+          if (count > 0) {
+            this.quoteSymbols.set(s, count);
+          } else {
+            this.quoteSymbols.delete(s);
+            removed.push(s);
+          }
+        });
+        if (removed.length) this.send({ op: "unsubscribe", topic, symbols: removed });
+      } else if (listeners.size === 0) {
+        this.send({ op: "unsubscribe", topic });
+      }
+    };
+  }
+
+  // Refetch positions for pnl and positions, e.g. after they changed outside this app
+  refresh(topic: "pnl" | "positions") {
+    if (this.listeners.get(topic)?.size) this.send({ op: "subscribe", topic });
+  }
+
+  private send(message: object) {
+    // Sent on open otherwise
+    if (this.ws?.readyState === WebSocket.OPEN) this.ws.send(JSON.stringify(message));
+  }
+}
+
+export const clientStreamClient = new ClientStreamClient();
@@ -218,6 +218,7 @@ export interface MarketOrder {
   symbol: string;
   quantity: number;
   action: string;
+  client_order_id?: string; // Reused on retries so followers are never ordered twice
 }
 
 export interface LimitOrder {
@@ -227,6 +228,7 @@ export interface LimitOrder {
   quantity: number;
   action: string;
   price: number;
+  client_order_id?: string;
 }
 
 export interface SLTP {
@@ -242,4 +244,24 @@ export interface LimitOrderWithSLTP {
   action: string;
   price: number;
   sltp: SLTP;
-}
\ No newline at end of file
+  client_order_id?: string;
+}
+export type GroupOrderKind = "market" | "limit" | "limitwithsltp";
+
+// Per-follower result streamed from /broker/execute-order/{kind}/stream
+export interface GroupOrderResult {
+  sub_broker_id: string;
+  account_id: string | null;
+  account_name: string | null;
+  status: "sent" | "failed" | "pending";
+  order_id: number | null;
+  error: string | null;
+  replayed: boolean;
+  latency_ms: number | null;
+  bracket_order_ids?: number[];
+}
+
+export type GroupOrderEvent =
+  | { type: "start"; total: number; client_order_id: string | null }
+  | ({ type: "result" } & GroupOrderResult)
+  | { type: "done"; success: boolean; sent: number; failed: number; in_flight: number; elapsed_ms: number };